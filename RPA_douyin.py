@@ -1,173 +1,356 @@
+import asyncio
 import re
 import time
 from pathlib import Path
-from typing import Optional, Dict
-from base_rpa import BaseRPA
+from typing import Optional, Any, Dict, Tuple
+import tracing
+from base_rpa import BaseRPA, RPACommon
+from async_base_rpa import AsyncBaseRPA
+from rpa_result import RPAResult
 from config import Config_Douyin
-from playwright.sync_api import Page, Locator
+from playwright.sync_api import Page
+from playwright.async_api import Page as AsyncPage
 
-class DouyinRPA(BaseRPA):
-    def __init__(self, config: Config_Douyin):
-        super().__init__(config, "抖音")
+def parse_aweme_detail(payload: Optional[Dict[str, Any]], url: str) -> Optional[Dict[str, Any]]:
+    """
+    将作品详情接口（/aweme/v1/web/aweme/detail/）的 JSON 转换为 _build_result 所需的 data。
+    计数为接口给出的精确整数，发布时间为 Unix 时间戳；接口未返回作品（已删除/风控）时返回 None。
+    """
+    aweme = (payload or {}).get("aweme_detail")
+    if not aweme:
+        return None
+    stats = aweme.get("statistics") or {}
+    author = aweme.get("author") or {}
+    images = aweme.get("images") or []
+    if images:
+        # 图文：与页面提取一致，文案放在 content 中
+        media_urls = images[0].get("url_list") or []
+        title, content = None, aweme.get("desc")
+    else:
+        media_urls = ((aweme.get("video") or {}).get("play_addr") or {}).get("url_list") or []
+        title, content = aweme.get("desc"), None
+    return {
+        "title": title,
+        "author": author.get("nickname"),
+        "content": content,
+        "likes": stats.get("digg_count"),
+        "comments": stats.get("comment_count"),
+        "shares": stats.get("share_count"),
+        "fans": author.get("follower_count"),
+        "publish_time": aweme.get("create_time"),
+        "url": url,
+        "media_url": media_urls[0] if media_urls else None,
+        "is_note": bool(images),
+    }
+
+# 通过浏览器性能记录（Performance API）查找已发生的包含 mime_type=video_mp4 的网络请求
+VIDEO_URL_JS = """
+    () => {
+        const entries = performance.getEntriesByType('resource');
+        const videoEntry = entries.find(e => e.name.includes('mime_type=video_mp4'));
+        return videoEntry ? videoEntry.name : null;
+    }
+"""
+
+class DouyinRPACommon(RPACommon):
+    """
+    抖音同步/异步引擎共用的部分：页面类型判断、保存路径和结果数据的组装（含图文计数的拆分），
+    两个引擎只负责各自的 Playwright 调用。
+    """
+    VIDEO_FIELDS = ["video_title", "video_author", "video_likes", "video_comments",
+                    "video_shares", "video_fans", "video_publish_time"]
+    NOTE_FIELDS = ["note_title", "note_author", "note_likes", "note_fans", "note_publish_time"]
+    SUCCESS_MESSAGE = "SUCCESS: 抖音数据提取成功"
 
-    def _check_error_states(self, page: Page) -> Optional[str]:
-        if page.get_by_text("你要观看的图文不存在").count() > 0 or page.get_by_text("视频不存在").count() > 0:
-            return "PAGE_NOT_FOUND"
+    def __init__(self, config: Config_Douyin, api_capture: Optional[bool] = None):
+        super().__init__(config, "抖音", api_capture)
+
+    def _page_kind(self, url: str) -> Optional[str]:
+        """
+        按当前页面地址判断作品类型："video"、"note"，其他页面返回 None。
+        """
+        if "douyin.com/video" in url:
+            return "video"
+        if "douyin.com/note" in url:
+            return "note"
         return None
 
-    def _download(self, page: Page, title: str, author: str, download_media: bool, locator_video: Optional[Locator], close_btn_selector: str) -> str:
-        if locator_video:
-            save_path = Path(self.save_dir) / f"{self._safe_filename(title or 'unnamed')}-{self._safe_filename(author or 'unnamed')}.mp4"
-            save_path.parent.mkdir(parents=True, exist_ok=True)
-            self._close_login_popup(page, close_btn_selector)
-            
-            video_url = None
-            try:
-                # 优先通过浏览器性能记录(Performance API)查找包含 mime_type=video_mp4 的网络请求
-                # 这种方式可以捕获到在此函数调用前已经发生的网络请求
-                video_url = page.evaluate("""
-                    () => {
-                        const entries = performance.getEntriesByType('resource');
-                        const videoEntry = entries.find(e => e.name.includes('mime_type=video_mp4'));
-                        return videoEntry ? videoEntry.name : null;
-                    }
-                """)
-                
-                # 如果性能记录中没有，尝试监听后续可能发生的请求（如自动播放或触发加载）
-                if not video_url:
-                    try:
-                        with page.expect_response(lambda res: "mime_type=video_mp4" in res.url, timeout=3000) as response_info:
-                            video_url = response_info.value.url
-                    except:
-                        pass
-            except Exception as e:
-                print(f"Error intercepting video URL: {e}")
-
-            try:
-                if download_media and video_url and video_url.startswith("http"):
-                    # 使用 page.request.get 确保使用当前页面的 cookies 和 context
-                    response = page.request.get(video_url)
-                    if response.ok:
-                        with open(save_path, "wb") as f:
-                            f.write(response.body())
-                    else:
-                        print(f"Download failed with status: {response.status}")
-                return video_url or None
-            except Exception as e:
-                print(f"Error during video download: {e}")
-                return None
-        else:
-            save_path = Path(self.save_dir) / f"{self._safe_filename(author or 'unnamed')}.jpg"
-            save_path.parent.mkdir(parents=True, exist_ok=True)
-            self._close_login_popup(page, close_btn_selector)
-            time.sleep(0.3)
-            page.screenshot(path=str(save_path))
-            return "screenshot"
-
-    def extract_info(self, page: Page, url: str, download_media: bool) -> str:
-        if "douyin.com/video" in page.url:
+    def _video_save_path(self, title: Optional[str], author: Optional[str]) -> Path:
+        return self._media_save_path(title, author, suffix=".mp4")
+
+    def _note_save_path(self, author: Optional[str]) -> Path:
+        return self._media_save_path(author, suffix=".jpg")
+
+    def _api_data(self, payload: Optional[Dict[str, Any]], url: str) -> Tuple[Optional[Dict[str, Any]], Optional[Path]]:
+        """
+        接口抓取模式：把作品详情接口的 JSON 转换为 (_build_result 所需的 data, 媒体保存路径)，
+        未捕获到接口时返回 (None, None)。
+        """
+        data = parse_aweme_detail(payload, url)
+        if data is None:
+            print(f"INFO: [{self.web_name}] 未捕获到作品详情接口，回退到页面提取")
+            return None, None
+        if data.pop("is_note"):
+            return data, self._note_save_path(data["author"])
+        return data, self._video_save_path(data["title"], data["author"])
+
+    def _video_data(self, fields: Dict[str, Optional[str]], url: str) -> Dict[str, Any]:
+        """
+        视频页提取的字段转换为 _build_result 所需的 data，media_url 由调用方下载媒体后填入。
+        """
+        return {
+            "title": fields["video_title"],
+            "author": fields["video_author"],
+            "content": None,
+            "likes": fields["video_likes"],
+            "comments": fields["video_comments"],
+            "shares": fields["video_shares"],
+            "fans": fields["video_fans"],
+            "publish_time": fields["video_publish_time"],
+            "url": url,
+            "media_url": None
+        }
+
+    def _note_data(self, fields: Dict[str, Optional[str]], url: str) -> Dict[str, Any]:
+        """
+        图文页提取的字段转换为 _build_result 所需的 data（文案放在 content 中），media_url 由调用方填入。
+        """
+        title_raw = fields["note_title"]
+        title = re.split(r"发布时间：", title_raw.replace("\n", "").strip())[0].strip() if title_raw else None
+
+        # 点赞/评论/收藏/分享合并在同一个元素中，按行拆分
+        likes_comments_favorites_shares = fields["note_likes"]
+        likes, comments, favorites, shares = None, None, None, None
+        if likes_comments_favorites_shares:
+            parts = likes_comments_favorites_shares.split("\n")
+            if len(parts) >= 1: likes = parts[0].strip()
+            if len(parts) >= 2: comments = parts[1].strip()
+            if len(parts) >= 3: favorites = parts[2].strip()
+            if len(parts) >= 4: shares = parts[3].strip()
+
+        return {
+            "title": None,
+            "author": fields["note_author"],
+            "content": title, # Use title as content for notes
+            "likes": likes,
+            "comments": comments,
+            "shares": shares,
+            "fans": fields["note_fans"],
+            "publish_time": fields["note_publish_time"],
+            "url": url,
+            "media_url": None
+        }
+
+class DouyinRPA(DouyinRPACommon, BaseRPA):
+    def _download_video(self, page: Page, save_path: Path, download_media: bool, close_btn_selector: str) -> Optional[str]:
+        save_path.parent.mkdir(parents=True, exist_ok=True)
+        self._close_login_popup(page, close_btn_selector)
+
+        video_url = None
+        try:
+            # 优先查找在此函数调用前已经发生的网络请求
+            video_url = page.evaluate(VIDEO_URL_JS)
+
+            # 如果性能记录中没有，尝试监听后续可能发生的请求（如自动播放或触发加载）
+            if not video_url:
+                try:
+                    with page.expect_response(lambda res: "mime_type=video_mp4" in res.url, timeout=3000) as response_info:
+                        video_url = response_info.value.url
+                except:
+                    pass
+        except Exception as e:
+            print(f"Error intercepting video URL: {e}")
+
+        try:
+            if download_media and video_url and video_url.startswith("http"):
+                # 使用 page.request.get 确保使用当前页面的 cookies 和 context
+                response = page.request.get(video_url)
+                if response.ok:
+                    with open(save_path, "wb") as f:
+                        f.write(response.body())
+                else:
+                    print(f"Download failed with status: {response.status}")
+            return video_url or None
+        except Exception as e:
+            print(f"Error during video download: {e}")
+            return None
+
+    def _screenshot(self, page: Page, save_path: Path, close_btn_selector: str) -> str:
+        save_path.parent.mkdir(parents=True, exist_ok=True)
+        self._close_login_popup(page, close_btn_selector)
+        time.sleep(0.3)
+        page.screenshot(path=str(save_path))
+        return "screenshot"
+
+    @tracing.traced()
+    def extract_info(self, page: Page, url: str, download_media: bool) -> RPAResult:
+        kind = self._page_kind(page.url)
+        if self.api_capture and kind:
+            result = self._extract_from_api(page, download_media)
+            if result:
+                return result
+        if kind == "video":
             return self._extract_video(page, download_media)
-        elif "douyin.com/note" in page.url:
+        elif kind == "note":
             return self._extract_note(page, download_media)
         else:
-            return self._convent_json(400, data={"url": page.url}, message="ERROR: 不支持的链接")
+            return self._build_result(400, data={"url": page.url}, message="ERROR: 不支持的链接")
 
-    def _extract_video(self, page: Page, download_media: bool) -> str:
+    @tracing.traced()
+    def _extract_from_api(self, page: Page, download_media: bool) -> Optional[RPAResult]:
+        """
+        接口抓取模式：直接用作品详情接口的 JSON 构建结果，未捕获到接口时返回 None。
+        """
+        data, save_path = self._api_data(self._wait_api_payload(page, "aweme_detail"), page.url)
+        if data is None:
+            return None
+        if download_media and data["media_url"]:
+            self._save_media(page, data["media_url"], save_path)
+        return self._build_result(200, data, message=self.SUCCESS_MESSAGE)
+
+    @tracing.traced()
+    def _extract_video(self, page: Page, download_media: bool) -> RPAResult:
         v_xpaths = self.xpaths["video_xpaths"]
         v_wait_list = self.config.wait_list["video_wait_list"]
-        locators = {k: page.locator(v) for k, v in v_xpaths.items()}
-
-        status = self._poll_until_ready(page, locators, v_wait_list, v_xpaths["video_close_btn"])
-        if status == "ALL_READY":
-            title = self._safe_get_text(locators["video_title"], "video_title")
-            author = self._safe_get_text(locators["video_author"], "video_author")
-            like  = self._safe_get_text(locators["video_likes"], "video_likes")
-            comments = self._safe_get_text(locators["video_comments"], "video_comments")
-            shares = self._safe_get_text(locators["video_shares"], "video_shares")
-            fans = self._safe_get_text(locators["video_fans"], "video_fans")
-            publish_time = self._safe_get_text(locators["video_publish_time"], "video_publish_time")
-            url_long = page.url
-
-            video_url = self._download(page, title, author, download_media, locators["video_video"], v_xpaths["video_close_btn"])
-
-            data = {
-                "title": title,
-                "author": author,
-                "content": None,
-                "likes": like,
-                "comments": comments,
-                "shares": shares,
-                "fans": fans,
-                "publish_time": publish_time,
-                "url": url_long,
-                "media_url": video_url
-            }
-            return self._convent_json(200, data, message="SUCCESS: 抖音数据提取成功")
-        
-        if status == "PAGE_NOT_FOUND":
-            data = {"url": page.url}
-            return self._convent_json(404, data=data, message="PAGE_NOT_FOUND: 作品已下架")
 
-        else:
-            data = {"url": page.url}
-            return self._convent_json(502, data=data, message="ERROR: 抓取数据失败")
+        status = self._poll_until_ready(page, v_xpaths, v_wait_list, v_xpaths["video_close_btn"])
+        if status != "ALL_READY":
+            return self._status_result(status, page.url)
 
-    def _extract_note(self, page: Page, download_media: bool) -> str:
+        fields = self._extract_fields(page, v_xpaths, self.VIDEO_FIELDS, required=v_wait_list)
+        data = self._video_data(fields, page.url)
+        with self._phase("media_download"):
+            data["media_url"] = self._download_video(page, self._video_save_path(data["title"], data["author"]),
+                                                     download_media, v_xpaths["video_close_btn"])
+        return self._build_result(200, data, message=self.SUCCESS_MESSAGE)
+
+    @tracing.traced()
+    def _extract_note(self, page: Page, download_media: bool) -> RPAResult:
         n_xpaths = self.xpaths["note_xpaths"]
         n_wait_list = self.config.wait_list["note_wait_list"]
-        locators = {k: page.locator(v) for k, v in n_xpaths.items()}
-
-        status = self._poll_until_ready(page, locators, n_wait_list, n_xpaths["note_close_btn"])
-        if status == "ALL_READY":
-
-            title_raw = self._safe_get_text(locators["note_title"], "note_title")
-            title = re.split(r"发布时间：", title_raw.replace("\n", "").strip())[0].strip() if title_raw else None
-            author = self._safe_get_text(locators["note_author"], "note_author")
-            # Douyin note stats are often combined in one element, need custom parsing if necessary
-            # but original code had some specific logic:
-
-            # self._close_login_popup(page, n_xpaths["note_close_btn"])
-            likes_comments_favorites_shares = locators["note_likes"].first.inner_text(timeout=1000)
-            likes, comments, favorites, shares = None, None, None, None
-            if likes_comments_favorites_shares:
-                parts = likes_comments_favorites_shares.split("\n")
-                if len(parts) >= 1: likes = parts[0].strip()
-                if len(parts) >= 2: comments = parts[1].strip()
-                if len(parts) >= 3: favorites = parts[2].strip()
-                if len(parts) >= 4: shares = parts[3].strip()
-
-            media_url = self._download(page, title, author, download_media, None, n_xpaths["note_close_btn"])
-
-            data = {
-                "title": None,
-                "author": author,
-                "content": title, # Use title as content for notes
-                "likes": likes,
-                "comments": comments,
-                "shares": shares,
-                "fans": self._safe_get_text(locators["note_fans"], "note_fans"),
-                "publish_time": self._safe_get_text(locators["note_publish_time"], "note_publish_time"),
-                "url": page.url,
-                "media_url": media_url
-            }
-            return self._convent_json(200, data, message="SUCCESS: 抖音数据提取成功")
-        
-        if status == "PAGE_NOT_FOUND":
-            data = {"url": page.url}
-            return self._convent_json(404, data=data, message="PAGE_NOT_FOUND: 作品已下架")
 
+        status = self._poll_until_ready(page, n_xpaths, n_wait_list, n_xpaths["note_close_btn"])
+        if status != "ALL_READY":
+            return self._status_result(status, page.url)
+
+        fields = self._extract_fields(page, n_xpaths, self.NOTE_FIELDS, required=n_wait_list)
+        data = self._note_data(fields, page.url)
+        with self._phase("media_download"):
+            data["media_url"] = self._screenshot(page, self._note_save_path(data["author"]), n_xpaths["note_close_btn"])
+        return self._build_result(200, data, message=self.SUCCESS_MESSAGE)
+
+class AsyncDouyinRPA(DouyinRPACommon, AsyncBaseRPA):
+    """
+    抖音抓取（异步引擎），与 DouyinRPA 共用 DouyinRPACommon，供 FastAPI 服务在事件循环内使用。
+    """
+    async def _download_video(self, page: AsyncPage, save_path: Path, download_media: bool, close_btn_selector: str) -> Optional[str]:
+        save_path.parent.mkdir(parents=True, exist_ok=True)
+        await self._close_login_popup(page, close_btn_selector)
+
+        video_url = None
+        try:
+            # 优先查找在此函数调用前已经发生的网络请求
+            video_url = await page.evaluate(VIDEO_URL_JS)
+
+            # 如果性能记录中没有，尝试监听后续可能发生的请求
+            if not video_url:
+                try:
+                    async with page.expect_response(lambda res: "mime_type=video_mp4" in res.url, timeout=3000) as response_info:
+                        pass
+                    video_url = (await response_info.value).url
+                except Exception:
+                    pass
+        except Exception as e:
+            print(f"Error intercepting video URL: {e}")
+
+        try:
+            if download_media and video_url and video_url.startswith("http"):
+                response = await page.request.get(video_url)
+                if response.ok:
+                    body = await response.body()
+                    await asyncio.to_thread(save_path.write_bytes, body)
+                else:
+                    print(f"Download failed with status: {response.status}")
+            return video_url or None
+        except Exception as e:
+            print(f"Error during video download: {e}")
+            return None
+
+    async def _screenshot(self, page: AsyncPage, save_path: Path, close_btn_selector: str) -> str:
+        save_path.parent.mkdir(parents=True, exist_ok=True)
+        await self._close_login_popup(page, close_btn_selector)
+        await asyncio.sleep(0.3)
+        await page.screenshot(path=str(save_path))
+        return "screenshot"
+
+    @tracing.traced()
+    async def extract_info(self, page: AsyncPage, url: str, download_media: bool) -> RPAResult:
+        kind = self._page_kind(page.url)
+        if self.api_capture and kind:
+            result = await self._extract_from_api(page, download_media)
+            if result:
+                return result
+        if kind == "video":
+            return await self._extract_video(page, download_media)
+        elif kind == "note":
+            return await self._extract_note(page, download_media)
         else:
-            data = {"url": page.url}
-            return self._convent_json(502, data=data, message="ERROR: 抓取数据失败")
+            return self._build_result(400, data={"url": page.url}, message="ERROR: 不支持的链接")
+
+    @tracing.traced()
+    async def _extract_from_api(self, page: AsyncPage, download_media: bool) -> Optional[RPAResult]:
+        """
+        接口抓取模式：直接用作品详情接口的 JSON 构建结果，未捕获到接口时返回 None。
+        """
+        data, save_path = self._api_data(await self._wait_api_payload(page, "aweme_detail"), page.url)
+        if data is None:
+            return None
+        if download_media and data["media_url"]:
+            await self._save_media(page, data["media_url"], save_path)
+        return self._build_result(200, data, message=self.SUCCESS_MESSAGE)
+
+    @tracing.traced()
+    async def _extract_video(self, page: AsyncPage, download_media: bool) -> RPAResult:
+        v_xpaths = self.xpaths["video_xpaths"]
+        v_wait_list = self.config.wait_list["video_wait_list"]
+
+        status = await self._poll_until_ready(page, v_xpaths, v_wait_list, v_xpaths["video_close_btn"])
+        if status != "ALL_READY":
+            return self._status_result(status, page.url)
+
+        fields = await self._extract_fields(page, v_xpaths, self.VIDEO_FIELDS, required=v_wait_list)
+        data = self._video_data(fields, page.url)
+        with self._phase("media_download"):
+            data["media_url"] = await self._download_video(page, self._video_save_path(data["title"], data["author"]),
+                                                           download_media, v_xpaths["video_close_btn"])
+        return self._build_result(200, data, message=self.SUCCESS_MESSAGE)
+
+    @tracing.traced()
+    async def _extract_note(self, page: AsyncPage, download_media: bool) -> RPAResult:
+        n_xpaths = self.xpaths["note_xpaths"]
+        n_wait_list = self.config.wait_list["note_wait_list"]
+
+        status = await self._poll_until_ready(page, n_xpaths, n_wait_list, n_xpaths["note_close_btn"])
+        if status != "ALL_READY":
+            return self._status_result(status, page.url)
+
+        fields = await self._extract_fields(page, n_xpaths, self.NOTE_FIELDS, required=n_wait_list)
+        data = self._note_data(fields, page.url)
+        with self._phase("media_download"):
+            data["media_url"] = await self._screenshot(page, self._note_save_path(data["author"]), n_xpaths["note_close_btn"])
+        return self._build_result(200, data, message=self.SUCCESS_MESSAGE)
 
 def get_douyin_short_video_info(url, xpaths, wait_list, save_dir, download_video=False, user_data_dir: Optional[str] = None, headless: bool = False, user_agent: Optional[str] = None, viewport: Optional[Dict[str, int]] = None, timezone_id: Optional[str] = None):
+    """
+    兼容旧接口：返回 JSON 字符串（RPAResult.to_json()）。
+    """
     config = Config_Douyin()
     rpa = DouyinRPA(config)
-    return rpa.run(url, download_media=download_video, user_data_dir=user_data_dir, headless=headless, user_agent=user_agent, viewport=viewport, timezone_id=timezone_id)
+    return rpa.run(url, download_media=download_video, user_data_dir=user_data_dir, headless=headless, user_agent=user_agent, viewport=viewport, timezone_id=timezone_id).to_json()
 
 if __name__ == "__main__":
     url = "https://v.douyin.com/CpcD7JUpYEk/"
     config = Config_Douyin()
     rpa = DouyinRPA(config)
     result = rpa.run(url, download_media=False, headless=False)
-    print(result)
+    print(result.to_json())
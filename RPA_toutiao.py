@@ -1,21 +1,103 @@
+import asyncio
 from pathlib import Path
 from typing import Optional
-from base_rpa import BaseRPA
+import tracing
+from base_rpa import BaseRPA, RPACommon
+from async_base_rpa import AsyncBaseRPA
+from rpa_result import RPAResult
 from config import Config_Toutiao
+from toutiao_http import ToutiaoHttpExtractor
 from playwright.sync_api import Page, Locator
+from playwright.async_api import Page as AsyncPage
 import time
 from typing import Optional, Any, Dict, List
 
-class ToutiaoRPA(BaseRPA):
+class ToutiaoRPACommon(RPACommon):
+    """
+    今日头条同步/异步引擎共用的部分：HTTP 快速通道的开关、保存路径和各类页面结果数据的组装，
+    两个引擎只负责各自的 Playwright 调用。
+    """
+    W_FIELDS = ["w_author", "w_content", "w_likes", "w_publish_time"]
+    VIDEO_FIELDS = ["video_author", "video_content", "video_likes", "video_publish_time"]
+    ARTICLE_FIELDS = ["a_title", "a_author", "a_article", "a_likes", "a_comments", "a_publish_time"]
+    # 文章与微头条使用同一条成功消息（与 toutiao_http 快速通道一致）
+    W_MESSAGE = "SUCCESS: 微头条数据提取成功"
+    VIDEO_MESSAGE = "SUCCESS: 头条数据提取成功"
+
     def __init__(self, config: Config_Toutiao):
         super().__init__(config, "头条")
 
-    def _check_error_states(self, page: Page) -> Optional[str]:
-        if page.get_by_text("内容不存在").count() > 0:
-            return "PAGE_NOT_FOUND"
-        if page.get_by_text("当前内容无法展示").count() > 0:
-            return "PAGE_NOT_FOUND"
-        return None
+    def _http_extractor(self) -> Optional[ToutiaoHttpExtractor]:
+        """
+        文章/微头条的 HTTP 快速通道（见 toutiao_http.py），配置关闭时返回 None。用完需要 close。
+        """
+        if not getattr(self.config, "http_fast_path", False):
+            return None
+        return ToutiaoHttpExtractor(self.config)
+
+    def _video_save_path(self, author: Optional[str]) -> Path:
+        return self._media_save_path(author, suffix=".mp4")
+
+    def _weitoutiao_data(self, fields: Dict[str, Optional[str]], url: str) -> Dict[str, Any]:
+        return {
+            "title": None,
+            "author": fields["w_author"],
+            "content": fields["w_content"],
+            "likes": fields["w_likes"],
+            "publish_time": fields["w_publish_time"],
+            "web_name": "微头条",
+            "url": url,
+            "media_url": None,
+            "comments": None,
+            "shares": None,
+            "fans": None
+        }
+
+    def _video_data(self, fields: Dict[str, Optional[str]], url: str) -> Dict[str, Any]:
+        """
+        视频页提取的字段转换为 _build_result 所需的 data，media_url 由调用方下载媒体后填入。
+        """
+        return {
+            "title": fields["video_content"],
+            "author": fields["video_author"],
+            "content": None,
+            "likes": fields["video_likes"],
+            "publish_time": fields["video_publish_time"],
+            "url": url,
+            "media_url": None,
+            "comments": None,
+            "shares": None,
+            "fans": None
+        }
+
+    def _article_data(self, fields: Dict[str, Optional[str]], url: str) -> Dict[str, Any]:
+        return {
+            "title": fields["a_title"],
+            "author": fields["a_author"],
+            "content": fields["a_article"],
+            "likes": fields["a_likes"],
+            "comments": fields["a_comments"],
+            "publish_time": fields["a_publish_time"],
+            "web_name": "头条文章",
+            "url": url,
+            "media_url": None,
+            "shares": None,
+            "fans": None
+        }
+
+class ToutiaoRPA(ToutiaoRPACommon, BaseRPA):
+    def _run_without_browser(self, url: str, download_media: bool) -> Optional[RPAResult]:
+        """
+        文章/微头条先走 HTTP 快速通道（见 toutiao_http.py），解析失败再打开浏览器。
+        """
+        extractor = self._http_extractor()
+        if extractor is None:
+            return None
+        try:
+            return extractor.extract(url)
+        finally:
+            extractor.close()
+
     def check_404(self, page: Page, locators: Dict[str, Locator], wait_keys: List[str], 
                           close_btn_selector: Optional[str] = None, timeout: float = 12.0) -> str:
         """
@@ -41,8 +123,7 @@ class ToutiaoRPA(BaseRPA):
             time.sleep(0.5)
         
         return "TIMEOUT"
-    def _download_video(self, page: Page, author: str, download_media: bool, video_selector: str) -> Optional[str]:
-        save_path = Path(self.save_dir) / f"{self._safe_filename(author)}.mp4"
+    def _download_video(self, page: Page, save_path: Path, download_media: bool, video_selector: str) -> Optional[str]:
         save_path.parent.mkdir(parents=True, exist_ok=True)
 
         try:
@@ -51,9 +132,7 @@ class ToutiaoRPA(BaseRPA):
             video_url = loc.get_attribute("src")
             if not video_url: return None
             
-            if video_url.startswith("//"):
-                video_url = "https:" + video_url
-            
+            video_url = self._absolute_url(video_url)
             if download_media:
                 headers = {"Referer": "https://www.toutiao.com/", "User-Agent": page.evaluate("navigator.userAgent")}
                 response = page.request.get(video_url, headers=headers, timeout=10000)
@@ -64,7 +143,8 @@ class ToutiaoRPA(BaseRPA):
         except Exception:
             return None
 
-    def extract_info(self, page: Page, url: str, download_media: bool) -> str:
+    @tracing.traced()
+    def extract_info(self, page: Page, url: str, download_media: bool) -> RPAResult:
         if "toutiao.com/w" in page.url:
             return self._extract_weitoutiao(page, download_media)
         elif "toutiao.com/video" in page.url:
@@ -72,111 +152,147 @@ class ToutiaoRPA(BaseRPA):
         elif "toutiao.com/article" in page.url:
             return self._extract_article(page, download_media)
         elif "toutiao.com/login" in page.url:
-            return self._convent_json(403, message="LOGIN_REQUIRED: 需登录后访问")
-        else:   # 对其他链接先404检查，否则才抛出400
-            start = time.time()
-            while time.time() - start < 1:  # 设置1s超时
-                # 检查特定平台的错误状态（如 404、需扫码403）
-                error_state = self._check_error_states(page)
-                if error_state == "PAGE_NOT_FOUND":
-                    return self._convent_json(404, data={"url": page.url}, message="PAGE_NOT_FOUND: 作品已下架")
-                time.sleep(0.3)
-            return self._convent_json(400, message="URL_NOT_SUPPORTED: 不支持的今日头条URL格式")
-
-    def _extract_weitoutiao(self, page: Page, download_media: bool) -> str:
+            return self._build_result(403, message="LOGIN_REQUIRED: 需登录后访问")
+        else:   # 对其他链接先404检查（只检测错误状态，1s 超时），否则才抛出400
+            if self._poll_until_ready(page, {}, None, timeout=1) == "PAGE_NOT_FOUND":
+                return self._build_result(404, data={"url": page.url}, message="PAGE_NOT_FOUND: 作品已下架")
+            return self._build_result(400, message="URL_NOT_SUPPORTED: 不支持的今日头条URL格式")
+
+    @tracing.traced()
+    def _extract_weitoutiao(self, page: Page, download_media: bool) -> RPAResult:
         w_xpaths = self.xpaths["w_xpaths"]
         w_wait_list = self.config.wait_list["w_wait_list"]
-        locators = {k: page.locator(v) for k, v in w_xpaths.items()}
-
-        status = self._poll_until_ready(page, locators, w_wait_list)
-        if status == "ALL_READY":
-            data = {
-                "title": None,
-                "author": self._safe_get_text(locators["w_author"], "w_author"),
-                "content": self._safe_get_text(locators["w_content"], "w_content"),
-                "likes": self._safe_get_text(locators["w_likes"], "w_likes"),
-                "publish_time": self._safe_get_text(locators["w_publish_time"], "w_publish_time"),
-                "web_name": "微头条",
-                "url": page.url,
-                "media_url": None,
-                "comments": None,
-                "shares": None,
-                "fans": None
-            }
-            return self._convent_json(200, data, message="SUCCESS: 微头条数据提取成功")
-        if status == "PAGE_NOT_FOUND":
-            return self._convent_json(404, data={"url": page.url}, message="PAGE_NOT_FOUND: 作品已下架")
-        else:
-            return self._convent_json(502, data={"url": page.url}, message="ERROR: 抓取数据失败")
-
-    def _extract_video(self, page: Page, download_media: bool) -> str:
+
+        status = self._poll_until_ready(page, w_xpaths, w_wait_list)
+        if status != "ALL_READY":
+            return self._status_result(status, page.url)
+        fields = self._extract_fields(page, w_xpaths, self.W_FIELDS, required=w_wait_list)
+        return self._build_result(200, self._weitoutiao_data(fields, page.url), message=self.W_MESSAGE)
+
+    @tracing.traced()
+    def _extract_video(self, page: Page, download_media: bool) -> RPAResult:
         v_xpaths = self.xpaths["video_xpaths"]
         v_wait_list = self.config.wait_list["video_wait_list"]
-        locators = {k: page.locator(v) for k, v in v_xpaths.items()}
 
-        status = self._poll_until_ready(page, locators, v_wait_list)
-        if status == "ALL_READY":
-            author = self._safe_get_text(locators["video_author"], "video_author")
-            video_url = self._download_video(page, author or "unnamed", download_media, v_xpaths["video_video"])
-            
-            data = {
-                "title": self._safe_get_text(locators["video_content"], "video_content"),
-                "author": author,
-                "content": None,
-                "likes": self._safe_get_text(locators["video_likes"], "video_likes"),
-                "publish_time": self._safe_get_text(locators["video_publish_time"], "video_publish_time"),
-                "url": page.url,
-                "media_url": video_url,
-                "comments": None,
-                "shares": None,
-                "fans": None
-            }
-            return self._convent_json(200, data, message="SUCCESS: 头条数据提取成功")
-        
-        if status == "PAGE_NOT_FOUND":
-            data = {"url": page.url}
-            return self._convent_json(404, data=data, message="PAGE_NOT_FOUND: 作品已下架")
-        elif status == "MOBILE_LINK":
-            data = {"url": page.url}
-            return self._convent_json(403, data=data, message="ERROR: 需要 APP 扫码授权")
-        else:
-            data = {"url": page.url}
-            return self._convent_json(502, data=data, message="ERROR: 抓取数据失败")
-
-    def _extract_article(self, page: Page, download_media: bool) -> str:
+        status = self._poll_until_ready(page, v_xpaths, v_wait_list)
+        if status != "ALL_READY":
+            return self._status_result(status, page.url)
+        fields = self._extract_fields(page, v_xpaths, self.VIDEO_FIELDS, required=v_wait_list)
+        data = self._video_data(fields, page.url)
+        with self._phase("media_download"):
+            data["media_url"] = self._download_video(page, self._video_save_path(data["author"]), download_media, v_xpaths["video_video"])
+        return self._build_result(200, data, message=self.VIDEO_MESSAGE)
+
+    @tracing.traced()
+    def _extract_article(self, page: Page, download_media: bool) -> RPAResult:
+        a_xpaths = self.xpaths["a_xpaths"]
+        a_wait_list = self.config.wait_list["a_wait_list"]
+
+        status = self._poll_until_ready(page, a_xpaths, a_wait_list)
+        if status != "ALL_READY":
+            return self._status_result(status, page.url)
+        fields = self._extract_fields(page, a_xpaths, self.ARTICLE_FIELDS, required=a_wait_list)
+        return self._build_result(200, self._article_data(fields, page.url), message=self.W_MESSAGE)
+
+class AsyncToutiaoRPA(ToutiaoRPACommon, AsyncBaseRPA):
+    """
+    今日头条抓取（异步引擎），与 ToutiaoRPA 共用 ToutiaoRPACommon，供 FastAPI 服务在事件循环内使用。
+    """
+    async def _run_without_browser(self, url: str, download_media: bool) -> Optional[RPAResult]:
+        """
+        文章/微头条先走 HTTP 快速通道（在线程中执行），解析失败再打开浏览器。
+        服务端在占用浏览器标签页之前单独调用快速通道，不经过这里。
+        """
+        extractor = self._http_extractor()
+        if extractor is None:
+            return None
+        try:
+            return await asyncio.to_thread(extractor.extract, url)
+        finally:
+            extractor.close()
+
+    async def _download_video(self, page: AsyncPage, save_path: Path, download_media: bool, video_selector: str) -> Optional[str]:
+        save_path.parent.mkdir(parents=True, exist_ok=True)
+
+        try:
+            loc = page.locator(video_selector).first
+            await loc.wait_for(state="attached", timeout=5000)
+            video_url = await loc.get_attribute("src")
+            if not video_url: return None
+
+            video_url = self._absolute_url(video_url)
+            if download_media:
+                headers = {"Referer": "https://www.toutiao.com/", "User-Agent": await page.evaluate("navigator.userAgent")}
+                response = await page.request.get(video_url, headers=headers, timeout=10000)
+                if response.ok:
+                    body = await response.body()
+                    await asyncio.to_thread(save_path.write_bytes, body)
+            return video_url
+        except Exception:
+            return None
+
+    @tracing.traced()
+    async def extract_info(self, page: AsyncPage, url: str, download_media: bool) -> RPAResult:
+        if "toutiao.com/w" in page.url:
+            return await self._extract_weitoutiao(page, download_media)
+        elif "toutiao.com/video" in page.url:
+            return await self._extract_video(page, download_media)
+        elif "toutiao.com/article" in page.url:
+            return await self._extract_article(page, download_media)
+        elif "toutiao.com/login" in page.url:
+            return self._build_result(403, message="LOGIN_REQUIRED: 需登录后访问")
+        else:   # 对其他链接先404检查（只检测错误状态，1s 超时），否则才抛出400
+            if await self._poll_until_ready(page, {}, None, timeout=1) == "PAGE_NOT_FOUND":
+                return self._build_result(404, data={"url": page.url}, message="PAGE_NOT_FOUND: 作品已下架")
+            return self._build_result(400, message="URL_NOT_SUPPORTED: 不支持的今日头条URL格式")
+
+    @tracing.traced()
+    async def _extract_weitoutiao(self, page: AsyncPage, download_media: bool) -> RPAResult:
+        w_xpaths = self.xpaths["w_xpaths"]
+        w_wait_list = self.config.wait_list["w_wait_list"]
+
+        status = await self._poll_until_ready(page, w_xpaths, w_wait_list)
+        if status != "ALL_READY":
+            return self._status_result(status, page.url)
+        fields = await self._extract_fields(page, w_xpaths, self.W_FIELDS, required=w_wait_list)
+        return self._build_result(200, self._weitoutiao_data(fields, page.url), message=self.W_MESSAGE)
+
+    @tracing.traced()
+    async def _extract_video(self, page: AsyncPage, download_media: bool) -> RPAResult:
+        v_xpaths = self.xpaths["video_xpaths"]
+        v_wait_list = self.config.wait_list["video_wait_list"]
+
+        status = await self._poll_until_ready(page, v_xpaths, v_wait_list)
+        if status != "ALL_READY":
+            return self._status_result(status, page.url)
+        fields = await self._extract_fields(page, v_xpaths, self.VIDEO_FIELDS, required=v_wait_list)
+        data = self._video_data(fields, page.url)
+        with self._phase("media_download"):
+            data["media_url"] = await self._download_video(page, self._video_save_path(data["author"]), download_media, v_xpaths["video_video"])
+        return self._build_result(200, data, message=self.VIDEO_MESSAGE)
+
+    @tracing.traced()
+    async def _extract_article(self, page: AsyncPage, download_media: bool) -> RPAResult:
         a_xpaths = self.xpaths["a_xpaths"]
         a_wait_list = self.config.wait_list["a_wait_list"]
-        locators = {k: page.locator(v) for k, v in a_xpaths.items()}
-
-        status = self._poll_until_ready(page, locators, a_wait_list)
-        if status == "ALL_READY":
-            data = {
-                "title": self._safe_get_text(locators["a_title"], "a_title"),
-                "author": self._safe_get_text(locators["a_author"], "a_author"),
-                "content": self._safe_get_text(locators["a_article"], "a_article"),
-                "likes": self._safe_get_text(locators["a_likes"], "a_likes"),
-                "comments": self._safe_get_text(locators["a_comments"], "a_comments"),
-                "publish_time": self._safe_get_text(locators["a_publish_time"], "a_publish_time"),
-                "web_name": "头条文章",
-                "url": page.url,
-                "media_url": None,
-                "shares": None,
-                "fans": None
-            }
-            return self._convent_json(200, data, message="SUCCESS: 微头条数据提取成功")
-        if status == "PAGE_NOT_FOUND":
-            return self._convent_json(404, data={"url": page.url}, message="PAGE_NOT_FOUND: 作品已下架")
-        else:
-            return self._convent_json(502, data={"url": page.url}, message="ERROR: 抓取数据失败")
+
+        status = await self._poll_until_ready(page, a_xpaths, a_wait_list)
+        if status != "ALL_READY":
+            return self._status_result(status, page.url)
+        fields = await self._extract_fields(page, a_xpaths, self.ARTICLE_FIELDS, required=a_wait_list)
+        return self._build_result(200, self._article_data(fields, page.url), message=self.W_MESSAGE)
 
 def get_toutiao_info(url, xpaths, wait_list, save_dir, download_video=False, user_data_dir: Optional[str] = None, headless: bool = False, user_agent: Optional[str] = None, viewport: Optional[Dict[str, int]] = None, timezone_id: Optional[str] = None):
+    """
+    兼容旧接口：返回 JSON 字符串（RPAResult.to_json()）。
+    """
     config = Config_Toutiao()
     rpa = ToutiaoRPA(config)
-    return rpa.run(url, download_media=download_video, user_data_dir=user_data_dir, headless=headless, user_agent=user_agent, viewport=viewport, timezone_id=timezone_id)
+    return rpa.run(url, download_media=download_video, user_data_dir=user_data_dir, headless=headless, user_agent=user_agent, viewport=viewport, timezone_id=timezone_id).to_json()
 
 if __name__ == "__main__":
     url = "https://m.toutiao.com/article/7555347911730676233/?app=news_article&category_new=__search__&module_name=Android_tt_others&share_did=MS4wLjACAAAAxMTOW9OFmwO1BIKhPg2st-nicYPfGJux1scZxlFuIZNwhHscB0hTHhBTYjVZYwN-&share_uid=MS4wLjABAAAAxMTOW9OFmwO1BIKhPg2st-nicYPfGJux1scZxlFuIZNwhHscB0hTHhBTYjVZYwN-&timestamp=1767146449&tt_from=wechat&upstream_biz=Android_wechat&utm_campaign=client_share&utm_medium=toutiao_android&utm_source=wechat&share_token=ca74277c-e0a9-488f-9ba5-7ab68681a519"
     config = Config_Toutiao()
     rpa = ToutiaoRPA(config)
     result = rpa.run(url, download_media=False, headless=False)
-    print(result)
+    print(result.to_json())
@@ -1,45 +1,115 @@
+import asyncio
 import time
 from pathlib import Path
-from typing import Optional, Dict
-from base_rpa import BaseRPA
+from typing import Optional, Any, Dict, List
+import tracing
+from base_rpa import BaseRPA, RPACommon
+from async_base_rpa import AsyncBaseRPA
+from rpa_result import RPAResult
 from config import Config_Xhs
-from playwright.sync_api import Page, sync_playwright
+from playwright.sync_api import Page
+from playwright.async_api import Page as AsyncPage
 
-class XhsRPA(BaseRPA):
-    def __init__(self, config: Config_Xhs):
-        super().__init__(config, "小红书")
+def parse_note_feed(payload: Optional[Dict[str, Any]], url: str) -> Optional[Dict[str, Any]]:
+    """
+    将笔记详情接口（/api/sns/web/v1/feed）的 JSON 转换为 _build_result 所需的 data。
+    发布时间为毫秒时间戳；接口未返回笔记（已删除/需登录）时返回 None。
+    """
+    items = ((payload or {}).get("data") or {}).get("items") or []
+    note = (items[0].get("note_card") if items else None) or {}
+    if not note:
+        return None
+    interact = note.get("interact_info") or {}
+    media_url = None
+    streams = (((note.get("video") or {}).get("media") or {}).get("stream") or {}).get("h264") or []
+    if streams:
+        media_url = streams[0].get("master_url")
+    elif note.get("image_list"):
+        image = note["image_list"][0]
+        media_url = image.get("url_default") or image.get("url")
+    return {
+        "title": note.get("title"),
+        "author": (note.get("user") or {}).get("nickname"),
+        "content": note.get("desc"),
+        "likes": interact.get("liked_count"),
+        "comments": interact.get("comment_count"),
+        "shares": interact.get("share_count"),
+        "publish_time": note.get("time"),
+        "url": url,
+        "media_url": media_url,
+        "fans": None
+    }
+
+class XhsRPACommon(RPACommon):
+    """
+    小红书同步/异步引擎共用的部分：首次访问标记、媒体选择器的优先级、保存路径和结果数据的组装，
+    两个引擎只负责各自的 Playwright 调用。首次访问标记文件两种引擎共用，可以混用同一个 Profile 目录。
+    """
+    PAGE_FIELDS = ["title", "author", "content", "likes", "comments", "publish_time"]
+    SUCCESS_MESSAGE = "SUCCESS: 小红书数据提取成功"
+
+    def __init__(self, config: Config_Xhs, api_capture: Optional[bool] = None):
+        super().__init__(config, "小红书", api_capture)
         self.xhs_homepage = "https://www.xiaohongshu.com"
 
     def _is_first_visit(self, user_data_dir: str) -> bool:
         """检查当前 context 是否是首次访问小红书"""
         marker_file = Path(user_data_dir) / ".xhs_initialized"
         return not marker_file.exists()
-    
+
     def _mark_as_visited(self, user_data_dir: str):
         """标记当前 context 已经访问过小红书主页"""
         marker_file = Path(user_data_dir) / ".xhs_initialized"
         marker_file.parent.mkdir(parents=True, exist_ok=True)
         marker_file.touch()
 
-    def _check_error_states(self, page: Page) -> Optional[str]:
-        if page.get_by_text("你访问的页面不见了").count() > 0:
-            return "PAGE_NOT_FOUND"
-        if page.get_by_text("请打开小红书App扫码查看").count() > 0:
-            return "MOBILE_LINK"
-        if "com/explore" in page.url:
-            return "MOBILE_LINK"
-        if "com/login" in page.url:
-            return "REDIRECT_WARNING"
-        return None
+    def _unvisited_profile(self, user_data_dir: Optional[str]) -> Optional[str]:
+        """
+        返回需要先访问主页的 Profile 目录（该 context 首次使用），已访问过时返回 None。
+        """
+        # 如果未指定 user_data_dir，使用默认路径
+        if user_data_dir is None:
+            user_data_dir = str(Path(__file__).parent / "chrome-profile")
+        return user_data_dir if self._is_first_visit(user_data_dir) else None
 
-    def _download(self, page: Page, title: str, author: str, download_media: bool) -> str:
+    def _media_selectors(self) -> List[str]:
         # 优先级：视频 -> 图片直播 -> 普通图片 -> 封面图
-        media_selectors = ["video", "video source", self.xpaths["img_live"], self.xpaths["img"], self.xpaths["cover"]]
-        
-        save_path = Path(self.save_dir) / f"{self._safe_filename(title)}-{self._safe_filename(author)}.jpg"
+        return ["video", "video source", self.xpaths["img_live"], self.xpaths["img"], self.xpaths["cover"]]
+
+    def _note_save_path(self, title: Optional[str], author: Optional[str]) -> Path:
+        return self._media_save_path(title, author, suffix=".jpg")
+
+    def _api_data(self, payload: Optional[Dict[str, Any]], url: str) -> Optional[Dict[str, Any]]:
+        """
+        接口抓取模式：把笔记详情接口的 JSON 转换为 _build_result 所需的 data，未捕获到接口时返回 None。
+        """
+        data = parse_note_feed(payload, url)
+        if data is None:
+            print(f"INFO: [{self.web_name}] 未捕获到笔记详情接口，回退到页面提取")
+        return data
+
+    def _page_data(self, fields: Dict[str, Optional[str]], url: str) -> Dict[str, Any]:
+        """
+        页面提取的字段转换为 _build_result 所需的 data，media_url 由调用方下载媒体后填入。
+        """
+        return {
+            "title": fields["title"],
+            "author": fields["author"],
+            "content": fields["content"],
+            "likes": fields["likes"],
+            "comments": fields["comments"],
+            "publish_time": fields["publish_time"],
+            "url": url,
+            "media_url": None,
+            "shares": None,
+            "fans": None
+        }
+
+class XhsRPA(XhsRPACommon, BaseRPA):
+    def _download(self, page: Page, save_path: Path, download_media: bool) -> str:
         save_path.parent.mkdir(parents=True, exist_ok=True)
 
-        for selector in media_selectors:
+        for selector in self._media_selectors():
             try:
                 loc = page.locator(selector).first
                 if loc.count() == 0:
@@ -49,9 +119,7 @@ class XhsRPA(BaseRPA):
                 if not media_url:
                     continue
 
-                if media_url.startswith("//"):
-                    media_url = "https:" + media_url
-
+                media_url = self._absolute_url(media_url)
                 if download_media:
                     response = page.request.get(media_url)
                     with open(save_path, "wb") as f:
@@ -66,97 +134,137 @@ class XhsRPA(BaseRPA):
         page.screenshot(path=str(save_path))
         return "screenshot"
 
-    def run(self, url: str, download_media: bool = False, user_data_dir: Optional[str] = None, headless: bool = False, user_agent: Optional[str] = None, viewport: Optional[Dict[str, int]] = None, timezone_id: Optional[str] = None) -> str:
+    @tracing.traced()
+    def _extract_from_api(self, page: Page, download_media: bool) -> Optional[RPAResult]:
         """
-        重写 run 方法，添加首次访问小红书主页的逻辑（用于反爬）。
-        
-        :param url: 目标页面 URL
-        :param download_media: 是否下载媒体文件
-        :param user_data_dir: 浏览器用户数据目录
-        :param headless: 是否使用无头模式
-        :param user_agent: 用户代理字符串
-        :param viewport: 视口大小 {"width": 1920, "height": 1080}
-        :param timezone_id: 时区 ID，如 "Asia/Shanghai"
-        :return: JSON 结果字符串
+        接口抓取模式：直接用笔记详情接口的 JSON 构建结果，未捕获到接口时返回 None。
         """
-        # 如果未指定 user_data_dir，使用默认路径
-        if user_data_dir is None:
-            user_data_dir = str(Path(__file__).parent / "chrome-profile")
-        
-        # 检查是否需要首次访问主页
-        is_first_visit = self._is_first_visit(user_data_dir)
-        
-        with sync_playwright() as p:
-            browser_context = self._get_browser_context(p, user_data_dir, headless, user_agent, viewport, timezone_id)
+        data = self._api_data(self._wait_api_payload(page, "note_feed"), page.url)
+        if data is None:
+            return None
+        if download_media and data["media_url"]:
+            self._save_media(page, data["media_url"], self._note_save_path(data["title"], data["author"]))
+        return self._build_result(200, data, message=self.SUCCESS_MESSAGE)
+
+    def _before_goto(self, page: Page, user_data_dir: Optional[str]):
+        """
+        首次使用某个 context 时先访问小红书主页（用于反爬）。
+        """
+        user_data_dir = self._unvisited_profile(user_data_dir)
+        if user_data_dir:
+            print(f"[INFO] 检测到新的 context，首次访问小红书主页: {self.xhs_homepage}")
+            page.goto(self.xhs_homepage, wait_until="domcontentloaded")
+            print("[INFO] 小红书主页加载完成，等待 2 秒...")
+            time.sleep(1)  # 额外等待一下，让页面完全加载
+            self._mark_as_visited(user_data_dir)
+            print("[INFO] 已标记为已访问，后续访问将跳过主页")
+
+    def _after_goto(self, page: Page):
+        time.sleep(1)
+
+    @tracing.traced()
+    def extract_info(self, page: Page, url: str, download_media: bool) -> RPAResult:
+        if self.api_capture:
+            result = self._extract_from_api(page, download_media)
+            if result:
+                return result
+        status = self._poll_until_ready(page, self.xpaths, self.wait_list, self.xpaths["close_btn"])
+        if status != "ALL_READY":
+            return self._status_result(status, page.url)
+
+        fields = self._extract_fields(page, self.xpaths, self.PAGE_FIELDS, required=self.wait_list)
+        data = self._page_data(fields, page.url)
+        with self._phase("media_download"):
+            data["media_url"] = self._download(page, self._note_save_path(data["title"], data["author"]), download_media)
+        return self._build_result(200, data, message=self.SUCCESS_MESSAGE)
+
+class AsyncXhsRPA(XhsRPACommon, AsyncBaseRPA):
+    """
+    小红书抓取（异步引擎），与 XhsRPA 共用 XhsRPACommon，供 FastAPI 服务在事件循环内使用。
+    """
+    async def _download(self, page: AsyncPage, save_path: Path, download_media: bool) -> str:
+        save_path.parent.mkdir(parents=True, exist_ok=True)
+
+        for selector in self._media_selectors():
             try:
-                page = browser_context.new_page()
-                
-                # 如果是首次访问，先访问小红书主页
-                if is_first_visit:
-                    print(f"[INFO] 检测到新的 context，首次访问小红书主页: {self.xhs_homepage}")
-                    page.goto(self.xhs_homepage, wait_until="domcontentloaded")
-                    print("[INFO] 小红书主页加载完成，等待 2 秒...")
-                    time.sleep(1)  # 额外等待一下，让页面完全加载
-                    self._mark_as_visited(user_data_dir)
-                    print("[INFO] 已标记为已访问，后续访问将跳过主页")
-                
-                # 访问目标 URL
-                print(f"Opening {url} ...")
-                page.goto(url, wait_until="domcontentloaded")
-                time.sleep(1)
-                return self.extract_info(page, url, download_media)
-            except Exception as e:
-                print(f"Error: {str(e)}")
-                return self._convent_json(502, data={"url": page.url if 'page' in locals() else url}, message="ERROR: 抓取数据失败")
-            finally:
-                browser_context.close()
-
-    def extract_info(self, page: Page, url: str, download_media: bool) -> str:
-        locators = {k: page.locator(v) for k, v in self.xpaths.items()}
-        status = self._poll_until_ready(page, locators, self.wait_list, self.xpaths["close_btn"])
-
-        if status == "ALL_READY":
-            title = self._safe_get_text(locators["title"], "title")
-            author = self._safe_get_text(locators["author"], "author")
-            media_url = self._download(page, title or "unnamed", author or "unnamed", download_media)
-
-            data = {
-                "title": title,
-                "author": author,
-                "content": self._safe_get_text(locators["content"], "content"),
-                "likes": self._safe_get_text(locators["likes"], "likes"),
-                "comments": self._safe_get_text(locators["comments"], "comments"),
-                "publish_time": self._safe_get_text(locators["publish_time"], "publish_time"),
-                "url": page.url,
-                "media_url": media_url,
-                "shares": None,
-                "fans": None
-            }
-            return self._convent_json(200, data, message="SUCCESS: 小红书数据提取成功")
-        
-        elif status == "PAGE_NOT_FOUND":
-
-            data = {"url": page.url}
-            return self._convent_json(404, data=data, message="PAGE_NOT_FOUND: 作品已下架")
-        elif status == "MOBILE_LINK":
-            data = {"url": page.url}
-            return self._convent_json(403, data=data, message="ERROR: 需要 APP 扫码授权")
-        elif status == "REDIRECT_WARNING":
-            data = {"url": page.url}
-            return self._convent_json(502, data=data, message="ERROR: 可能被重定向到登录页")
-        else:
-            data = {"url": page.url}
-            return self._convent_json(502, data=data, message="ERROR: 抓取数据失败")
+                loc = page.locator(selector).first
+                if await loc.count() == 0:
+                    continue
+
+                media_url = await loc.get_attribute("src") or await loc.get_attribute("data-src") or await loc.get_attribute("data-original")
+                if not media_url:
+                    continue
+
+                media_url = self._absolute_url(media_url)
+                if download_media:
+                    response = await page.request.get(media_url)
+                    body = await response.body()
+                    await asyncio.to_thread(save_path.write_bytes, body)
+                return media_url
+            except Exception:
+                continue
+
+        # 兜底截屏
+        await self._close_login_popup(page, self.xpaths["close_btn"])
+        await asyncio.sleep(0.1)
+        await page.screenshot(path=str(save_path))
+        return "screenshot"
+
+    @tracing.traced()
+    async def _extract_from_api(self, page: AsyncPage, download_media: bool) -> Optional[RPAResult]:
+        """
+        接口抓取模式：直接用笔记详情接口的 JSON 构建结果，未捕获到接口时返回 None。
+        """
+        data = self._api_data(await self._wait_api_payload(page, "note_feed"), page.url)
+        if data is None:
+            return None
+        if download_media and data["media_url"]:
+            await self._save_media(page, data["media_url"], self._note_save_path(data["title"], data["author"]))
+        return self._build_result(200, data, message=self.SUCCESS_MESSAGE)
+
+    async def _before_goto(self, page: AsyncPage, user_data_dir: Optional[str]):
+        """
+        首次使用某个 context 时先访问小红书主页（用于反爬）。
+        """
+        user_data_dir = self._unvisited_profile(user_data_dir)
+        if user_data_dir:
+            print(f"[INFO] 检测到新的 context，首次访问小红书主页: {self.xhs_homepage}")
+            await page.goto(self.xhs_homepage, wait_until="domcontentloaded")
+            await asyncio.sleep(1)  # 额外等待一下，让页面完全加载
+            self._mark_as_visited(user_data_dir)
+            print("[INFO] 已标记为已访问，后续访问将跳过主页")
+
+    async def _after_goto(self, page: AsyncPage):
+        await asyncio.sleep(1)
+
+    @tracing.traced()
+    async def extract_info(self, page: AsyncPage, url: str, download_media: bool) -> RPAResult:
+        if self.api_capture:
+            result = await self._extract_from_api(page, download_media)
+            if result:
+                return result
+        status = await self._poll_until_ready(page, self.xpaths, self.wait_list, self.xpaths["close_btn"])
+        if status != "ALL_READY":
+            return self._status_result(status, page.url)
+
+        fields = await self._extract_fields(page, self.xpaths, self.PAGE_FIELDS, required=self.wait_list)
+        data = self._page_data(fields, page.url)
+        with self._phase("media_download"):
+            data["media_url"] = await self._download(page, self._note_save_path(data["title"], data["author"]), download_media)
+        return self._build_result(200, data, message=self.SUCCESS_MESSAGE)
 
 def get_xhs_info(url, xpaths, wait_list, save_dir, download_img=False, user_data_dir: Optional[str] = None, headless: bool = False, user_agent: Optional[str] = None, viewport: Optional[Dict[str, int]] = None, timezone_id: Optional[str] = None):
+    """
+    兼容旧接口：返回 JSON 字符串（RPAResult.to_json()）。
+    """
     config = Config_Xhs()
     # 兼容旧接口
     rpa = XhsRPA(config)
-    return rpa.run(url, download_media=download_img, user_data_dir=user_data_dir, headless=headless, user_agent=user_agent, viewport=viewport, timezone_id=timezone_id)
+    return rpa.run(url, download_media=download_img, user_data_dir=user_data_dir, headless=headless, user_agent=user_agent, viewport=viewport, timezone_id=timezone_id).to_json()
 
 if __name__ == "__main__":
     url = "http://xhslink.com/o/3C2UqEN1jIz"
     config = Config_Xhs()
     rpa = XhsRPA(config)
     result = rpa.run(url, download_media=False, headless=False)
-    print(result)
+    print(result.to_json())
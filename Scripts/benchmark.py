@@ -0,0 +1,233 @@
+"""
+离线端到端基准测试：启动本地 fixture 服务（fixture_server.py）后按指定并发抓取各平台的 fixture 页面，
+统计每类页面的耗时分位数（p50/p95/p99）和整体吞吐（pages/sec），不访问真实平台。
+
+两种模式：
+- rpa：直接调用 DouyinRPA / XhsRPA / ToutiaoRPA 的 run（同步引擎，每次抓取启动并关闭一个浏览器上下文，
+  每个并发线程使用单独的临时 Profile 目录）
+- server：在子进程中启动 FastAPI 服务（server.py，使用上下文池），通过 /douyin、/xhs、/toutiao 接口抓取
+
+用法：
+    python Scripts/benchmark.py rpa --concurrency 2 --requests 12
+    python Scripts/benchmark.py server --concurrency 8 --requests 200 --warmup 8
+    python Scripts/benchmark.py server --cases douyin_video,xhs_note --variants ok,not_found --json result.json
+
+每类页面的作品 ID 互不相同，不会命中结果缓存或合并请求；头条文章/微头条默认走 HTTP 快速通道。
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+BASE_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from fixture_server import LOGIN_PREFIX, NOT_FOUND_PREFIX, FixtureServer
+
+# 页面类型 -> (平台, URL 模板)
+CASES = {
+    "douyin_video": ("douyin", "https://www.douyin.com/video/{id}"),
+    "douyin_note": ("douyin", "https://www.douyin.com/note/{id}"),
+    "xhs_note": ("xhs", "https://www.xiaohongshu.com/discovery/item/{id}"),
+    "toutiao_article": ("toutiao", "https://www.toutiao.com/article/{id}/"),
+    "toutiao_video": ("toutiao", "https://www.toutiao.com/video/{id}/"),
+    "toutiao_w": ("toutiao", "https://www.toutiao.com/w/{id}/"),
+}
+# 页面变体 -> 作品 ID 前缀（见 fixture_server.py）
+VARIANTS = {"ok": "7", "not_found": NOT_FOUND_PREFIX, "login": LOGIN_PREFIX}
+# 各平台接口的下载媒体参数名（见 server.py）
+DOWNLOAD_FIELDS = {"douyin": "download_video", "xhs": "download_img", "toutiao": "download_video"}
+
+
+def build_plan(cases: List[str], variants: List[str], total: int) -> List[Tuple[str, str, str]]:
+    """
+    按页面类型和变体轮流生成 total 个抓取任务 [(类型, 平台, URL)]，每个任务的作品 ID 不同。
+    """
+    combos = itertools.cycle([(case, variant) for case in cases for variant in variants])
+    plan = []
+    for seq in range(total):
+        case, variant = next(combos)
+        platform, template = CASES[case]
+        content_id = f"{VARIANTS[variant]}{seq:015d}{int(time.time()) % 10000:04d}"
+        plan.append((f"{case}/{variant}", platform, template.format(id=content_id)))
+    return plan
+
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+class RpaRunner:
+    """
+    直接运行同步引擎的 RPA，每个线程使用单独的临时 Profile 目录。
+    """
+    def __init__(self, headless: bool):
+        from config import Config_Douyin, Config_Toutiao, Config_Xhs
+        from RPA_douyin import DouyinRPA
+        from RPA_toutiao import ToutiaoRPA
+        from RPA_xhs_sharelk import XhsRPA
+        self.factories = {
+            "douyin": lambda: DouyinRPA(Config_Douyin()),
+            "xhs": lambda: XhsRPA(Config_Xhs()),
+            "toutiao": lambda: ToutiaoRPA(Config_Toutiao()),
+        }
+        self.headless = headless
+        self.profile_root = tempfile.mkdtemp(prefix="rpa-bench-")
+        self._local = threading.local()
+
+    def __call__(self, platform: str, url: str) -> Any:
+        if not hasattr(self._local, "profile"):
+            self._local.profile = tempfile.mkdtemp(dir=self.profile_root)
+        result = self.factories[platform]().run(url, download_media=False, user_data_dir=self._local.profile,
+                                                headless=self.headless)
+        return result.code
+
+    def close(self):
+        shutil.rmtree(self.profile_root, ignore_errors=True)
+
+
+class ServerRunner:
+    """
+    在子进程中启动 server.py（环境变量指向 fixture 服务），通过 HTTP 接口抓取。
+    """
+    def __init__(self, env: Dict[str, str], port: int, headless: bool, startup_timeout: float = 120.0):
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.headless = headless
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=256))
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port)],
+            cwd=str(BASE_DIR), env=dict(os.environ, **env),
+        )
+        deadline = time.time() + startup_timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"server exited with code {self.process.returncode}")
+            try:
+                if self.session.get(f"{self.base_url}/health", timeout=2).json().get("status") == "ok":
+                    return
+            except (requests.RequestException, ValueError):
+                pass
+            time.sleep(0.5)
+        self.close()
+        raise RuntimeError(f"server not ready after {startup_timeout}s")
+
+    def __call__(self, platform: str, url: str) -> Any:
+        body = {"url": url, "headless": self.headless, "max_age": 0, DOWNLOAD_FIELDS[platform]: False}
+        resp = self.session.post(f"{self.base_url}/{platform}", json=body, timeout=600)
+        return resp.json().get("code")
+
+    def close(self):
+        self.session.close()
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+def run_plan(runner: Any, plan: List[Tuple[str, str, str]], concurrency: int) -> Tuple[List[Dict[str, Any]], float]:
+    """
+    以 concurrency 个线程执行抓取任务，返回 ([{"case", "code", "latency"}], 总耗时)。
+    """
+    def run_one(item: Tuple[str, str, str]) -> Dict[str, Any]:
+        case, platform, url = item
+        start = time.perf_counter()
+        try:
+            code = runner(platform, url)
+        except Exception as e:
+            code = f"error: {type(e).__name__}"
+        return {"case": case, "code": code, "latency": time.perf_counter() - start}
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(run_one, plan))
+    return results, time.perf_counter() - start
+
+
+def summarize(results: List[Dict[str, Any]], wall: float) -> Dict[str, Any]:
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for r in results:
+        groups.setdefault(r["case"], []).append(r)
+    groups["total"] = results
+
+    rows = {}
+    for case, items in groups.items():
+        latencies = [r["latency"] for r in items]
+        codes: Dict[str, int] = {}
+        for r in items:
+            codes[str(r["code"])] = codes.get(str(r["code"]), 0) + 1
+        rows[case] = {
+            "count": len(items), "codes": codes,
+            "p50": round(percentile(latencies, 50), 3), "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3), "mean": round(sum(latencies) / len(latencies), 3),
+        }
+    return {"cases": rows, "wall": round(wall, 3), "pages_per_sec": round(len(results) / wall, 2) if wall else None}
+
+
+def print_report(mode: str, concurrency: int, summary: Dict[str, Any]):
+    print(f"mode={mode} concurrency={concurrency} wall={summary['wall']}s pages/sec={summary['pages_per_sec']}")
+    print(f"{'case':28s} {'count':>5s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'mean':>8s}  codes")
+    for case, row in summary["cases"].items():
+        codes = ", ".join(f"{code}×{n}" for code, n in sorted(row["codes"].items()))
+        print(f"{case:28s} {row['count']:5d} {row['p50']:8.3f} {row['p95']:8.3f} {row['p99']:8.3f} {row['mean']:8.3f}  {codes}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="离线端到端基准测试（本地 fixture 页面）")
+    parser.add_argument("mode", choices=["rpa", "server"], help="rpa：直接运行同步引擎；server：通过 FastAPI 服务")
+    parser.add_argument("--concurrency", type=int, default=4, help="并发数（线程数）")
+    parser.add_argument("--requests", type=int, default=60, help="计入统计的抓取次数")
+    parser.add_argument("--warmup", type=int, default=0, help="开始统计前先执行的抓取次数（如浏览器上下文启动）")
+    parser.add_argument("--cases", default=",".join(CASES), help="页面类型，逗号分隔：" + ",".join(CASES))
+    parser.add_argument("--variants", default="ok", help="页面变体，逗号分隔：" + ",".join(VARIANTS))
+    parser.add_argument("--port", type=int, default=8010, help="server 模式下服务的端口")
+    parser.add_argument("--headed", action="store_true", help="显示浏览器界面")
+    parser.add_argument("--json", help="把统计结果另存为 JSON 文件")
+    args = parser.parse_args(argv)
+
+    cases = [c for c in args.cases.split(",") if c]
+    variants = [v for v in args.variants.split(",") if v]
+    unknown = [c for c in cases if c not in CASES] + [v for v in variants if v not in VARIANTS]
+    if unknown:
+        parser.error(f"unknown case/variant: {', '.join(unknown)}")
+
+    fixtures = FixtureServer().start()
+    # 同步引擎在本进程中读取配置，服务在子进程中读取
+    os.environ.update(fixtures.env())
+    runner = None
+    try:
+        runner = RpaRunner(not args.headed) if args.mode == "rpa" else ServerRunner(fixtures.env(), args.port, not args.headed)
+        plan = build_plan(cases, variants, args.warmup + args.requests)
+        if args.warmup:
+            run_plan(runner, plan[:args.warmup], args.concurrency)
+        results, wall = run_plan(runner, plan[args.warmup:], args.concurrency)
+    finally:
+        if runner is not None:
+            runner.close()
+        fixtures.stop()
+
+    summary = summarize(results, wall)
+    print_report(args.mode, args.concurrency, summary)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(dict(summary, mode=args.mode, concurrency=args.concurrency), f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
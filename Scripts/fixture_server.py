@@ -0,0 +1,143 @@
+"""
+本地 fixture 服务：按平台返回 fixtures/<平台> 下保存的页面（与 config.py 中的 XPath 对应，已脱敏），用于离线测试和基准测试。
+每个平台使用单独的端口，路径与真实站点一致（头条 HTTP 快速通道按路径判断页面类型）：
+
+- 抖音：/video/<id>、/note/<id>
+- 小红书：/（主页）、/discovery/item/<id>
+- 头条：/article/<id>/、/w/<id>/、/video/<id>/，/article/challenge/ 返回反爬验证页
+
+作品 ID 以 NOT_FOUND_PREFIX 开头时返回下架页（404），以 LOGIN_PREFIX 开头时跳转到登录页（302 -> /login/）。
+设置 env() 返回的环境变量后，RPA 和服务（config.py 中的 fixture_base_url）会把浏览器对平台域名的请求转发到这里。
+
+用法：python Scripts/fixture_server.py [起始端口]    # 前台运行，打印各平台地址
+"""
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import quote
+
+FIXTURE_DIR = Path(__file__).parent / "fixtures"
+
+# 各平台 fixture 服务地址对应的环境变量（见 config.py 中的 fixture_base_url）
+ENV_VARS = {"douyin": "RPA_FIXTURE_DOUYIN", "xhs": "RPA_FIXTURE_XHS", "toutiao": "RPA_FIXTURE_TOUTIAO"}
+
+NOT_FOUND_PREFIX = "404"
+LOGIN_PREFIX = "302"
+
+# (路径正则, 页面文件)，按顺序匹配
+PAGES = {
+    "douyin": [
+        (re.compile(r"^/video/(?P<id>\w+)"), "video.html"),
+        (re.compile(r"^/note/(?P<id>\w+)"), "note.html"),
+    ],
+    "xhs": [
+        (re.compile(r"^/discovery/item/(?P<id>\w+)"), "note.html"),
+        (re.compile(r"^/$"), "home.html"),
+    ],
+    "toutiao": [
+        (re.compile(r"^/article/challenge/"), "challenge.html"),
+        (re.compile(r"^/article/(?P<id>\d+)"), "article.html"),
+        (re.compile(r"^/w/(?P<id>\d+)"), "weitoutiao.html"),
+        (re.compile(r"^/video/(?P<id>\d+)"), "video.html"),
+    ],
+}
+
+
+def make_handler(platform: str) -> type:
+    """
+    返回某个平台的请求处理类。
+    """
+    directory = FIXTURE_DIR / platform
+
+    class FixtureHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            if path.startswith("/login"):
+                return self._send_file("login.html")
+            if path.startswith("/media/"):
+                # 媒体请求（如抖音的 mime_type=video_mp4）返回占位内容
+                return self._send(200, b"\x00" * 1024, "application/octet-stream")
+            for pattern, name in PAGES[platform]:
+                match = pattern.match(path)
+                if not match:
+                    continue
+                content_id = match.groupdict().get("id") or ""
+                if content_id.startswith(NOT_FOUND_PREFIX):
+                    return self._send_file("not_found.html", status=404)
+                if content_id.startswith(LOGIN_PREFIX):
+                    self.send_response(302)
+                    self.send_header("Location", f"/login/?redirect={quote(self.path, safe='')}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                return self._send_file(name)
+            self._send(404, b"", "text/plain")
+
+        def _send_file(self, name: str, status: int = 200):
+            self._send(status, (directory / name).read_bytes(), "text/html; charset=utf-8")
+
+        def _send(self, status: int, body: bytes, content_type: str):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FixtureHandler
+
+
+class FixtureServer:
+    """
+    在后台线程中为每个平台启动一个 fixture 服务。
+    """
+    def __init__(self, host: str = "127.0.0.1", base_port: int = 0):
+        """
+        :param base_port: 第一个平台的端口（其余平台依次加 1），0 表示由系统分配
+        """
+        self.host = host
+        self.base_port = base_port
+        self.servers: Dict[str, ThreadingHTTPServer] = {}
+
+    def start(self) -> "FixtureServer":
+        for i, platform in enumerate(PAGES):
+            port = self.base_port + i if self.base_port else 0
+            server = ThreadingHTTPServer((self.host, port), make_handler(platform))
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self.servers[platform] = server
+        return self
+
+    def base_url(self, platform: str) -> Optional[str]:
+        server = self.servers.get(platform)
+        return f"http://{self.host}:{server.server_address[1]}" if server else None
+
+    def env(self) -> Dict[str, str]:
+        """
+        让 RPA / 服务使用本 fixture 服务的环境变量。
+        """
+        return {ENV_VARS[platform]: self.base_url(platform) for platform in self.servers}
+
+    def stop(self):
+        for server in self.servers.values():
+            server.shutdown()
+            server.server_close()
+        self.servers.clear()
+
+
+def main():
+    server = FixtureServer(base_port=int(sys.argv[1]) if len(sys.argv) > 1 else 8765).start()
+    for name, value in server.env().items():
+        print(f"{name}={value}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,13 @@ import requests
 import time
 import json
 import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from content_index import ContentIndex
+from url_router import UrlRouter
 
 URL = "http://192.168.30.238/api/bpm/bizDef/execByCode/bz.opinion.system.event.manage.list"
 
@@ -13,6 +20,8 @@ HEADERS = {
 PAGE_SIZE = 20
 SLEEP_SECONDS = 1
 OUTPUT_DIR = "data"
+# 作品索引：同一作品（不同分享链接/短链）的记录只保留最早出现的那条，跨运行保存在该文件中
+INDEX_PATH = os.path.join(OUTPUT_DIR, "get_data_index.json")
 
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
@@ -41,12 +50,29 @@ def fetch_page(current: int):
     return data["data"]
 
 
+def is_duplicate(index: ContentIndex, record, record_id) -> bool:
+    """
+    记录的链接指向的作品已由另一条记录（本次或之前的运行中）登记过时返回 True。
+    同一条记录在之后的运行中再次出现不算重复；无法识别作品的链接不参与去重。
+    """
+    url = record.get("url")
+    key = index.key_for(url) if isinstance(url, str) and url else None
+    if key is None:
+        return False
+    index.add(key, url, record_id)
+    return index.get(key)["record_ids"][0] != record_id
+
+
 def main():
     # Use dictionaries for deduplication (simulating sets)
     toutiao_data = {}
     xiaohongshu_data = {}
     douyin_data = {}
     other_data = {}
+    duplicates = 0
+
+    router = UrlRouter()
+    index = ContentIndex(INDEX_PATH, router)
 
     current = 1
     total_pages = None
@@ -78,6 +104,10 @@ def main():
             if not record_id:
                 record_id = str(record)
 
+            if is_duplicate(index, record, record_id):
+                duplicates += 1
+                continue
+
             webname = normalize_webname(record.get("webName", ""))
 
             if "今日头条" in webname:
@@ -96,6 +126,9 @@ def main():
         current += 1
         time.sleep(SLEEP_SECONDS)
 
+    router.close()
+    index.save()
+
     save_json("toutiao.json", list(toutiao_data.values()))
     save_json("xiaohongshu.json", list(xiaohongshu_data.values()))
     save_json("douyin.json", list(douyin_data.values()))
@@ -106,7 +139,8 @@ def main():
         f"toutiao={len(toutiao_data)}, "
         f"xiaohongshu={len(xiaohongshu_data)}, "
         f"douyin={len(douyin_data)}, "
-        f"other={len(other_data)}"
+        f"other={len(other_data)}, "
+        f"duplicates={duplicates}"
     )
 
 
@@ -0,0 +1,188 @@
+"""
+任务队列（job_queue.py）的行为检查：按优先级出队、失败后退避重试、max_attempts、租约过期和服务启动时的 recover。
+每项检查使用临时目录中的 SQLite 文件和可控的时钟，不依赖真实时间。
+
+用法：python Scripts/test_job_queue.py
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import JobConfig
+from job_queue import JobQueue
+
+
+class FakeClock:
+    """
+    手动推进的时钟，作为 JobQueue 的 clock 参数。
+    """
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+def make_queue(tmp_dir: str, clock: FakeClock) -> JobQueue:
+    config = JobConfig()
+    config.path = os.path.join(tmp_dir, "jobs.sqlite3")
+    config.max_attempts = 3
+    config.retry_delay = 5.0
+    config.lease_timeout = 600.0
+    return JobQueue(config, clock=clock)
+
+
+def claim_id(queue: JobQueue):
+    job = queue.claim()
+    return job["id"] if job else None
+
+
+def check_priority_order(failures: list, tmp_dir: str):
+    clock = FakeClock()
+    queue = make_queue(tmp_dir, clock)
+    bulk_1 = queue.submit("douyin", {"url": "b1"}, priority=0)
+    clock.advance(1)
+    normal = queue.submit("douyin", {"url": "n"}, priority=10)
+    clock.advance(1)
+    bulk_2 = queue.submit("douyin", {"url": "b2"}, priority=0)
+    clock.advance(1)
+    interactive = queue.submit("douyin", {"url": "i"}, priority=20)
+    order = [claim_id(queue) for _ in range(5)]
+    expected = [interactive, normal, bulk_1, bulk_2, None]
+    if order != expected:
+        failures.append(f"出队顺序 {order}，期望 {expected}")
+    job = queue.get(interactive)
+    if job["status"] != "running" or job["attempts"] != 1 or job["payload"] != {"url": "i"}:
+        failures.append(f"取出后的任务状态不正确：{job}")
+    queue.close()
+
+
+def check_retry_backoff(failures: list, tmp_dir: str):
+    clock = FakeClock()
+    queue = make_queue(tmp_dir, clock)
+    job_id = queue.submit("xhs", {"url": "x"})
+    queue.claim()
+    if not queue.fail(job_id, "code=500"):
+        failures.append("第 1 次失败后没有重试")
+    # 第 n 次失败后等待 retry_delay * n 秒
+    clock.advance(4.9)
+    if queue.claim() is not None:
+        failures.append("第 1 次重试在 5s 退避结束前被取出")
+    clock.advance(0.1)
+    job = queue.claim()
+    if job is None or job["attempts"] != 2:
+        failures.append(f"退避结束后没有取出第 2 次执行：{job}")
+    queue.fail(job_id, "code=500")
+    clock.advance(9.9)
+    if queue.claim() is not None:
+        failures.append("第 2 次重试在 10s 退避结束前被取出")
+    clock.advance(0.1)
+    if claim_id(queue) != job_id:
+        failures.append("第 2 次退避结束后没有取出任务")
+    queue.close()
+
+
+def check_max_attempts(failures: list, tmp_dir: str):
+    clock = FakeClock()
+    queue = make_queue(tmp_dir, clock)
+    job_id = queue.submit("xhs", {"url": "x"}, max_attempts=2)
+    last = {"code": 502, "message": "fetch_failed", "data": None}
+    queue.claim()
+    queue.fail(job_id, "code=502", last)
+    clock.advance(60)
+    queue.claim()
+    if queue.fail(job_id, "code=502", last):
+        failures.append("达到 max_attempts 后仍然重试")
+    job = queue.get(job_id)
+    if job["status"] != "failed" or job["error"] != "code=502":
+        failures.append(f"达到 max_attempts 后状态不正确：{job['status']} / {job['error']}")
+    if queue.result(job_id) != last:
+        failures.append("failed 任务没有保存最后一次的结果")
+    clock.advance(60)
+    if queue.claim() is not None:
+        failures.append("failed 任务被再次取出")
+
+    done_id = queue.submit("xhs", {"url": "y"})
+    queue.claim()
+    queue.complete(done_id, {"code": 200, "message": "success", "data": {}})
+    if queue.get(done_id)["status"] != "done" or queue.result(done_id)["code"] != 200:
+        failures.append("complete 后状态或结果不正确")
+    queue.close()
+
+
+def check_lease_expiry(failures: list, tmp_dir: str):
+    clock = FakeClock()
+    queue = make_queue(tmp_dir, clock)
+    job_id = queue.submit("toutiao", {"url": "t"}, max_attempts=2)
+    queue.claim()
+    clock.advance(599)
+    if queue.claim() is not None:
+        failures.append("租约未过期的任务被再次取出")
+    clock.advance(2)
+    job = queue.claim()
+    if job is None or job["id"] != job_id or job["attempts"] != 2:
+        failures.append(f"租约过期后没有重新取出任务：{job}")
+    # 第 2 次执行的租约也过期，已达 max_attempts，不再取出而是标记为 failed
+    clock.advance(601)
+    if queue.claim() is not None:
+        failures.append("已达 max_attempts 的租约过期任务被再次取出")
+    job = queue.get(job_id)
+    if job["status"] != "failed" or job["error"] != "lease_expired":
+        failures.append(f"租约过期且达到 max_attempts 后状态不正确：{job['status']} / {job['error']}")
+    result = queue.result(job_id)
+    if not result or result.get("data", {}).get("error") != "lease_expired":
+        failures.append(f"租约过期的 failed 任务没有保存结果：{result}")
+    queue.close()
+
+
+def check_recover(failures: list, tmp_dir: str):
+    clock = FakeClock()
+    queue = make_queue(tmp_dir, clock)
+    running = queue.submit("douyin", {"url": "r"})
+    exhausted = queue.submit("douyin", {"url": "e"}, max_attempts=1)
+    old_done = queue.submit("douyin", {"url": "d"})
+    for _ in range(3):
+        queue.claim()
+    queue.complete(old_done, {"code": 200, "message": "success", "data": {}})
+    queue.close()
+
+    # 模拟进程崩溃后重启：running 任务的租约尚未过期，已结束的任务超过保留期
+    clock.advance(queue.retention + 1)
+    queue = make_queue(tmp_dir, clock)
+    requeued = queue.recover()
+    if requeued != 1:
+        failures.append(f"recover 返回 {requeued}，期望 1")
+    if queue.get(exhausted)["status"] != "failed" or queue.get(exhausted)["error"] != "lease_expired":
+        failures.append("已达 max_attempts 的 running 任务在 recover 后没有标记为 failed")
+    if queue.get(old_done) is not None or queue.result(old_done) is not None:
+        failures.append("超过保留期的已结束任务没有被清理")
+    job = queue.claim()
+    if job is None or job["id"] != running or job["attempts"] != 2:
+        failures.append(f"recover 后没有重新取出未完成的任务：{job}")
+    if queue.claim() is not None:
+        failures.append("recover 后取出了多余的任务")
+    queue.close()
+
+
+CHECKS = [check_priority_order, check_retry_backoff, check_max_attempts, check_lease_expiry, check_recover]
+
+
+if __name__ == "__main__":
+    total = 0
+    for check in CHECKS:
+        failures = []
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            check(failures, tmp_dir)
+        total += len(failures)
+        print(f"{'OK  ' if not failures else 'FAIL'} {check.__name__}")
+        for failure in failures:
+            print(f"     {failure}")
+    if total:
+        print(f"{total} check(s) failed")
+        sys.exit(1)
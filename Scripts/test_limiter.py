@@ -0,0 +1,132 @@
+"""
+按平台自适应并发上限（limiter.py）的行为检查：成功一轮后加 1、502 时按比例下调、
+cut_interval 内不重复下调、上下限，以及 slot() 的排队与结果登记。
+使用可控的时钟，不依赖真实时间。
+
+用法：python Scripts/test_limiter.py
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from limiter import AdaptiveLimiter
+
+
+class FakeClock:
+    """
+    手动推进的时钟，作为 AdaptiveLimiter 的 clock 参数。
+    """
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+def make_limiter(clock: FakeClock, initial: int = 4, min_limit: int = 1, max_limit: int = 6) -> AdaptiveLimiter:
+    return AdaptiveLimiter("test", initial, min_limit, max_limit, latency_target=2.0,
+                           decrease_factor=0.5, cut_interval=10.0, clock=clock)
+
+
+def expect(failures: list, limiter: AdaptiveLimiter, limit: int, what: str):
+    if limiter.limit != limit:
+        failures.append(f"{what}：上限为 {limiter.limit}，期望 {limit}")
+
+
+def check_additive_increase(failures: list):
+    limiter = make_limiter(FakeClock())
+    for _ in range(3):
+        limiter._on_result(200, 0.5)
+    expect(failures, limiter, 4, "一轮未满时调整了上限")
+    limiter._on_result(404, 0.5)
+    expect(failures, limiter, 5, "一轮（limit 个）快速成功后")
+    # 新一轮需要 5 个结果，平均耗时超过目标时不增加
+    for _ in range(5):
+        limiter._on_result(200, 3.0)
+    expect(failures, limiter, 5, "一轮平均耗时超过 latency_target 后")
+    for _ in range(5):
+        limiter._on_result(200, 0.5)
+    expect(failures, limiter, 6, "第二轮快速成功后")
+    for _ in range(6):
+        limiter._on_result(200, 0.5)
+    expect(failures, limiter, 6, "已达 max 时")
+    # 其他状态码既不计入本轮，也不下调
+    limiter._on_result(403, 0.5)
+    limiter._on_result(None, 0.5)
+    expect(failures, limiter, 6, "非成功/非下调状态码后")
+
+
+def check_multiplicative_decrease(failures: list):
+    clock = FakeClock()
+    limiter = make_limiter(clock, initial=6)
+    limiter._on_result(502, 1.0)
+    expect(failures, limiter, 3, "单次 502 后")
+    clock.advance(9.9)
+    limiter._on_result(502, 1.0)
+    expect(failures, limiter, 3, "cut_interval 内的第二次 502 后")
+    if limiter.decreases != 1 or limiter.failures != 2:
+        failures.append(f"decreases={limiter.decreases} failures={limiter.failures}，期望 1 和 2")
+    clock.advance(0.1)
+    limiter._on_result(502, 1.0)
+    expect(failures, limiter, 1, "超过 cut_interval 后的 502")
+    clock.advance(60)
+    limiter._on_result(502, 1.0)
+    expect(failures, limiter, 1, "已达 min 时")
+
+
+def check_backoff_resets_round(failures: list):
+    clock = FakeClock()
+    limiter = make_limiter(clock, initial=2)
+    limiter._on_result(200, 0.5)
+    limiter._on_result(502, 1.0)
+    expect(failures, limiter, 1, "502 后")
+    # 502 之前的成功不计入下调后的一轮
+    limiter._on_result(200, 0.5)
+    expect(failures, limiter, 2, "下调后一轮（1 个）快速成功")
+    limiter._on_result(200, 0.5)
+    expect(failures, limiter, 2, "新一轮未满时")
+
+
+def check_slot(failures: list):
+    async def run():
+        limiter = make_limiter(FakeClock(), initial=1)
+        order = []
+
+        async def worker(name: str, code: int):
+            async with limiter.slot() as slot:
+                order.append((name, limiter.in_flight))
+                await asyncio.sleep(0)
+                slot.record(code)
+
+        await asyncio.gather(worker("a", 200), worker("b", 502))
+        if order != [("a", 1), ("b", 1)]:
+            failures.append(f"超过上限的请求没有排队：{order}")
+        if limiter.in_flight != 0:
+            failures.append(f"退出后 in_flight={limiter.in_flight}")
+        # a 成功使上限变为 2，b 的 502 再下调为 1
+        if (limiter.increases, limiter.decreases, limiter.limit) != (1, 1, 1):
+            failures.append(f"slot 登记的结果未生效：{limiter.stats()}")
+
+    asyncio.run(run())
+
+
+CHECKS = [check_additive_increase, check_multiplicative_decrease, check_backoff_resets_round, check_slot]
+
+
+if __name__ == "__main__":
+    total = 0
+    for check in CHECKS:
+        failures = []
+        check(failures)
+        total += len(failures)
+        print(f"{'OK  ' if not failures else 'FAIL'} {check.__name__}")
+        for failure in failures:
+            print(f"     {failure}")
+    if total:
+        print(f"{total} check(s) failed")
+        sys.exit(1)
@@ -0,0 +1,136 @@
+"""
+结果缓存（result_cache.py）的行为检查：按状态码过期、max_age、不缓存的状态码、LRU 淘汰和磁盘层。
+使用可控的时钟，不依赖真实时间。
+
+用法：python Scripts/test_result_cache.py
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import CacheConfig
+from result_cache import ResultCache
+
+
+class FakeClock:
+    """
+    手动推进的时钟，作为 ResultCache 的 clock 参数。
+    """
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+def make_config(max_entries: int = 100, disk_dir=None) -> CacheConfig:
+    config = CacheConfig()
+    config.ttls = {"douyin": {200: 300, 404: 86400}}
+    config.max_entries = max_entries
+    config.disk_dir = disk_dir
+    return config
+
+
+def ok_result(code: int = 200) -> dict:
+    return {"code": code, "message": "success", "data": {"id": "1"}}
+
+
+def check_ttl_by_code(failures: list):
+    clock = FakeClock()
+    cache = ResultCache(make_config(), clock=clock)
+    cache.put("douyin:ok", ok_result(200))
+    cache.put("douyin:gone", ok_result(404))
+    clock.advance(299)
+    if cache.get("douyin:ok") is None:
+        failures.append("200 结果在 TTL 内未命中")
+    if (cache.get("douyin:ok") or {}).get("cache_age") != 299:
+        failures.append("cache_age 不等于结果的存活秒数")
+    clock.advance(1)
+    if cache.get("douyin:ok") is not None:
+        failures.append("200 结果超过 300s 后仍命中")
+    if cache.get("douyin:gone") is None:
+        failures.append("404 结果在 300s 后未命中（TTL 为 86400s）")
+    clock.advance(86400)
+    if cache.get("douyin:gone") is not None:
+        failures.append("404 结果超过 86400s 后仍命中")
+
+
+def check_max_age(failures: list):
+    clock = FakeClock()
+    cache = ResultCache(make_config(), clock=clock)
+    cache.put("douyin:ok", ok_result(200))
+    clock.advance(60)
+    if cache.get("douyin:ok", max_age=0) is not None:
+        failures.append("max_age=0 时仍使用缓存")
+    if cache.get("douyin:ok", max_age=30) is not None:
+        failures.append("结果超过 max_age 后仍命中")
+    if cache.get("douyin:ok", max_age=60) is None:
+        failures.append("结果未超过 max_age 时未命中")
+
+
+def check_uncached_codes(failures: list):
+    cache = ResultCache(make_config(), clock=FakeClock())
+    cache.put("douyin:blocked", ok_result(502))
+    cache.put("xhs:other", ok_result(200))
+    if cache.get("douyin:blocked") is not None:
+        failures.append("502 结果被缓存")
+    if cache.get("xhs:other") is not None:
+        failures.append("未配置 TTL 的平台结果被缓存")
+    if cache.stats()["entries"] != 0:
+        failures.append("不缓存的结果占用了条目")
+
+
+def check_lru_eviction(failures: list):
+    cache = ResultCache(make_config(max_entries=2), clock=FakeClock())
+    cache.put("douyin:a", ok_result())
+    cache.put("douyin:b", ok_result())
+    cache.get("douyin:a")  # a 成为最近使用，下一次写入应淘汰 b
+    cache.put("douyin:c", ok_result())
+    if cache.stats()["entries"] != 2:
+        failures.append(f"条目数超过上限：{cache.stats()['entries']}")
+    if cache.get("douyin:b") is not None:
+        failures.append("最久未使用的条目没有被淘汰")
+    if cache.get("douyin:a") is None or cache.get("douyin:c") is None:
+        failures.append("最近使用的条目被淘汰")
+
+
+def check_disk_tier(failures: list):
+    clock = FakeClock()
+    with tempfile.TemporaryDirectory() as disk_dir:
+        first = ResultCache(make_config(max_entries=1, disk_dir=disk_dir), clock=clock)
+        first.put("douyin:a", ok_result())
+        first.put("douyin:b", ok_result())
+        clock.advance(100)
+        # 内存层只保留 b，a 从磁盘层读回
+        if (first.get("douyin:a") or {}).get("cache_age") != 100:
+            failures.append("内存层淘汰后未从磁盘层读回")
+
+        # 新实例（服务重启）仍能命中，过期时间按写入时间计算
+        second = ResultCache(make_config(disk_dir=disk_dir), clock=clock)
+        if second.get("douyin:b") is None:
+            failures.append("新实例未命中磁盘层的结果")
+        clock.advance(200)
+        if second.get("douyin:b") is not None:
+            failures.append("磁盘层的结果过期后仍命中")
+
+
+CHECKS = [check_ttl_by_code, check_max_age, check_uncached_codes, check_lru_eviction, check_disk_tier]
+
+
+if __name__ == "__main__":
+    total = 0
+    for check in CHECKS:
+        failures = []
+        check(failures)
+        total += len(failures)
+        print(f"{'OK  ' if not failures else 'FAIL'} {check.__name__}")
+        for failure in failures:
+            print(f"     {failure}")
+    if total:
+        print(f"{total} check(s) failed")
+        sys.exit(1)
@@ -1,29 +1,118 @@
-from base_rpa import BaseRPA
+"""
+发布时间 / 数量规范化（normalize.py）的正确性检查与微基准。
+相对时间以固定的 NOW 为基准计算期望值；微基准统计每个值的平均解析耗时。
+
+用法：python Scripts/test_time_parser.py [迭代次数]
+"""
+import sys
+import time
 from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from normalize import convert_count, convert_counts, parse_publish_time, parse_publish_times
+
+NOW = datetime(2024, 5, 20, 15, 30, 45)
+
+TIME_CASES = [
+    ("12-17 北京", "2024-12-17 00:00:00"),
+    ("2023-12-17 广东", "2023-12-17 00:00:00"),
+    ("12-17 14:30 上海", "2024-12-17 14:30:00"),
+    ("发布时间：2023-01-01 12:00:00", "2023-01-01 12:00:00"),
+    ("发布时间：2024-05-01 12:30", "2024-05-01 12:30:00"),
+    ("发布于 2024-04-28 浙江", "2024-04-28 00:00:00"),
+    ("03-17 18:42 · 四川", "2024-03-17 18:42:00"),
+    ("2024年05月02日", "2024-05-02 00:00:00"),
+    ("2023-05-01", "2023-05-01 00:00:00"),
+    ("2 天前", "2024-05-18 15:30:45"),
+    ("编辑于 1周前", "2024-05-13 15:30:45"),
+    ("刚刚", "2024-05-20 15:30:45"),
+    ("3小时前", "2024-05-20 12:30:45"),
+    ("15分钟前", "2024-05-20 15:15:45"),
+    ("昨天 09:05", "2024-05-19 09:05:00"),
+    ("前天 23:10", "2024-05-18 23:10:00"),
+    # 时间戳按北京时间（UTC+8）输出，与运行环境的时区无关
+    (1700000000, "2023-11-15 06:13:20"),
+    (1700000000000, "2023-11-15 06:13:20"),
+    (1704038400, "2024-01-01 00:00:00"),
+    ("无法解析的时间格式", None),
+    ("", None),
+    (None, None),
+]
+
+COUNT_CASES = [
+    ("1.2万", 12000),
+    ("2.3万", 23000),
+    ("1.15万", 11500),
+    ("10万+", 100000),
+    ("1.2w", 12000),
+    ("3.4k", 3400),
+    ("3千", 3000),
+    ("1.2亿", 120000000),
+    ("8.6万次播放", 86000),
+    ("1,234", 1234),
+    ("865", 865),
+    (42, 42),
+    ("赞", 0),
+    ("", None),
+    (None, None),
+]
 
-class TestRPA(BaseRPA):
-    def extract_info(self, page, url, download_media):
-        pass
-
-def test_time_parsing():
-    rpa = TestRPA(None, "Test")
-    test_cases = [
-        "12-17 北京",
-        "2023-12-17 广东",
-        "12-17 14:30 上海",
-        "发布时间：2023-01-01 12:00:00",
-        "2 天前",
-        "2023-05-01",
-        "无法解析的时间格式",
-        "",
-        None
+
+def check_cases() -> int:
+    """
+    逐个检查并打印结果，返回不符合期望的数量；批量接口的结果必须与逐个调用一致。
+    """
+    failures = 0
+    print(f"Now: {NOW}")
+    print("-" * 60)
+    for value, expected in TIME_CASES:
+        result = parse_publish_time(value, NOW)
+        ok = result == expected
+        failures += not ok
+        print(f"{'OK  ' if ok else 'FAIL'} {str(value):30} -> {result}" + ("" if ok else f" (expected {expected})"))
+    print("-" * 60)
+    for value, expected in COUNT_CASES:
+        result = convert_count(value)
+        ok = result == expected
+        failures += not ok
+        print(f"{'OK  ' if ok else 'FAIL'} {str(value):30} -> {result}" + ("" if ok else f" (expected {expected})"))
+
+    # 接口返回的值可能是 list/dict 等不可哈希类型，批量接口不能因此报错
+    times = [value for value, _ in TIME_CASES] + [["2024-05-01"]]
+    counts = [value for value, _ in COUNT_CASES] + [{"count": 1}]
+    if parse_publish_times(times, NOW) != [parse_publish_time(v, NOW) for v in times]:
+        print("FAIL parse_publish_times differs from parse_publish_time")
+        failures += 1
+    if convert_counts(counts) != [convert_count(v) for v in counts]:
+        print("FAIL convert_counts differs from convert_count")
+        failures += 1
+    return failures
+
+
+def benchmark(iterations: int):
+    """
+    微基准：对可解析的用例逐个调用 iterations 轮，打印每个值的平均耗时（微秒）。
+    """
+    times = [value for value, expected in TIME_CASES if expected]
+    counts = [value for value, expected in COUNT_CASES if expected is not None]
+    runs = [
+        ("parse_publish_time", lambda: [parse_publish_time(v, NOW) for v in times], len(times)),
+        ("convert_count", lambda: [convert_count(v) for v in counts], len(counts)),
     ]
-    
-    print(f"Current Year: {datetime.now().year}")
-    print("-" * 50)
-    for case in test_cases:
-        result = rpa._parse_publish_time(case)
-        print(f"Input: {str(case):30} -> Output: {result}")
+    print("-" * 60)
+    for name, run, size in runs:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            run()
+        cost = (time.perf_counter() - start) / (iterations * size) * 1e6
+        print(f"{name:22} {cost:8.2f} us/value ({iterations} x {size})")
+
 
 if __name__ == "__main__":
-    test_time_parsing()
+    failures = check_cases()
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
+    if failures:
+        print(f"{failures} case(s) failed")
+        sys.exit(1)
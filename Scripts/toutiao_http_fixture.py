@@ -0,0 +1,86 @@
+"""
+用本地 fixture 服务验证头条 HTTP 快速通道（toutiao_http.py）的解析结果。
+fixtures/toutiao 下保存的是头条文章/微头条服务端渲染的 HTML（已脱敏），由 fixture_server.py 提供：
+/article/ 和 /w/ 路径分别返回 article.html 和 weitoutiao.html，/article/challenge/ 返回反爬验证页。
+
+用法：python Scripts/toutiao_http_fixture.py    # 任一用例不符合期望时以状态码 1 退出
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import Config_Toutiao
+from fixture_server import FixtureServer
+from toutiao_http import ToutiaoHttpExtractor
+
+
+# URL -> 期望的结果：None 表示应回退到浏览器；否则为 code、message 和 data 中应有的字段值
+# （微头条页面的时间不带年份，按当前年份补齐，只检查月日时分）
+CASES = [
+    ("https://www.toutiao.com/article/7347000000000000000/", {
+        "code": 200, "message": "SUCCESS: 微头条数据提取成功",
+        "data": {"title": "城市更新下的老街烟火气", "author": "城市观察员", "web_name": "头条文章",
+                 "praise_count": 12000, "reply_count": 356, "publish_time": "2024-03-18 09:26:00"},
+    }),
+    ("https://www.toutiao.com/w/1793000000000000/", {
+        "code": 200, "message": "SUCCESS: 微头条数据提取成功",
+        "data": {"title": None, "author": "山间小厨", "web_name": "微头条", "praise_count": 2386},
+        "publish_time_suffix": "-03-17 18:42:00",
+    }),
+    ("https://www.toutiao.com/article/challenge/", None),         # 反爬验证页：回退到浏览器
+    ("https://www.toutiao.com/video/7347000000000000001/", None),  # 视频页：不走 HTTP
+]
+
+
+def check(result, expected) -> list:
+    """
+    返回结果与期望不符的描述列表。
+    """
+    if expected is None:
+        return [] if result is None else [f"expected None, got code={result.code}"]
+    if result is None:
+        return ["expected a result, got None"]
+    errors = []
+    for field in ("code", "message"):
+        if getattr(result, field) != expected[field]:
+            errors.append(f"{field}: {getattr(result, field)!r} != {expected[field]!r}")
+    for key, value in expected["data"].items():
+        if result.data.get(key) != value:
+            errors.append(f"data.{key}: {result.data.get(key)!r} != {value!r}")
+    suffix = expected.get("publish_time_suffix")
+    if suffix and not (result.data.get("publish_time") or "").endswith(suffix):
+        errors.append(f"data.publish_time: {result.data.get('publish_time')!r} does not end with {suffix!r}")
+    if not result.data.get("content"):
+        errors.append("data.content is empty")
+    return errors
+
+
+def main():
+    server = FixtureServer().start()
+
+    config = Config_Toutiao()
+    config.http_base_url = server.base_url("toutiao")
+    extractor = ToutiaoHttpExtractor(config)
+
+    failures = 0
+    try:
+        for url, expected in CASES:
+            result = extractor.extract(url)
+            errors = check(result, expected)
+            failures += bool(errors)
+            print(f"{'OK  ' if not errors else 'FAIL'} {url}")
+            print(result.to_json(indent=2) if result else "None (回退到浏览器)")
+            for error in errors:
+                print(f"     {error}")
+            print("-" * 50)
+    finally:
+        extractor.close()
+        server.stop()
+    if failures:
+        print(f"{failures} case(s) failed")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+import asyncio
+import time
+from pathlib import Path
+from typing import Optional, Any, Dict, List
+from playwright.async_api import async_playwright, Page, BrowserContext, Locator
+
+import tracing
+from base_rpa import RPACommon, READY_WATCHER_JS, EXTRACT_FIELDS_JS
+from rpa_result import RPAResult
+from url_router import UrlRouter
+
+class AsyncBaseRPA(RPACommon):
+    """
+    RPA 爬虫基类（异步引擎），基于 playwright.async_api，直接运行在 uvicorn 的事件循环中，
+    单个进程即可同时驱动大量页面，不再为每个抓取占用一个 OS 线程。
+    与同步版 BaseRPA 的方法一一对应，数据清洗与输出格式共用 RPACommon。
+    """
+    async def _close_login_popup(self, page: Page, selector: str):
+        """
+        检测并关闭可能出现的登录弹窗。
+        """
+        try:
+            btn = page.locator(selector)
+            if await btn.count() > 0 and await btn.is_visible():
+                await btn.click(timeout=1000)
+                print(f"INFO: [{self.web_name}] login popup closed")
+        except Exception:
+            pass
+
+    async def _poll_until_ready(self, page: Page, xpaths: Dict[str, str], wait_keys: Optional[List[str]],
+                                close_btn_selector: Optional[str] = None, timeout: float = 12.0) -> str:
+        """
+        等待页面元素就绪，或进入错误状态（下架/需扫码等），实现同 BaseRPA._poll_until_ready。
+
+        :param page: Playwright Page 对象
+        :param xpaths: 元素 XPath 字典
+        :param wait_keys: 必须出现的元素键名列表（None 表示只检测错误状态）
+        :param close_btn_selector: 登录弹窗关闭按钮的 CSS/XPath
+        :param timeout: 超时时间（秒）
+        :return: 状态字符串（"ALL_READY", "TIMEOUT", 或自定义错误状态）
+        """
+        start = time.time()
+        args = self._ready_watcher_args(xpaths, wait_keys, close_btn_selector)
+        while True:
+            remaining = timeout - (time.time() - start)
+            if remaining <= 0:
+                return self._record_ready_event({"state": "TIMEOUT", "trigger": None, "popups": 0}, start)
+            try:
+                result = await page.evaluate(READY_WATCHER_JS, dict(args, timeoutMs=int(remaining * 1000)))
+                return self._record_ready_event(result, start)
+            except Exception:
+                # 页面跳转（如短链重定向、跳到登录页）会销毁执行上下文，等新文档加载后重新注入
+                error_state = self._error_state_from_url(page.url)
+                if error_state:
+                    return self._record_ready_event({"state": error_state, "trigger": page.url, "popups": 0}, start)
+                try:
+                    await page.wait_for_load_state("domcontentloaded", timeout=max(remaining, 0.1) * 1000)
+                except Exception:
+                    await asyncio.sleep(0.1)
+
+    async def _check_error_states(self, page: Page) -> Optional[str]:
+        """
+        检查页面是否处于错误状态（如404，403等），标记来自配置中的 error_markers。
+        """
+        for text, state in self.error_markers.get("texts", {}).items():
+            if await page.get_by_text(text).count() > 0:
+                return state
+        return self._error_state_from_url(page.url)
+
+    async def _safe_get_text(self, locator: Locator, key: str) -> Optional[str]:
+        """
+        安全获取元素文本，处理可能的异常。耗时和是否超时记录在 get_text span 中。
+        """
+        with tracing.span("get_text", key=key) as span:
+            try:
+                return await locator.first.inner_text(timeout=1000)
+            except Exception as e:
+                span.set(timeout=type(e).__name__ == "TimeoutError", error=type(e).__name__)
+                return None
+
+    async def _extract_fields(self, page: Page, xpaths: Dict[str, str], keys: List[str], required: Optional[List[str]] = None) -> Dict[str, Optional[str]]:
+        """
+        一次 page.evaluate 读取多个字段的文本，实现同 BaseRPA._extract_fields。
+        """
+        with self._phase("extract"):
+            try:
+                texts = await page.evaluate(EXTRACT_FIELDS_JS, {k: xpaths[k] for k in keys})
+            except Exception as e:
+                print(f"warning: 批量提取字段失败，回退为逐个提取: {e}")
+                texts = {}
+                required = keys
+            for key in required or []:
+                if not texts.get(key):
+                    texts[key] = await self._safe_get_text(page.locator(xpaths[key]), key)
+            return texts
+
+    async def _wait_api_payload(self, page: Page, key: str) -> Optional[Dict[str, Any]]:
+        """
+        等待接口抓取模式捕获到指定接口的响应并解析 JSON，实现同 BaseRPA._wait_api_payload。
+        """
+        deadline = time.time() + self.api_wait_timeout
+        while key not in self._api_responses:
+            if time.time() >= deadline or self._error_state_from_url(page.url):
+                return None
+            await asyncio.sleep(0.05)
+        try:
+            return await self._api_responses[key].json()
+        except Exception as e:
+            print(f"warning: [{self.web_name}] 接口 {key} 响应解析失败: {e}")
+            return None
+
+    async def _save_media(self, page: Page, media_url: str, save_path: Path) -> bool:
+        """
+        使用当前页面的 request 上下文（携带 cookies）下载媒体文件。
+        """
+        try:
+            with self._phase("media_download"):
+                response = await page.request.get(media_url)
+                if not response.ok:
+                    print(f"Download failed with status: {response.status}")
+                    return False
+                body = await response.body()
+                save_path.parent.mkdir(parents=True, exist_ok=True)
+                await asyncio.to_thread(save_path.write_bytes, body)
+                return True
+        except Exception as e:
+            print(f"Error during media download: {e}")
+            return False
+
+    async def _get_browser_context(self, p: Any, user_data_dir: Optional[str], headless: bool, user_agent: Optional[str] = None, viewport: Optional[Dict[str, int]] = None, timezone_id: Optional[str] = None) -> BrowserContext:
+        """
+        启动并获取持久化浏览器上下文（支持缓存和 Chrome 渠道）。
+        """
+        return await p.chromium.launch_persistent_context(**self._context_launch_kwargs(user_data_dir, headless, user_agent, viewport, timezone_id))
+
+    @tracing.traced()
+    async def run(self, url: str, download_media: bool = False, user_data_dir: Optional[str] = None, headless: bool = False, user_agent: Optional[str] = None, viewport: Optional[Dict[str, int]] = None, timezone_id: Optional[str] = None) -> RPAResult:
+        """
+        执行 RPA 任务的主入口（独立启动并关闭一个浏览器上下文）。
+        服务端通过 browser_pool.BrowserPool 复用长驻上下文，直接调用 run_with_context。
+        参数含义同 BaseRPA.run。
+        """
+        if self.platform:
+            router = UrlRouter()
+            try:
+                route = await asyncio.to_thread(router.resolve, url)
+            finally:
+                router.close()
+            rejected = self._reject_route(route, url)
+            if rejected:
+                return rejected
+            url = route["url"]
+
+        result = await self._run_without_browser(url, download_media)
+        if result:
+            return result
+
+        if user_data_dir is None:
+            user_data_dir = str(Path(__file__).parent / "chrome-profile")
+
+        async with async_playwright() as p:
+            browser_context = await self._get_browser_context(p, user_data_dir, headless, user_agent, viewport, timezone_id)
+            try:
+                return await self.run_with_context(browser_context, url, download_media, user_data_dir)
+            finally:
+                await browser_context.close()
+
+    async def _run_without_browser(self, url: str, download_media: bool) -> Optional[RPAResult]:
+        """
+        打开浏览器之前的钩子（如 HTTP 快速通道），返回结果则不再启动浏览器，默认返回 None。
+        """
+        return None
+
+    @tracing.traced()
+    async def run_with_context(self, browser_context: BrowserContext, url: str, download_media: bool = False, user_data_dir: Optional[str] = None) -> RPAResult:
+        """
+        在已有的浏览器上下文中新开一个标签页执行抓取，结束后只关闭该标签页，上下文保持打开。
+
+        :param browser_context: 已启动的（持久化）浏览器上下文
+        :param url: 目标页面 URL
+        :param download_media: 是否下载媒体文件
+        :param user_data_dir: 该上下文对应的用户数据目录（供 _before_goto 等钩子使用）
+        :return: 抓取结果（RPAResult）
+        """
+        page = None
+        try:
+            page = await browser_context.new_page()
+            if not download_media and self.resource_policy:
+                await self._apply_resource_policy(page)
+            if self.fixture_base_url:
+                await self._route_to_fixtures(page)
+            await self._before_goto(page, user_data_dir)
+            if self.api_capture and self.api_endpoints:
+                self._start_api_capture(page)
+            print(f"Opening {url} ...")
+            with self._phase("goto", url=url):
+                await page.goto(url, wait_until="domcontentloaded")
+            await self._after_goto(page)
+
+            return await self.extract_info(page, url, download_media)
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            return self._build_result(502, data={"url": page.url if page else url}, message="ERROR: 抓取数据失败",
+                                      error=type(e).__name__)
+        finally:
+            if page:
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+
+    async def _apply_resource_policy(self, page: Page):
+        """
+        为当前标签页注册资源拦截路由（按标签页注册，同一上下文中其他需要下载媒体的请求不受影响）。
+        """
+        async def handle(route):
+            action = self._resource_action(route.request.resource_type, route.request.url)
+            if action == "abort":
+                await route.abort()
+            elif action == "stub":
+                await route.fulfill(status=200, body=b"")
+            else:
+                await route.continue_()
+
+        await page.route("**/*", handle)
+
+    async def _route_to_fixtures(self, page: Page):
+        """
+        把当前标签页对平台域名的请求转发到本地 fixture 服务，实现同 BaseRPA._route_to_fixtures。
+        """
+        async def handle(route):
+            try:
+                await route.fulfill(response=await route.fetch(url=self._fixture_url(route.request.url), max_redirects=0))
+            except Exception:
+                await route.abort()
+
+        await page.route(self._fixture_pattern(), handle)
+
+    async def warm_up(self, browser_context: BrowserContext, user_data_dir: Optional[str]):
+        """
+        在新建（或重建）的上下文中预热，不抓取任何作品：新开一个标签页执行 _before_goto 钩子（如小红书首次访问主页）。
+        """
+        page = await browser_context.new_page()
+        try:
+            if self.fixture_base_url:
+                await self._route_to_fixtures(page)
+            await self._before_goto(page, user_data_dir)
+        finally:
+            await page.close()
+
+    async def _before_goto(self, page: Page, user_data_dir: Optional[str]):
+        """
+        打开目标 URL 之前的钩子（如首次访问主页预热），默认不做任何事。
+        """
+        pass
+
+    async def _after_goto(self, page: Page):
+        """
+        打开目标 URL 之后、提取信息之前的钩子，默认不做任何事。
+        """
+        pass
+
+    async def extract_info(self, page: Page, url: str, download_media: bool) -> RPAResult:
+        """
+        具体的页面信息提取逻辑。必须在子类中实现。
+        """
+        raise NotImplementedError
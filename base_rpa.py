@@ -1,28 +1,142 @@
 import re
-import json
 import time
-from datetime import datetime, timedelta
+from contextlib import contextmanager
 from pathlib import Path
 from typing import Optional, Any, Dict, List
+from urllib.parse import urlparse
 from playwright.sync_api import sync_playwright, Page, BrowserContext, Locator
 
-class BaseRPA:
+import metrics
+import normalize
+import tracing
+from rpa_result import RPAResult
+from url_router import PLATFORM_HOSTS, UrlRouter, route_error
+
+# 注入页面的就绪检测脚本：用 MutationObserver 监听 DOM 变化，等待列表中的 XPath 全部出现
+# 或页面出现错误状态标记时立即返回，并报告是哪个条件触发的；同时负责关闭登录弹窗。
+# waits 为 null 时只检测错误状态。
+READY_WATCHER_JS = """
+({waits, texts, urls, closeSelector, timeoutMs}) => new Promise((resolve) => {
+    const find = (sel) => {
+        try {
+            if (sel.startsWith("/") || sel.startsWith("(")) {
+                return document.evaluate(sel, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+            }
+            return document.querySelector(sel);
+        } catch (e) {
+            return null;
+        }
+    };
+    const waitEntries = waits ? Object.entries(waits) : null;
+    let done = false, scheduled = false, popups = 0, lastClick = 0, lastMissing = null;
+    let observer = null, timer = null, poller = null;
+
+    const finish = (state, trigger) => {
+        if (done) return;
+        done = true;
+        if (observer) observer.disconnect();
+        clearTimeout(timer);
+        clearInterval(poller);
+        resolve({state, trigger, popups});
+    };
+    const check = () => {
+        scheduled = false;
+        if (done) return;
+        if (closeSelector && Date.now() - lastClick > 500) {
+            const btn = find(closeSelector);
+            if (btn && btn.getClientRects().length > 0) {
+                btn.dispatchEvent(new MouseEvent("click", {bubbles: true, cancelable: true, view: window}));
+                lastClick = Date.now();
+                popups += 1;
+            }
+        }
+        const bodyText = texts.length && document.body ? document.body.innerText : "";
+        for (const [text, state] of texts) {
+            if (bodyText.includes(text)) return finish(state, text);
+        }
+        for (const [part, state] of urls) {
+            if (location.href.includes(part)) return finish(state, part);
+        }
+        if (!waitEntries) return;
+        const missing = waitEntries.filter(([key, xpath]) => !find(xpath)).map(([key]) => key);
+        if (missing.length === 0) return finish("ALL_READY", lastMissing);
+        lastMissing = missing[missing.length - 1];
+    };
+    const schedule = () => {
+        if (!scheduled) {
+            scheduled = true;
+            setTimeout(check, 30);
+        }
+    };
+
+    observer = new MutationObserver(schedule);
+    observer.observe(document.documentElement, {childList: true, subtree: true, characterData: true, attributes: true});
+    // 兜底：SPA 路由切换等不一定产生 DOM 变化
+    poller = setInterval(schedule, 250);
+    timer = setTimeout(() => finish("TIMEOUT", lastMissing), timeoutMs);
+    check();
+})
+"""
+
+# 一次性读取多个字段文本的脚本：输入 {key: XPath/CSS}，返回 {key: 文本}，节点不存在时为 null
+EXTRACT_FIELDS_JS = """
+(selectors) => {
+    const result = {};
+    for (const [key, sel] of Object.entries(selectors)) {
+        let node = null;
+        try {
+            if (sel.startsWith("/") || sel.startsWith("(")) {
+                node = document.evaluate(sel, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+            } else {
+                node = document.querySelector(sel);
+            }
+        } catch (e) {
+            node = null;
+        }
+        result[key] = node ? (node.innerText !== undefined ? node.innerText : node.textContent) : null;
+    }
+    return result;
+}
+"""
+
+class RPACommon:
     """
-    RPA 爬虫基类，提供 Playwright 环境管理、数据清洗、统一输出格式等公共功能。
-    所有特定平台的 RPA 脚本（如抖音、小红书）应继承此类并实现 extract_info 方法。
+    同步/异步引擎共用的部分：配置读取、数据清洗、统一输出格式等与 Playwright 调用方式无关的功能。
     """
-    def __init__(self, config: Any, web_name: str):
+    def __init__(self, config: Any, web_name: str, api_capture: Optional[bool] = None):
         """
         初始化 RPA 基础配置。
         
         :param config: 平台相关的配置对象（需包含 save_dir, xpaths, wait_list 等属性）
         :param web_name: 网站名称（用于日志和 JSON 输出中的 web_name 字段）
+        :param api_capture: 是否启用接口抓取模式，None 表示使用配置中的 api_capture
         """
         self.config = config
         self.web_name = web_name
         self.save_dir = getattr(config, "save_dir", "data/default")
         self.xpaths = getattr(config, "xpaths", {})
+        self.platform = getattr(config, "platform", None)
         self.wait_list = getattr(config, "wait_list", [])
+        self.resource_policy = getattr(config, "resource_policy", None)
+        self.error_markers = getattr(config, "error_markers", {"texts": {}, "urls": {}})
+        # 最近一次就绪检测的结果：{"state", "trigger", "popups", "elapsed"}
+        self.ready_event: Optional[Dict[str, Any]] = None
+        # 接口抓取模式：goto 前监听平台详情接口的响应，直接用接口 JSON 构建结果，未命中时回退到 XPath 提取
+        self.api_endpoints = getattr(config, "api_endpoints", {})
+        self.api_capture = getattr(config, "api_capture", False) if api_capture is None else api_capture
+        self.api_wait_timeout = getattr(config, "api_wait_timeout", 5.0)
+        self._api_responses: Dict[str, Any] = {}
+        # 本地 fixture 服务（离线基准测试，见 Scripts/fixture_server.py）
+        self.fixture_base_url = getattr(config, "fixture_base_url", None)
+
+    @contextmanager
+    def _phase(self, name: str, **attributes: Any):
+        """
+        记录一个抓取阶段（goto / extract / media_download 等）的上下文管理器：耗时计入指标（见 metrics.py），
+        有进行中的追踪时同时记录为 span（见 tracing.py）。
+        """
+        with metrics.phase(self.platform, name), tracing.span(name, **attributes) as span:
+            yield span
 
     def _safe_filename(self, name: str, max_len: int = 100) -> str:
         """
@@ -34,95 +148,30 @@ class BaseRPA:
             name = "unnamed"
         return name[:max_len]
 
-    def _parse_publish_time(self, text: str) -> Optional[str]:
+    def _media_save_path(self, *names: Optional[str], suffix: str) -> Path:
         """
-        解析各种格式的发布时间字符串。
-        支持格式：
-        - "X天前"
-        - "发布时间：2023-01-01 12:00:00"
-        - "12-17 北京" (月-日 地区)
-        - 标准日期格式 "%Y-%m-%d %H:%M:%S" 等
+        媒体文件的保存路径：save_dir 下以各名称（标题、作者等，为空时为 "unnamed"）用 "-" 连接命名。
         """
-        if not text:
-            return None
-        text = text.strip()
-        
-        # 1. 处理 “X天前”
-        match = re.search(r"(\d+)\s*天前", text)
-        if match:
-            days = int(match.group(1))
-            return str(datetime.now() - timedelta(days=days))
-
-        # 2. 去掉“发布时间：”、“发布于”等前缀
-        if "：" in text:
-            text = text.split("：", 1)[1].strip()
-        elif text.startswith("发布于"):
-            text = text[len("发布于"):].strip()
-
-        # 3. 处理带地区的情况，如 "12-17 北京" 或 "2023-12-17 广东"
-        # 提取前面的日期部分 (匹配数字、破折号、冒号、空格组成的日期时间部分)
-        time_part_match = re.match(r"^(\d{2,4}-\d{1,2}-\d{1,2}(\s\d{1,2}:\d{1,2}(:\d{1,2})?)?|\d{1,2}-\d{1,2}(\s\d{1,2}:\d{1,2})?)", text)
-        if time_part_match:
-            text = time_part_match.group(1).strip()
-
-        # 4. 尝试多种绝对时间格式
-        formats_with_year = [
-            "%Y-%m-%d %H:%M:%S",
-            "%Y-%m-%d %H:%M",
-            "%Y-%m-%d",
-        ]
-        
-        for fmt in formats_with_year:
-            try:
-                return str(datetime.strptime(text, fmt))
-            except ValueError:
-                continue
-
-        # 5. 处理不带年份的格式，如 "12-17"，默认为当前年份
-        formats_without_year = [
-            "%m-%d %H:%M",
-            "%m-%d",
-        ]
-        current_year = datetime.now().year
-        for fmt in formats_without_year:
-            try:
-                dt = datetime.strptime(text, fmt)
-                dt = dt.replace(year=current_year)
-                return str(dt)
-            except ValueError:
-                continue
-        
-        print(f"[Warining]:无法解析时间格式: {text}")
-        return None
+        filename = "-".join(self._safe_filename(name or "unnamed") for name in names)
+        return Path(self.save_dir) / f"{filename}{suffix}"
+
+    def _absolute_url(self, url: str) -> str:
+        """
+        把页面中协议相对的地址（"//" 开头）补全为 https 地址。
+        """
+        return "https:" + url if url.startswith("//") else url
+
+    def _parse_publish_time(self, text: Any) -> Optional[str]:
+        """
+        解析各种格式的发布时间字符串，见 normalize.parse_publish_time。
+        """
+        return normalize.parse_publish_time(text)
 
     def _convert_counts(self, text: Any) -> Optional[int]:
         """
-        将字符串形式的数量（如 "1.2万", "3千"）转换为整数。
+        将字符串形式的数量（如 "1.2万", "3千", "10万+", "1.2亿"）转换为整数，见 normalize.convert_count。
         """
-        if text is None:
-            return None
-        if isinstance(text, (int, float)):
-            return int(text)
-        
-        text = str(text).strip()
-        if not text:
-            return None
-        
-        if not any(ch.isdigit() for ch in text):
-            # 处理非数字字符串，默认返 0
-            return 0
-        try:
-            if "千" in text:
-                num = re.findall(r"[\d.]+", text)
-                return int(float(num[0]) * 1000) if num else None
-            elif "万" in text:
-                num = re.findall(r"[\d.]+", text)
-                return int(float(num[0]) * 10000) if num else None
-            else:
-                num = re.findall(r"\d+", text)
-                return int(num[0]) if num else None
-        except Exception:
-            return None
+        return normalize.convert_count(text)
 
     def _get_media_type(self, url: str) -> str:
         """
@@ -135,15 +184,16 @@ class BaseRPA:
         if "screenshot" in url: return "screenshot"
         return None
 
-    def _convent_json(self, code: int, data: Dict[str, Any] = None, message: str = "success") -> str:
+    def _build_result(self, code: int, data: Dict[str, Any] = None, message: str = "success", error: Optional[str] = None) -> RPAResult:
         """
-        统一构建返回的 JSON 响应。
+        统一构建返回的结果。
         
         :param code: 状态码（200: 成功, 404: 下架, 403: 需扫码, 502: 抓取失败, 400: 不支持链接）
         :param data: 抓取到的数据字典
         :param message: 响应消息描述
-        :return: JSON 字符串
-        若需要写额外的逻辑更新某个值，可以在_extract方法内写然后通过data对象传入_convent以更新
+        :param error: 浏览器/传输异常的类型名或 "TIMEOUT"（见 RPAResult.error）
+        :return: RPAResult（服务端在 HTTP 响应时才序列化，见 rpa_result.py）
+        若需要写额外的逻辑更新某个值，可以在_extract方法内写然后通过data对象传入_build_result以更新
         """
         web_name = self.web_name
         if data and data.get("web_name"):
@@ -159,17 +209,19 @@ class BaseRPA:
         }
         
         if code == 200 and data:
+            likes, shares, comments, fans = normalize.convert_counts(
+                [data.get("likes"), data.get("shares"), data.get("comments"), data.get("fans")])
             res_data.update({
                 "title": data.get("title"),
                 "url": data.get("url"),
                 "content": data.get("content"),
                 "media_type": self._get_media_type(data.get("media_url")),
                 "publish_time": self._parse_publish_time(data.get("publish_time")),
-                "praise_count": self._convert_counts(data.get("likes")),
-                "forward_count": self._convert_counts(data.get("shares")),
-                "reply_count": self._convert_counts(data.get("comments")),
+                "praise_count": likes,
+                "forward_count": shares,
+                "reply_count": comments,
                 "author": data.get("author"),
-                "author_fans_count": self._convert_counts(data.get("fans")),
+                "author_fans_count": fans,
                 "media_urls": data.get("media_url"),
             })
         elif code == 404 and data:
@@ -191,8 +243,131 @@ class BaseRPA:
             pass
             # message = "ERROR: 不支持的链接"
 
-        return json.dumps({"code": code, "message": message, "data": res_data}, ensure_ascii=False)
+        return RPAResult(code, message, res_data, error)
+
+    def _status_result(self, status: str, url: Optional[str]) -> RPAResult:
+        """
+        将 _poll_until_ready 返回的非就绪状态转换为统一的错误响应。
+        """
+        data = {"url": url}
+        if status == "PAGE_NOT_FOUND":
+            return self._build_result(404, data=data, message="PAGE_NOT_FOUND: 作品已下架")
+        if status == "MOBILE_LINK":
+            return self._build_result(403, data=data, message="ERROR: 需要 APP 扫码授权")
+        if status == "REDIRECT_WARNING":
+            return self._build_result(502, data=data, message="ERROR: 可能被重定向到登录页")
+        return self._build_result(502, data=data, message="ERROR: 抓取数据失败",
+                                  error="TIMEOUT" if status == "TIMEOUT" else None)
+
+    def _reject_route(self, route: Dict[str, Any], url: str) -> Optional[RPAResult]:
+        """
+        URL 分类结果（见 url_router）不能由当前平台处理时返回 400 响应，否则返回 None。
+        """
+        reason = route_error(route, self.platform)
+        if reason:
+            return self._build_result(400, data={"url": url}, message=f"ERROR: 不支持的链接（{reason}）")
+        return None
+
+    def _ready_watcher_args(self, xpaths: Dict[str, str], wait_keys: Optional[List[str]], close_btn_selector: Optional[str]) -> Dict[str, Any]:
+        """
+        构建 READY_WATCHER_JS 的参数。wait_keys 为 None 时只检测错误状态。
+        """
+        return {
+            "waits": {k: xpaths[k] for k in wait_keys} if wait_keys is not None else None,
+            "texts": list(self.error_markers.get("texts", {}).items()),
+            "urls": list(self.error_markers.get("urls", {}).items()),
+            "closeSelector": close_btn_selector,
+        }
+
+    def _record_ready_event(self, result: Dict[str, Any], start: float) -> str:
+        """
+        记录就绪检测结果（触发条件、关闭弹窗次数、耗时），返回状态字符串。
+        """
+        end = time.time()
+        elapsed = end - start
+        self.ready_event = dict(result, elapsed=round(elapsed, 3))
+        metrics.observe_phase(self.platform, "ready_poll", elapsed)
+        tracing.add_span("ready_poll", start, end, state=result["state"], trigger=result.get("trigger"),
+                         popups=result.get("popups", 0), timeout=result["state"] == "TIMEOUT")
+        if result.get("popups"):
+            print(f"INFO: [{self.web_name}] login popup closed")
+        return result["state"]
+
+    def _error_state_from_url(self, url: str) -> Optional[str]:
+        for part, state in self.error_markers.get("urls", {}).items():
+            if part in url:
+                return state
+        return None
+
+    def _fixture_pattern(self) -> Any:
+        """
+        需要转发到 fixture 服务的请求（当前平台的域名，见 url_router.PLATFORM_HOSTS）。
+        """
+        return next(pattern for platform, pattern in PLATFORM_HOSTS if platform == self.platform)
+
+    def _fixture_url(self, url: str) -> str:
+        parsed = urlparse(url)
+        return self.fixture_base_url.rstrip("/") + parsed.path + (f"?{parsed.query}" if parsed.query else "")
+
+    def _start_api_capture(self, page: Any):
+        """
+        在 goto 之前注册响应监听，记录 api_endpoints 中每个接口的第一个响应（响应体在提取时再读取）。
+        """
+        self._api_responses = {}
+        page.on("response", self._on_api_response)
+
+    def _on_api_response(self, response: Any):
+        for key, pattern in self.api_endpoints.items():
+            if pattern in response.url and key not in self._api_responses:
+                self._api_responses[key] = response
+                return
+
+    def _resource_action(self, resource_type: str, url: str) -> Optional[str]:
+        """
+        不下载媒体时，根据平台的 resource_policy 决定如何处理一个网络请求。
+
+        :param resource_type: Playwright 的资源类型（image/media/font/script/xhr 等）
+        :param url: 请求 URL
+        :return: "stub"（以空响应代替，请求仍可被观察到）、"abort"（直接拦截）或 None（正常放行）
+        """
+        policy = self.resource_policy
+        if not policy:
+            return None
+        if any(p in url for p in policy.get("media_exemptions", {}).values()):
+            return "stub"
+        if resource_type in policy.get("block_resource_types", []):
+            return "abort"
+        if any(p in url for p in policy.get("block_url_patterns", [])):
+            return "abort"
+        return None
+
+    def _context_launch_kwargs(self, user_data_dir: Optional[str], headless: bool, user_agent: Optional[str] = None, viewport: Optional[Dict[str, int]] = None, timezone_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        构建 launch_persistent_context 的参数（支持缓存和 Chrome 渠道）。
+        """
+        if user_data_dir is None:
+            user_data_dir = str(Path(__file__).parent / "chrome-profile")
+        
+        launch_kwargs = {
+            "user_data_dir": user_data_dir,
+            "channel": "chrome",
+            "headless": headless,
+        }
+        if user_agent:
+            launch_kwargs["user_agent"] = user_agent
+        if viewport:
+            launch_kwargs["viewport"] = viewport
+        if timezone_id:
+            launch_kwargs["timezone_id"] = timezone_id
+        return launch_kwargs
+
 
+class BaseRPA(RPACommon):
+    """
+    RPA 爬虫基类（同步引擎），提供 Playwright 环境管理、数据清洗、统一输出格式等公共功能。
+    所有特定平台的 RPA 脚本（如抖音、小红书）应继承此类并实现 extract_info 方法。
+    服务端使用的异步引擎见 async_base_rpa.AsyncBaseRPA。
+    """
     def _close_login_popup(self, page: Page, selector: str):
         """
         检测并关闭可能出现的登录弹窗。
@@ -205,85 +380,129 @@ class BaseRPA:
         except Exception:
             pass
 
-    def _poll_until_ready(self, page: Page, locators: Dict[str, Locator], wait_keys: List[str], 
+    def _poll_until_ready(self, page: Page, xpaths: Dict[str, str], wait_keys: Optional[List[str]],
                           close_btn_selector: Optional[str] = None, timeout: float = 12.0) -> str:
         """
-        循环检测页面元素是否就绪，或是否进入错误状态（下架/需扫码等）。
+        等待页面元素就绪，或进入错误状态（下架/需扫码等）。
+        通过 READY_WATCHER_JS 在页面内监听 DOM 变化，条件满足时立即返回，不再轮询等待；
+        触发的条件记录在 self.ready_event 中。
         
         :param page: Playwright Page 对象
-        :param locators: 元素定位器字典
-        :param wait_keys: 必须出现的元素键名列表
+        :param xpaths: 元素 XPath 字典
+        :param wait_keys: 必须出现的元素键名列表（None 表示只检测错误状态）
         :param close_btn_selector: 登录弹窗关闭按钮的 CSS/XPath
         :param timeout: 超时时间（秒）
         :return: 状态字符串（"ALL_READY", "TIMEOUT", 或自定义错误状态）
         """
         start = time.time()
-        while time.time() - start < timeout:
-            if close_btn_selector:
-                self._close_login_popup(page, close_btn_selector)
-            
-            # 检查特定平台的错误状态（如 404、需扫码403）
-            error_state = self._check_error_states(page)
-            if error_state:
-                return error_state
-
-            all_ready = True
-            for key in wait_keys:
-                if locators[key].count() == 0:
-                    all_ready = False
-                    break
-            
-            if all_ready:
-                return "ALL_READY"
-            time.sleep(0.5)
-        
-        return "TIMEOUT"
+        args = self._ready_watcher_args(xpaths, wait_keys, close_btn_selector)
+        while True:
+            remaining = timeout - (time.time() - start)
+            if remaining <= 0:
+                return self._record_ready_event({"state": "TIMEOUT", "trigger": None, "popups": 0}, start)
+            try:
+                result = page.evaluate(READY_WATCHER_JS, dict(args, timeoutMs=int(remaining * 1000)))
+                return self._record_ready_event(result, start)
+            except Exception:
+                # 页面跳转（如短链重定向、跳到登录页）会销毁执行上下文，等新文档加载后重新注入
+                error_state = self._error_state_from_url(page.url)
+                if error_state:
+                    return self._record_ready_event({"state": error_state, "trigger": page.url, "popups": 0}, start)
+                try:
+                    page.wait_for_load_state("domcontentloaded", timeout=max(remaining, 0.1) * 1000)
+                except Exception:
+                    time.sleep(0.1)
 
     def _check_error_states(self, page: Page) -> Optional[str]:
         """
-        检查页面轮询时是否进入错误状态（如404，403等）。需在子类中重写实现。
+        检查页面是否处于错误状态（如404，403等），标记来自配置中的 error_markers。
         """
-        return None
+        for text, state in self.error_markers.get("texts", {}).items():
+            if page.get_by_text(text).count() > 0:
+                return state
+        return self._error_state_from_url(page.url)
 
     def _safe_get_text(self, locator: Locator, key: str) -> Optional[str]:
         """
-        安全获取元素文本，处理可能的异常，亦可以在此重写异常处理逻辑（但目前尚未
+        安全获取元素文本，处理可能的异常，子类可以重写异常处理逻辑（目前尚未重写）。
+
+        耗时和是否超时（元素不存在时等满 1 秒）记录在 get_text span 中，见 tracing.py。
+        """
+        with tracing.span("get_text", key=key) as span:
+            try:
+                return locator.first.inner_text(timeout=1000)
+            except Exception as e:
+                span.set(timeout=type(e).__name__ == "TimeoutError", error=type(e).__name__)
+                return None
+
+    def _extract_fields(self, page: Page, xpaths: Dict[str, str], keys: List[str], required: Optional[List[str]] = None) -> Dict[str, Optional[str]]:
+        """
+        一次 page.evaluate 读取多个字段的文本，缺失的节点返回 None，不再为每个字段单独等待超时。
+        只有 required 中的字段为空时，才回退到 _safe_get_text 逐个重试。
+
+        :param page: Playwright Page 对象
+        :param xpaths: 元素 XPath 字典
+        :param keys: 需要读取的字段键名列表
+        :param required: 必需字段（通常为 wait_list），为空时逐个回退重试
+        :return: {键名: 文本或 None}
+        """
+        with self._phase("extract"):
+            try:
+                texts = page.evaluate(EXTRACT_FIELDS_JS, {k: xpaths[k] for k in keys})
+            except Exception as e:
+                print(f"warning: 批量提取字段失败，回退为逐个提取: {e}")
+                texts = {}
+                required = keys
+            for key in required or []:
+                if not texts.get(key):
+                    texts[key] = self._safe_get_text(page.locator(xpaths[key]), key)
+            return texts
+
+    def _wait_api_payload(self, page: Page, key: str) -> Optional[Dict[str, Any]]:
+        """
+        等待接口抓取模式捕获到指定接口的响应并解析 JSON。
+        超时、页面跳到错误地址或解析失败时返回 None，调用方回退到 XPath 提取。
         """
-        start_time = time.time()
+        deadline = time.time() + self.api_wait_timeout
+        while key not in self._api_responses:
+            if time.time() >= deadline or self._error_state_from_url(page.url):
+                return None
+            page.wait_for_timeout(50)
         try:
-            r = locator.first.inner_text(timeout=1000)
-            if time.time() - start_time > 0.5:
-                print(f"warning: {key} 耗时 {time.time() - start_time} 秒")
-            return r
-        except Exception:
-            if time.time() - start_time > 0.5:
-                print(f"warning: {key} 耗时 {time.time() - start_time} 秒，且进入了异常处理（是否因为该元素不存在？）")
+            return self._api_responses[key].json()
+        except Exception as e:
+            print(f"warning: [{self.web_name}] 接口 {key} 响应解析失败: {e}")
             return None
 
+    def _save_media(self, page: Page, media_url: str, save_path: Path) -> bool:
+        """
+        使用当前页面的 request 上下文（携带 cookies）下载媒体文件。
+        """
+        try:
+            with self._phase("media_download"):
+                response = page.request.get(media_url)
+                if not response.ok:
+                    print(f"Download failed with status: {response.status}")
+                    return False
+                save_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(save_path, "wb") as f:
+                    f.write(response.body())
+                return True
+        except Exception as e:
+            print(f"Error during media download: {e}")
+            return False
+
     def _get_browser_context(self, p: Any, user_data_dir: Optional[str], headless: bool, user_agent: Optional[str] = None, viewport: Optional[Dict[str, int]] = None, timezone_id: Optional[str] = None) -> BrowserContext:
         """
         启动并获取持久化浏览器上下文（支持缓存和 Chrome 渠道）。
         """
-        if user_data_dir is None:
-            user_data_dir = str(Path(__file__).parent / "chrome-profile")
-        
-        launch_kwargs = {
-            "user_data_dir": user_data_dir,
-            "channel": "chrome",
-            "headless": headless,
-        }
-        if user_agent:
-            launch_kwargs["user_agent"] = user_agent
-        if viewport:
-            launch_kwargs["viewport"] = viewport
-        if timezone_id:
-            launch_kwargs["timezone_id"] = timezone_id
-            
-        return p.chromium.launch_persistent_context(**launch_kwargs)
+        return p.chromium.launch_persistent_context(**self._context_launch_kwargs(user_data_dir, headless, user_agent, viewport, timezone_id))
 
-    def run(self, url: str, download_media: bool = False, user_data_dir: Optional[str] = None, headless: bool = False, user_agent: Optional[str] = None, viewport: Optional[Dict[str, int]] = None, timezone_id: Optional[str] = None) -> str:
+    @tracing.traced()
+    def run(self, url: str, download_media: bool = False, user_data_dir: Optional[str] = None, headless: bool = False, user_agent: Optional[str] = None, viewport: Optional[Dict[str, int]] = None, timezone_id: Optional[str] = None) -> RPAResult:
         """
-        执行 RPA 任务的主入口。
+        执行 RPA 任务的主入口（每次调用都会启动并关闭一个浏览器上下文，适用于单独运行脚本）。
+        服务端使用 async_base_rpa 中的异步引擎，并通过 browser_pool.BrowserPool 复用长驻上下文。
         
         :param url: 目标页面 URL
         :param download_media: 是否下载媒体文件
@@ -292,23 +511,118 @@ class BaseRPA:
         :param user_agent: 用户代理字符串
         :param viewport: 视口大小 {"width": 1920, "height": 1080}
         :param timezone_id: 时区 ID，如 "Asia/Shanghai"
-        :return: JSON 结果字符串
+        :return: 抓取结果（RPAResult）
         """
+        if self.platform:
+            router = UrlRouter()
+            try:
+                route = router.resolve(url)
+            finally:
+                router.close()
+            rejected = self._reject_route(route, url)
+            if rejected:
+                return rejected
+            url = route["url"]
+
+        result = self._run_without_browser(url, download_media)
+        if result:
+            return result
+
+        if user_data_dir is None:
+            user_data_dir = str(Path(__file__).parent / "chrome-profile")
+
         with sync_playwright() as p:
             browser_context = self._get_browser_context(p, user_data_dir, headless, user_agent, viewport, timezone_id)
             try:
-                page = browser_context.new_page()
-                print(f"Opening {url} ...")
-                page.goto(url, wait_until="domcontentloaded")
-                
-                return self.extract_info(page, url, download_media)
-            except Exception as e:
-                print(f"Error: {str(e)}")
-                return self._convent_json(502, data={"url": page.url}, message="ERROR: 抓取数据失败")
+                return self.run_with_context(browser_context, url, download_media, user_data_dir)
             finally:
                 browser_context.close()
 
-    def extract_info(self, page: Page, url: str, download_media: bool) -> str:
+    def _run_without_browser(self, url: str, download_media: bool) -> Optional[RPAResult]:
+        """
+        打开浏览器之前的钩子（如 HTTP 快速通道），返回结果则不再启动浏览器，默认返回 None。
+        """
+        return None
+
+    @tracing.traced()
+    def run_with_context(self, browser_context: BrowserContext, url: str, download_media: bool = False, user_data_dir: Optional[str] = None) -> RPAResult:
+        """
+        在已有的浏览器上下文中新开一个标签页执行抓取，结束后只关闭该标签页，上下文保持打开。
+        
+        :param browser_context: 已启动的（持久化）浏览器上下文
+        :param url: 目标页面 URL
+        :param download_media: 是否下载媒体文件
+        :param user_data_dir: 该上下文对应的用户数据目录（供 _before_goto 等钩子使用）
+        :return: 抓取结果（RPAResult）
+        """
+        page = None
+        try:
+            page = browser_context.new_page()
+            if not download_media and self.resource_policy:
+                self._apply_resource_policy(page)
+            if self.fixture_base_url:
+                self._route_to_fixtures(page)
+            self._before_goto(page, user_data_dir)
+            if self.api_capture and self.api_endpoints:
+                self._start_api_capture(page)
+            print(f"Opening {url} ...")
+            with self._phase("goto", url=url):
+                page.goto(url, wait_until="domcontentloaded")
+            self._after_goto(page)
+
+            return self.extract_info(page, url, download_media)
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            return self._build_result(502, data={"url": page.url if page else url}, message="ERROR: 抓取数据失败",
+                                      error=type(e).__name__)
+        finally:
+            if page:
+                try:
+                    page.close()
+                except Exception:
+                    pass
+
+    def _apply_resource_policy(self, page: Page):
+        """
+        为当前标签页注册资源拦截路由（按标签页注册，同一上下文中其他需要下载媒体的请求不受影响）。
+        """
+        def handle(route):
+            action = self._resource_action(route.request.resource_type, route.request.url)
+            if action == "abort":
+                route.abort()
+            elif action == "stub":
+                route.fulfill(status=200, body=b"")
+            else:
+                route.continue_()
+
+        page.route("**/*", handle)
+
+    def _route_to_fixtures(self, page: Page):
+        """
+        把当前标签页对平台域名的请求转发到本地 fixture 服务（后注册的路由先处理，其余请求仍按资源拦截策略处理）。
+        跳转响应原样返回，由浏览器继续跟随（跳转后的请求同样转发）。
+        """
+        def handle(route):
+            try:
+                route.fulfill(response=route.fetch(url=self._fixture_url(route.request.url), max_redirects=0))
+            except Exception:
+                route.abort()
+
+        page.route(self._fixture_pattern(), handle)
+
+    def _before_goto(self, page: Page, user_data_dir: Optional[str]):
+        """
+        打开目标 URL 之前的钩子（如首次访问主页预热），默认不做任何事。
+        """
+        pass
+
+    def _after_goto(self, page: Page):
+        """
+        打开目标 URL 之后、提取信息之前的钩子，默认不做任何事。
+        """
+        pass
+
+    def extract_info(self, page: Page, url: str, download_media: bool) -> RPAResult:
         """
         具体的页面信息提取逻辑。必须在子类中实现。
         """
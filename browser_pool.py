@@ -0,0 +1,376 @@
+import asyncio
+import os
+import shutil
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from playwright.async_api import async_playwright, BrowserContext
+
+import metrics
+from async_base_rpa import AsyncBaseRPA
+from config import PoolConfig
+from profile_templates import ProfileTemplates
+from rpa_result import RPAResult
+
+
+class PooledContext:
+    """
+    单个 worker 的长驻持久化浏览器上下文（异步引擎）。
+    所有 worker 共用同一个 Playwright 驱动进程，运行在服务的事件循环中；
+    同一个上下文内可以同时打开最多 max_tabs 个标签页并行抓取，
+    占用/归还由 BrowserPool.acquire / release 统一调度。
+    """
+    def __init__(self, pool: "BrowserPool", index: int, user_data_dir: str, device_profile: Dict[str, Any],
+                 max_uses: int = 200, health_check_interval: float = 60.0, max_tabs: int = 1, device_index: int = 0):
+        """
+        :param pool: 所属的 BrowserPool（提供共享的 Playwright 实例）
+        :param index: worker 序号（从 0 开始）
+        :param user_data_dir: 该 worker 的 Profile 目录
+        :param device_profile: 设备指纹配置（user_agent, viewport, timezone_id）
+        :param max_uses: 上下文累计处理多少个请求后主动回收重建，防止内存膨胀
+        :param health_check_interval: 上下文空闲超过该秒数后，下次使用前先做健康检查
+        :param max_tabs: 该上下文内允许同时打开的标签页数
+        :param device_index: device_profile 在设备指纹列表中的序号（对应的 Profile 模板见 profile_templates.py）
+        """
+        self.pool = pool
+        self.index = index
+        self.user_data_dir = user_data_dir
+        self.device_profile = device_profile
+        self.device_index = device_index
+        self.max_uses = max_uses
+        self.health_check_interval = health_check_interval
+        self.max_tabs = max_tabs
+
+        self.uses = 0
+        self.launches = 0
+        self.in_flight = 0
+        # 当前已打开（或正在打开）的上下文的无头模式，None 表示没有上下文
+        self.headless: Optional[bool] = None
+        # 需要回收（达到使用上限/疑似卡死）：不再分配新标签页，空闲后重建
+        self.draining = False
+        # 被健康管理隔离（见 worker_health.py）：不再分配任何请求，直到后台重建完成
+        self.quarantined = False
+        # 正在替换 Profile 目录（见 BrowserPool.reset_profile）：即使空闲也不能被选中重新启动
+        self.resetting = False
+        self.last_used = 0.0
+        # 调度依据（见 BrowserPool._pick）：最近抓取耗时的指数移动平均、按平台的最近成功记录、
+        # 连续失败次数与冷却截止时间；warmed 为本次启动后已成功抓取过的平台（重建上下文后清空）
+        self.latency_ewma: Optional[float] = None
+        self.history: Dict[str, deque] = {}
+        self.consecutive_failures: Dict[str, int] = {}
+        self.cooldown_until: Dict[str, float] = {}
+        self.warmed: set = set()
+
+        self._launch_lock = asyncio.Lock()
+        self._context: Optional[BrowserContext] = None
+        self._context_headless: Optional[bool] = None
+
+    @property
+    def free_tabs(self) -> int:
+        return self.max_tabs - self.in_flight
+
+    async def _launch(self, rpa: AsyncBaseRPA, headless: bool):
+        with metrics.phase(rpa.platform, "context_launch"):
+            playwright = await self.pool._get_playwright()
+            self._context = await rpa._get_browser_context(
+                playwright,
+                self.user_data_dir,
+                headless,
+                self.device_profile.get("user_agent"),
+                self.device_profile.get("viewport"),
+                self.device_profile.get("timezone_id"),
+            )
+        self._context_headless = headless
+        self.uses = 0
+        self.launches += 1
+        self.warmed.clear()
+        self.draining = False
+        self.last_used = time.time()
+        print(f"INFO: [pool] Worker_{self.index + 1} context launched (headless={headless}, launches={self.launches})")
+
+    async def _close(self):
+        if self._context is not None:
+            try:
+                await self._context.close()
+            except Exception as e:
+                print(f"WARNING: [pool] Worker_{self.index + 1} context close failed: {e}")
+            self._context = None
+            self._context_headless = None
+
+    async def _is_healthy(self) -> bool:
+        """
+        健康检查：能正常开关一个空白标签页并执行脚本，说明浏览器进程与驱动通信正常。
+        """
+        if self._context is None:
+            return False
+        try:
+            page = await self._context.new_page()
+            try:
+                return await page.evaluate("1 + 1") == 2
+            finally:
+                await page.close()
+        except Exception as e:
+            print(f"WARNING: [pool] Worker_{self.index + 1} health check failed: {e}")
+            return False
+
+    async def _ensure_context(self, rpa: AsyncBaseRPA) -> BrowserContext:
+        """
+        获取可用的上下文；不存在、无头模式不一致、需要回收或空闲后健康检查失败时重建。
+        无头模式只会在 worker 空闲时被切换（见 BrowserPool._pick），此时旧上下文中没有标签页；
+        其余情况只有当前请求独占该 worker 时（in_flight == 1）才会关闭旧上下文，不会打断其他标签页。
+        """
+        async with self._launch_lock:
+            headless = self.headless
+            alone = self.in_flight == 1
+            recycle_reason = None
+            if self._context is None:
+                recycle_reason = "not launched"
+            elif self._context_headless != headless:
+                recycle_reason = f"headless changed to {headless}"
+            elif alone and self.draining:
+                recycle_reason = "draining"
+            elif alone and time.time() - self.last_used > self.health_check_interval and not await self._is_healthy():
+                recycle_reason = "health check failed"
+
+            if recycle_reason:
+                if self._context is not None:
+                    print(f"INFO: [pool] Worker_{self.index + 1} recycling context: {recycle_reason}")
+                await self._close()
+                await self._launch(rpa, headless)
+            return self._context
+
+    async def run(self, rpa: AsyncBaseRPA, url: str, download_media: bool) -> RPAResult:
+        """
+        在该 worker 的上下文中新开一个标签页执行抓取。调用前必须已通过 BrowserPool.acquire 占用一个标签页名额。
+        """
+        context = await self._ensure_context(rpa)
+        result = None
+        start = time.perf_counter()
+        try:
+            result = await rpa.run_with_context(context, url, download_media, self.user_data_dir)
+            return result
+        finally:
+            self.uses += 1
+            self.last_used = time.time()
+            if self.uses >= self.max_uses:
+                self.draining = True
+            code = result.code if result is not None else None
+            self.pool._record_result(self, rpa.platform, code, time.perf_counter() - start)
+            # 浏览器/传输异常或页面超时时（浏览器可能已崩溃）确认上下文是否仍然可用，不可用则停止分配并在空闲后重建；
+            # 登录页、下架等内容层面的结果不检查，避免每个失败的链接都多开关一次标签页
+            failed = result is None or result.error is not None
+            if failed and not await self._is_healthy():
+                print(f"WARNING: [pool] Worker_{self.index + 1} context wedged, will relaunch once its tabs drain")
+                self.draining = True
+
+
+class BrowserPool:
+    """
+    浏览器上下文池：每个 Profile 目录对应一个长驻的持久化上下文，跨请求复用，
+    每个请求只在某个 worker 的上下文中新开一个标签页，避免每次冷启动 Chrome。
+    调度时优先把标签页填进已打开的上下文，全部占满后才启动新的上下文。
+    """
+    def __init__(self, profile_paths: List[str], device_profiles: List[Dict[str, Any]], config: Optional[PoolConfig] = None):
+        """
+        :param profile_paths: 每个 worker 的 Profile 目录
+        :param device_profiles: 设备指纹配置，按 worker 序号循环分配
+        :param config: 上下文回收、标签页上限和调度参数（见 PoolConfig）
+        """
+        config = config or PoolConfig()
+        self.workers = [
+            PooledContext(self, i, path, device_profiles[i % len(device_profiles)], config.max_uses,
+                          config.health_check_interval, config.worker_tab_limits.get(i, config.max_tabs_per_worker),
+                          i % len(device_profiles))
+            for i, path in enumerate(profile_paths)
+        ]
+        # 预热好的 Profile 模板，新建/重建 Profile 时从模板复制；由服务在启动时设置，None 表示不使用模板
+        self.templates: Optional[ProfileTemplates] = None
+        self.latency_alpha = config.latency_alpha
+        self.history_size = config.history_size
+        self.failure_codes = config.failure_codes
+        self.cooldown_failures = config.cooldown_failures
+        self.cooldown_seconds = config.cooldown_seconds
+        self.sticky_routing = config.sticky_routing
+        self.platform_workers = config.platform_workers
+        self._playwright = None
+        self._playwright_lock = asyncio.Lock()
+        # 正在等待标签页的请求：(优先级, 是否无头, 平台)
+        self._waiters: List[Tuple[int, bool, Optional[str]]] = []
+        self._cond = asyncio.Condition()
+
+    @property
+    def capacity(self) -> int:
+        return sum(w.max_tabs for w in self.workers)
+
+    async def _get_playwright(self) -> Any:
+        async with self._playwright_lock:
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            return self._playwright
+
+    def _record_result(self, worker: PooledContext, platform: Optional[str], code: Any, latency: float):
+        """
+        登记一次抓取的结果，更新 worker 的耗时、成功记录和冷却状态。code 为 None 表示抓取异常。
+        """
+        if worker.latency_ewma is None:
+            worker.latency_ewma = latency
+        else:
+            worker.latency_ewma += self.latency_alpha * (latency - worker.latency_ewma)
+        if platform is None:
+            return
+        failed = code is None or code in self.failure_codes
+        worker.history.setdefault(platform, deque(maxlen=self.history_size)).append(not failed)
+        if not failed:
+            worker.consecutive_failures[platform] = 0
+            worker.warmed.add(platform)
+            return
+        failures = worker.consecutive_failures[platform] = worker.consecutive_failures.get(platform, 0) + 1
+        if failures >= self.cooldown_failures:
+            worker.cooldown_until[platform] = time.time() + self.cooldown_seconds
+            worker.consecutive_failures[platform] = 0
+            print(f"INFO: [pool] Worker_{worker.index + 1} cooling down for {platform} "
+                  f"({failures} consecutive failures, {self.cooldown_seconds:.0f}s)")
+
+    def _success_rate(self, worker: PooledContext, platform: Optional[str]) -> float:
+        history = worker.history.get(platform)
+        if not history:
+            return 1.0
+        return sum(history) / len(history)
+
+    def _score(self, worker: PooledContext, platform: Optional[str]) -> float:
+        """
+        worker 的调度分数，越小越优先：该平台最近的失败率（权重最大）+ 最近耗时相对全池平均的比值 + 标签页占用率。
+        """
+        latencies = [w.latency_ewma for w in self.workers if w.latency_ewma is not None]
+        average = sum(latencies) / len(latencies) if latencies else None
+        latency_ratio = worker.latency_ewma / average if worker.latency_ewma is not None and average else 1.0
+        return (1.0 - self._success_rate(worker, platform)) * 4 + latency_ratio + worker.in_flight / worker.max_tabs
+
+    def _pick(self, headless: bool, platform: Optional[str] = None) -> Optional[PooledContext]:
+        now = time.time()
+        allowed = self.platform_workers.get(platform)
+        workers = [w for w in self.workers if not w.quarantined and (allowed is None or w.index in allowed)]
+        # 跳过正在为该平台冷却的 worker；全部都在冷却时不阻塞请求，退回到全部 worker 中挑选
+        candidates = [w for w in workers if w.cooldown_until.get(platform, 0.0) <= now] or workers
+
+        # 1. 已打开且模式一致、仍有空闲标签页的上下文：开启粘性路由时优先已为该平台成功抓取过的（已预热的）上下文，
+        #    再按分数挑选（失败少、耗时短、占用低的优先）
+        open_workers = [
+            w for w in candidates
+            if w.headless == headless and not w.draining and w.free_tabs > 0
+        ]
+        if open_workers:
+            return min(open_workers, key=lambda w: (
+                self.sticky_routing and platform not in w.warmed, self._score(w, platform), w.index))
+
+        # 2. 已打开的上下文都满了，启动一个新的上下文：优先从未启动的 worker，其次是空闲但需要重建的 worker
+        #    （达到使用上限/疑似卡死的 draining worker 在这里被重新启动，正在替换 Profile 的除外）
+        idle_workers = [w for w in candidates if w.in_flight == 0 and w.max_tabs > 0 and not w.resetting]
+        if idle_workers:
+            return min(idle_workers, key=lambda w: (w.headless is not None, self._score(w, platform), w.index))
+        return None
+
+    def _yield_to_waiters(self, priority: int) -> bool:
+        """
+        是否有优先级更高、且现在就能分配到标签页的请求在等待（此时当前请求让出）。
+        """
+        return any(p > priority and self._pick(h, pf) is not None for p, h, pf in self._waiters)
+
+    async def acquire(self, headless: bool, platform: Optional[str] = None, priority: int = 0) -> PooledContext:
+        """
+        占用一个标签页名额，返回被选中的 worker；所有 worker 都满时等待。用完必须调用 release。
+
+        :param platform: 请求的平台，用于按该平台在各 worker 上的成功记录、冷却状态和粘性路由挑选 worker
+        :param priority: 任务优先级（JobConfig.priorities），有标签页空出时优先分配给等待中优先级最高的请求
+        """
+        start = time.perf_counter()
+        waiter = (priority, headless, platform)
+        async with self._cond:
+            self._waiters.append(waiter)
+            try:
+                while True:
+                    worker = self._pick(headless, platform)
+                    if worker and not self._yield_to_waiters(priority):
+                        worker.in_flight += 1
+                        worker.headless = headless
+                        metrics.observe_phase(platform, "worker_wait", time.perf_counter() - start)
+                        return worker
+                    if worker:
+                        self._cond.notify_all()  # 唤醒优先级更高的等待者
+                    await self._cond.wait()
+            finally:
+                self._waiters.remove(waiter)
+                if self._waiters:
+                    self._cond.notify_all()
+
+    async def release(self, worker: PooledContext):
+        async with self._cond:
+            worker.in_flight -= 1
+            self._cond.notify_all()
+
+    async def reset_profile(self, index: int, warmers: Optional[List[AsyncBaseRPA]] = None, headless: bool = True):
+        """
+        等第 index 个 worker 的标签页全部结束后，关闭其上下文并清空 Profile 目录（有对应的模板时从模板复制）。
+        提供 warmers 时立即以 headless 模式重新启动上下文并依次调用其 warm_up 预热（从模板复制的 Profile 已预热，
+        warm_up 基本不再打开页面），否则下次使用时再启动。
+        """
+        worker = self.workers[index]
+        async with self._cond:
+            worker.draining = True
+            worker.resetting = True
+            await self._cond.wait_for(lambda: worker.in_flight == 0)
+            worker.in_flight += 1  # 重建期间占住该 worker，避免被分配
+        warmed = False
+        try:
+            await worker._close()
+            if os.path.exists(worker.user_data_dir):
+                await asyncio.to_thread(shutil.rmtree, worker.user_data_dir)
+            if not (self.templates and await self.templates.clone(worker.device_index, worker.user_data_dir)):
+                os.makedirs(worker.user_data_dir, exist_ok=True)
+            worker.history.clear()
+            worker.consecutive_failures.clear()
+            worker.cooldown_until.clear()
+            if warmers:
+                worker.headless = headless
+                context = await worker._ensure_context(warmers[0])
+                for rpa in warmers:
+                    await rpa.warm_up(context, worker.user_data_dir)
+                warmed = True
+        finally:
+            if not warmed:
+                await worker._close()
+                worker.headless = None
+            worker.draining = False
+            worker.resetting = False
+            await self.release(worker)
+
+    async def seed_fresh_profiles(self):
+        """
+        把还没启动过、Profile 目录为空的 worker 替换为模板的副本（模板构建完成后调用）。
+        """
+        if self.templates is None:
+            return
+        for worker in self.workers:
+            if (worker.launches == 0 and worker.in_flight == 0 and self.templates.available(worker.device_index)
+                    and not (os.path.isdir(worker.user_data_dir) and os.listdir(worker.user_data_dir))):
+                await self.reset_profile(worker.index)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        return [
+            {"worker": w.index + 1, "uses": w.uses, "launches": w.launches, "headless": w.headless,
+             "in_flight": w.in_flight, "max_tabs": w.max_tabs, "draining": w.draining, "quarantined": w.quarantined,
+             "latency": round(w.latency_ewma, 2) if w.latency_ewma is not None else None,
+             "success_rate": {p: round(self._success_rate(w, p), 2) for p in w.history},
+             "cooldown": {p: round(t - now) for p, t in w.cooldown_until.items() if t > now},
+             "warmed": sorted(w.warmed)}
+            for w in self.workers
+        ]
+
+    async def shutdown(self):
+        for w in self.workers:
+            await w._close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
@@ -1,5 +1,9 @@
+import os
+
 class Config_Douyin:
     def __init__(self):
+        # 平台标识（与 url_router 中的平台名一致），用于打开浏览器前校验链接
+        self.platform = "douyin"
         self.xpaths = {
             "video_xpaths" : {
                 "video_author": '//div[@data-e2e="video-detail"]/div/div/div/div/a/div[@data-click-from="title"]/span/span/span/span/span/span',
@@ -29,9 +33,32 @@ class Config_Douyin:
             "note_wait_list": ["note_title", "note_likes"],
         }
         self.save_dir = "data/douyin"
+        # 页面错误状态标记：页面文本 / URL 中出现这些内容时视为对应状态（按顺序检查，文本优先）
+        self.error_markers = {
+            "texts": {"你要观看的图文不存在": "PAGE_NOT_FOUND", "视频不存在": "PAGE_NOT_FOUND"},
+            "urls": {},
+        }
+        # 不下载媒体时的资源拦截策略（见 RPACommon._resource_action）
+        self.resource_policy = {
+            "block_resource_types": ["image", "media", "font"],
+            "block_url_patterns": ["mcs.zijieapi.com", "mon.zijieapi.com", "/monitor_browser/collect"],
+            # 依赖媒体请求的选择器：对应请求以空响应代替拦截，页面仍会发出该请求
+            # video_video: _download_video 需要从 mime_type=video_mp4 请求中拿到视频地址
+            "media_exemptions": {"video_video": "mime_type=video_mp4"},
+        }
+        # 接口抓取模式（请求参数 api_capture 可覆盖）：监听作品详情接口，命中后直接用其 JSON 构建结果，
+        # api_wait_timeout 秒内未捕获到时回退到 XPath 提取
+        self.api_capture = False
+        self.api_endpoints = {"aweme_detail": "/aweme/v1/web/aweme/detail/"}
+        self.api_wait_timeout = 5.0
+        # 本地 fixture 服务地址（离线基准测试，见 Scripts/fixture_server.py），设置后浏览器对平台域名的请求
+        # 改由该服务返回（保留路径和参数）；默认读取环境变量，None 表示访问真实站点
+        self.fixture_base_url = os.environ.get("RPA_FIXTURE_DOUYIN")
 
 class Config_Xhs:
     def __init__(self):
+        # 平台标识（与 url_router 中的平台名一致），用于打开浏览器前校验链接
+        self.platform = "xhs"
         self.xpaths= {
             "title": '//*[@id="detail-title"]',
             "author": '//div[@class="author-container"]//a/span[contains(@class, "username")]',
@@ -47,9 +74,27 @@ class Config_Xhs:
             }
         self.wait_list = ["title", "author", "likes", "favours", "comments", "publish_time"]
         self.save_dir = "data/xhs"
+        self.error_markers = {
+            "texts": {"你访问的页面不见了": "PAGE_NOT_FOUND", "请打开小红书App扫码查看": "MOBILE_LINK"},
+            "urls": {"com/explore": "MOBILE_LINK", "com/login": "REDIRECT_WARNING"},
+        }
+        # 不下载媒体时的资源拦截策略（img_live/img/cover 只读取元素的 src 属性，不依赖媒体加载）
+        self.resource_policy = {
+            "block_resource_types": ["image", "media", "font"],
+            "block_url_patterns": ["apm-fe.xiaohongshu.com", "lng.xiaohongshu.com"],
+            "media_exemptions": {},
+        }
+        # 接口抓取模式：监听笔记详情接口，含义同 Config_Douyin
+        self.api_capture = False
+        self.api_endpoints = {"note_feed": "/api/sns/web/v1/feed"}
+        self.api_wait_timeout = 5.0
+        # 本地 fixture 服务地址，含义同 Config_Douyin
+        self.fixture_base_url = os.environ.get("RPA_FIXTURE_XHS")
 
 class Config_Toutiao:
     def __init__(self):
+        # 平台标识（与 url_router 中的平台名一致），用于打开浏览器前校验链接
+        self.platform = "toutiao"
         # w 为weitoutiao的xpath
         # video 为视频xpath
         self.xpaths = {
@@ -83,8 +128,232 @@ class Config_Toutiao:
             }
 
         self.save_dir = "data/toutiao"
+        self.error_markers = {
+            "texts": {"内容不存在": "PAGE_NOT_FOUND", "当前内容无法展示": "PAGE_NOT_FOUND"},
+            "urls": {},
+        }
+        # 不下载媒体时的资源拦截策略（video_video 只读取 video 元素的 src 属性，不依赖媒体加载）
+        self.resource_policy = {
+            "block_resource_types": ["image", "media", "font"],
+            "block_url_patterns": ["mcs.snssdk.com", "mon.snssdk.com", "mcs.zijieapi.com"],
+            "media_exemptions": {},
+        }
+        # HTTP 快速通道（见 toutiao_http.py）：文章/微头条先直接请求页面解析服务端渲染的 HTML，解析失败再打开浏览器
+        self.http_fast_path = True
+        # 本地 fixture 服务地址，含义同 Config_Douyin
+        self.fixture_base_url = os.environ.get("RPA_FIXTURE_TOUTIAO")
+        # 覆盖请求的站点地址（如本地 fixture 服务 "http://127.0.0.1:8765"），None 表示请求原链接
+        self.http_base_url = self.fixture_base_url
+        self.http_timeout = 5.0
+        self.http_pool_size = 16
+        self.http_headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+            "Referer": "https://www.toutiao.com/",
+            "Accept-Language": "zh-CN,zh;q=0.9",
+        }
+        # 与 xpaths 中 w_xpaths / a_xpaths 对应的简化选择器（"tag"、"tag.class"、"parent.class > tag"）
+        self.http_selectors = {
+            "w": {
+                "w_author": "a.name",
+                "w_content": "div.weitoutiao-html",
+                "w_publish_time": "span.time",
+                "w_likes": "div.detail-like > span",
+            },
+            "a": {
+                "a_title": "h1",
+                "a_author": "a.user-name",
+                "a_article": "article.syl-article-base",
+                "a_publish_time": "div.article-meta > span",
+                "a_likes": "div.detail-like > span",
+                "a_comments": "div.detail-interaction-comment > span",
+            },
+        }
+        # HTML 中缺失的字段从内嵌的 RENDER_DATA JSON 中按这些路径补齐（点分隔，按顺序取第一个非空值）
+        self.http_render_data_keys = {
+            "w": {
+                "w_author": ["data.user_info.name", "data.user.name", "data.itemCell.userInfo.name"],
+                "w_content": ["data.content", "data.itemCell.articleBase.content"],
+                "w_publish_time": ["data.publish_time", "data.publishTime", "data.create_time",
+                                   "data.itemCell.articleBase.publishTime"],
+                "w_likes": ["data.itemCell.itemCounter.digg_count", "data.itemCell.itemCounter.diggCount",
+                            "data.digg_count", "data.like_count"],
+            },
+            "a": {
+                "a_title": ["data.title", "data.itemCell.articleBase.title"],
+                "a_author": ["data.source", "data.mediaUser.name", "data.media_name"],
+                "a_article": ["data.content", "data.itemCell.articleBase.content"],
+                "a_publish_time": ["data.publishTime", "data.publish_time", "data.itemCell.articleBase.publishTime"],
+                "a_likes": ["data.itemCell.itemCounter.digg_count", "data.itemCell.itemCounter.diggCount",
+                            "data.digg_count"],
+                "a_comments": ["data.itemCell.itemCounter.comment_count", "data.itemCell.itemCounter.commentCount",
+                               "data.comment_count"],
+            },
+        }
+
+class RouterConfig:
+    def __init__(self):
+        # 短链解析（只跟随 HTTP 跳转，不下载页面）的超时时间和最大跳转次数
+        self.timeout = 5.0
+        self.max_redirects = 5
+        self.pool_size = 16
+        self.headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+            "Accept-Language": "zh-CN,zh;q=0.9",
+        }
+
+class CacheConfig:
+    def __init__(self):
+        # 是否在服务端缓存抓取结果（按作品键，见 result_cache.py）
+        self.enabled = True
+        # 按平台、按结果状态码的缓存时间（秒）：计数变化快的成功结果较短，已下架结果较长；
+        # 未列出的状态码（403/502/400 等）不缓存
+        self.ttls = {
+            "douyin": {200: 300, 404: 86400},
+            "xhs": {200: 300, 404: 86400},
+            "toutiao": {200: 600, 404: 86400},
+        }
+        # 内存层最多保留的作品数（LRU 淘汰）
+        self.max_entries = 2000
+        # 磁盘层目录（如 "data/cache"），None 表示只缓存在内存中
+        self.disk_dir = None
+
+class HealthConfig:
+    def __init__(self):
+        # worker 健康分（见 worker_health.py）：每个 worker 每个平台一个分数，成功计 1、警告计 0，按 alpha 做指数移动平均
+        self.alpha = 0.2
+        # 计为成功 / 警告的状态码（502 含被重定向到登录页）；其余状态码（如作品需扫码的 403）不影响健康分
+        self.healthy_codes = [200, 404]
+        self.warning_codes = [502]
+        # 同一平台连续警告达到该次数，或样本数不少于 min_samples 且分数低于 min_score 时隔离并在后台重建 Profile
+        self.max_consecutive_warnings = 3
+        self.min_score = 0.3
+        self.min_samples = 10
+        # 重建后立即启动上下文并预热的平台（调用对应 RPA 的 warm_up，如小红书首次访问主页），以及预热使用的无头模式
+        self.warm_platforms = ["xhs"]
+        self.warm_headless = True
+
+class TemplateConfig:
+    def __init__(self):
+        # 预热 Profile 模板（见 profile_templates.py）：每个设备指纹一份，新建/重建 Profile 时从模板复制
+        self.enabled = True
+        # 模板根目录（相对于项目目录）
+        self.dir = "profiles/templates"
+        # 模板的刷新间隔（秒）
+        self.refresh_interval = 6 * 3600
+        # 使用硬链接而不是 reflink/复制的顶层目录（与模板共用文件，只适合 Chrome 不会原地改写的目录，如 ["Cache"]）
+        self.hardlink_dirs = []
+
+class LimiterConfig:
+    def __init__(self):
+        # 各平台浏览器抓取的自适应并发上限（见 limiter.py）：initial 为启动时的上限，在 [min, max] 之间调整；
+        # latency_target 为单次抓取的目标耗时（秒），最近一轮平均耗时超过该值时不再增加上限
+        # 所有平台同时运行的标签页总数另受上下文池容量（PoolConfig）限制
+        self.limits = {
+            "xhs": {"initial": 2, "min": 1, "max": 6, "latency_target": 15.0},
+            "douyin": {"initial": 3, "min": 1, "max": 12, "latency_target": 15.0},
+            "toutiao": {"initial": 6, "min": 2, "max": 24, "latency_target": 10.0},
+        }
+        # 出现 backoff_codes（502，含被重定向到登录页）时上限乘以 decrease_factor，两次下调至少间隔 cut_interval 秒
+        self.decrease_factor = 0.5
+        self.cut_interval = 10.0
+        self.backoff_codes = [502]
+        # 计为成功、可以增加上限的状态码（已下架的 404 也说明平台正常响应）
+        self.success_codes = [200, 404]
+
+class JobConfig:
+    def __init__(self):
+        # 任务队列数据库（SQLite），服务重启后未完成的任务继续执行
+        self.path = "data/jobs.sqlite3"
+        # 优先级名称 -> 数值（大的先执行）；/xhs、/douyin、/toutiao 使用 interactive，/batch 使用 bulk
+        self.priorities = {"interactive": 20, "normal": 10, "bulk": 0}
+        # 同时执行任务的协程数，None 表示浏览器并发上限的 2 倍
+        # （命中缓存/HTTP 快速通道/合并等待的任务不占用浏览器名额，多留一些执行者避免它们排在浏览器任务后面）
+        self.dispatchers = None
+        # 每个任务最多执行次数，执行异常或结果状态码在 retry_codes 中时重试，第 n 次重试前等待 retry_delay * n 秒
+        self.max_attempts = 3
+        self.retry_codes = [500]
+        # 优先级不高于 bulk 的任务另外对 bulk_retry_codes 重试（如 502 抓取失败）；交互式请求不为 502 重试，避免用户长时间等待
+        self.bulk_retry_codes = [502]
+        # 结果消息包含这些文字时不重试（被重定向到登录页/风控验证，重试只会继续触发平台的风控）
+        self.no_retry_markers = ["重定向到登录页", "LOGIN_REQUIRED"]
+        self.retry_delay = 5.0
+        # 执行中任务的租约（秒），超过该时间仍未结束视为执行者已崩溃，任务重新入队
+        self.lease_timeout = 600.0
+        # 已结束任务及其结果的保留时间（秒），服务启动时清理
+        self.retention = 7 * 86400
+
+class TraceConfig:
+    def __init__(self):
+        # 请求追踪（见 tracing.py）：请求参数 trace 为 true 时，响应中附带本次请求各步骤的 span
+        # （起止时间、选择器键名、是否超时、worker 序号等）
+        # 所有请求的 span 追加写入的 JSONL 文件（如 "data/traces.jsonl"），None 表示只在请求要求时记录、不写文件
+        self.export_path = None
 
 class ServerConfig:
     def __init__(self):
         self.host = "0.0.0.0"
-        self.port = 8000
\ No newline at end of file
+        self.port = 8000
+
+class ShardConfig:
+    def __init__(self):
+        # 多进程分片（见 sharding.py）：分片进程数，每个分片独占一部分 Profile（worker），前端进程按负载转发请求；
+        # 1 表示单进程运行（不分片），0 表示按 CPU 核数；不超过 worker 数
+        self.shards = 1
+        # 分片进程监听的地址和起始端口（第 i 个分片使用 base_port + i），只供前端进程访问
+        self.host = "127.0.0.1"
+        self.base_port = 8100
+        # 前端检查各分片 /health 的间隔（秒），连续 max_failures 次失败视为不可用；分片进程退出时自动重启
+        self.health_interval = 5.0
+        self.max_failures = 2
+        # 启动时等待分片就绪的最长时间（秒）
+        self.startup_timeout = 60.0
+        # 转发请求的读取超时（秒），应大于单次抓取（含排队和重试）的最长耗时
+        self.request_timeout = 900.0
+        # 前端同时转发的最大请求数（转发线程数）
+        self.max_outstanding = 256
+
+class CoordinatorConfig:
+    def __init__(self):
+        # 协调者（见 coordinator.py）：多台机器上的服务作为节点注册到协调者，协调者提供相同的接口并按负载转发请求
+        self.host = "0.0.0.0"
+        self.port = 9000
+        # 节点超过 node_timeout 秒没有心跳视为不可用，超过 expire_after 秒移出注册表
+        self.node_timeout = 15.0
+        self.expire_after = 600.0
+        # 转发请求的读取超时（秒）和协调者同时转发的最大请求数
+        self.request_timeout = 900.0
+        self.max_outstanding = 512
+        # 注册/心跳接口的共享口令（请求头 X-RPA-Token），None 表示不校验
+        self.token = None
+
+        # 以下为节点（server.py）一侧的配置
+        # 协调者地址（如 "http://10.0.0.1:9000"），None 表示不注册；环境变量 RPA_COORDINATOR 优先
+        self.coordinator_url = None
+        # 本节点对协调者公布的地址和名称，None 表示按主机名和 ServerConfig.port 生成；
+        # 环境变量 RPA_ADVERTISE_URL / RPA_NODE_NAME 优先（同一台机器上运行多个节点时使用）
+        self.advertise_url = None
+        self.node_name = None
+        self.heartbeat_interval = 5.0
+
+class PoolConfig:
+    def __init__(self):
+        # 单个上下文处理多少个请求后主动回收重建
+        self.max_uses = 200
+        # 上下文空闲超过该秒数后，下次使用前先做健康检查
+        self.health_check_interval = 60.0
+        # 每个 worker 上下文内允许同时打开的标签页数（同一 Profile 内并行抓取）
+        self.max_tabs_per_worker = 3
+        # 按 worker 序号（从 0 开始）单独覆盖标签页上限，如 {0: 5, 7: 1}
+        self.worker_tab_limits = {}
+        # 调度（见 BrowserPool._pick）：按平台的最近成功率、耗时和占用率挑选 worker
+        # 最近耗时的指数移动平均系数，以及每个 worker 每个平台保留的最近结果数
+        self.latency_alpha = 0.3
+        self.history_size = 20
+        # 计为失败的状态码；同一平台连续失败 cooldown_failures 次的 worker 在 cooldown_seconds 秒内不再分配该平台的请求
+        self.failure_codes = [502]
+        self.cooldown_failures = 3
+        self.cooldown_seconds = 120.0
+        # 粘性路由：优先把请求分配给本次启动后已成功抓取过该平台的（已预热的）上下文
+        self.sticky_routing = True
+        # 限定平台只使用部分 worker（序号从 0 开始），如 {"xhs": [0, 1, 2]}；未列出的平台可使用全部 worker
+        self.platform_workers = {}
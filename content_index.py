@@ -0,0 +1,150 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from url_router import UrlRouter, classify_url
+
+
+def content_key(url: str, router: Optional[UrlRouter] = None) -> Optional[Tuple[str, str]]:
+    """
+    将任意链接映射为 (平台, 作品 ID)，同一作品的不同分享链接、短链得到相同的键。
+
+    :param url: 原始链接（可以带分享参数，可以是短链）
+    :param router: 提供时会跟随短链跳转拿到作品 ID；不提供或解析失败时短链以 "short:域名/路径" 作为 ID
+    :return: (platform, content_id)；不属于支持的平台时返回 None
+    """
+    route = classify_url(url)
+    if route["short"] and router is not None:
+        route = router.resolve(url)
+    if route["platform"] is None:
+        return None
+    if route["content_id"]:
+        return route["platform"], route["content_id"]
+    parsed = urlparse(route["url"])
+    return route["platform"], f"{FALLBACK_PREFIX}{parsed.netloc}{parsed.path.rstrip('/')}"
+
+
+def format_key(key: Tuple[str, str]) -> str:
+    return f"{key[0]}:{key[1]}"
+
+
+# 短链未能解析出作品 ID 时的兜底 ID 前缀（见 content_key）
+FALLBACK_PREFIX = "short:"
+
+
+def is_fallback_key(key: str) -> bool:
+    return key.partition(":")[2].startswith(FALLBACK_PREFIX)
+
+
+class ContentIndex:
+    """
+    作品索引（内存 + JSON 文件）：按 (平台, 作品 ID) 记录见过的链接、记录 ID 和最近一次抓取结果，
+    供去重、缓存和历史记录按作品而不是按原始链接归并。线程安全，save() 原子写入。
+    """
+    def __init__(self, path: Optional[str] = None, router: Optional[UrlRouter] = None):
+        """
+        :param path: 索引文件路径，None 表示只保存在内存中
+        :param router: 用于解析短链（见 content_key）
+        """
+        self.path = path
+        self.router = router
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        # 原始链接 -> 作品键，短链解析一次后跨运行复用；只缓存解析出真实作品 ID 的键，
+        # 短链解析失败（如一次网络错误）时的兜底键不缓存，下次重新解析
+        self.url_keys: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"warning: 读取作品索引失败 {self.path}: {e}")
+            return
+        with self._lock:
+            self.entries = data.get("entries", {})
+            # 丢弃旧版本保存的兜底键
+            self.url_keys = {url: key for url, key in data.get("url_keys", {}).items() if not is_fallback_key(key)}
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = {"entries": self.entries, "url_keys": self.url_keys}
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+    def key_for(self, url: str) -> Optional[str]:
+        """
+        返回链接对应的作品键（"平台:作品ID"），不属于支持的平台时返回 None。
+        """
+        with self._lock:
+            if url in self.url_keys:
+                return self.url_keys[url]
+        key = content_key(url, self.router)
+        if key is None:
+            return None
+        key = format_key(key)
+        if not is_fallback_key(key):
+            with self._lock:
+                self.url_keys[url] = key
+        return key
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self.entries.get(key)
+            return dict(entry) if entry else None
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self.entries
+
+    def add(self, key: str, url: str, record_id: Any = None) -> bool:
+        """
+        登记一条链接/记录，返回该作品是否第一次出现（含之前运行中保存到文件的记录）。
+        """
+        now = time.time()
+        with self._lock:
+            entry = self.entries.get(key)
+            is_new = entry is None
+            if is_new:
+                platform, _, content_id = key.partition(":")
+                entry = self.entries[key] = {
+                    "platform": platform, "content_id": content_id, "urls": [], "record_ids": [],
+                    "first_seen": now, "last_seen": now, "last_fetched": None, "last_code": None, "last_result": None,
+                }
+            entry["last_seen"] = now
+            if url not in entry["urls"]:
+                entry["urls"].append(url)
+            if record_id is not None and record_id not in entry["record_ids"]:
+                entry["record_ids"].append(record_id)
+            return is_new
+
+    def mark_fetched(self, key: str, code: Any, result: Optional[Dict[str, Any]] = None):
+        """
+        记录一次抓取的时间、结果状态码和结果内容（供之后的重复作品直接复用）。
+        """
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry["last_fetched"] = time.time()
+                entry["last_code"] = code
+                entry["last_result"] = result
+
+    def fetched_within(self, key: str, seconds: float) -> bool:
+        """
+        该作品是否在最近 seconds 秒内成功抓取过（200 或已下架 404）。
+        """
+        with self._lock:
+            entry = self.entries.get(key)
+            if not entry or not entry.get("last_fetched") or entry.get("last_code") not in (200, 404):
+                return False
+            return time.time() - entry["last_fetched"] < seconds
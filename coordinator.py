@@ -0,0 +1,164 @@
+import asyncio
+import os
+import socket
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import requests
+from fastapi import FastAPI, Header
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+
+from config import CoordinatorConfig
+from node_pool import NodePool, add_proxy_routes
+
+app = FastAPI()
+
+_coord_cfg = CoordinatorConfig()
+_nodes = NodePool(_coord_cfg.request_timeout, max_outstanding=_coord_cfg.max_outstanding)
+add_proxy_routes(app, _nodes)
+_expiry_task = None
+
+
+class HeartbeatRequest(BaseModel):
+    name: str                           # 节点名称（注册表中的唯一标识）
+    url: str                            # 协调者访问该节点的地址
+    health: Dict[str, Any]              # 节点 /health 的内容（容量、排队任务数、各 worker 的健康状态）
+
+
+def _authorized(token: Optional[str]) -> bool:
+    return _coord_cfg.token is None or token == _coord_cfg.token
+
+
+async def _expire_nodes():
+    """
+    后台任务：超过 node_timeout 秒没有心跳的节点停止分配，超过 expire_after 秒的移出注册表。
+    """
+    while True:
+        await asyncio.sleep(_coord_cfg.node_timeout / 3)
+        now = time.time()
+        for node in list(_nodes.nodes.values()):
+            silent = now - node.last_seen
+            if silent > _coord_cfg.expire_after and node.outstanding == 0:
+                _nodes.remove(node.name)
+                print(f"INFO: [coordinator] node {node.name} removed (no heartbeat for {silent:.0f}s)")
+            elif silent > _coord_cfg.node_timeout:
+                _nodes.mark_failed(node, f"no heartbeat for {silent:.0f}s", immediate=True)
+
+
+@app.on_event("startup")
+async def startup_event():
+    global _expiry_task
+    _expiry_task = asyncio.create_task(_expire_nodes())
+    print(f"INFO: [coordinator] waiting for nodes on port {_coord_cfg.port}")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if _expiry_task:
+        _expiry_task.cancel()
+    _nodes.close()
+
+
+@app.post("/nodes/heartbeat")
+async def heartbeat(req: HeartbeatRequest, x_rpa_token: Optional[str] = Header(None)) -> Dict[str, Any]:
+    """
+    节点注册与心跳：节点定期上报自己的地址和 /health 内容，首次上报即注册，不可用的节点恢复上报后重新参与分配。
+    """
+    if not _authorized(x_rpa_token):
+        return {"code": 403, "message": "invalid_token", "data": {"name": req.name}}
+    registered = req.name not in _nodes.nodes
+    _nodes.update(_nodes.add(req.name, req.url), req.health)
+    return {"code": 200, "message": "ok", "data": {"name": req.name, "registered": registered}}
+
+
+@app.delete("/nodes/{name}")
+async def leave(name: str, x_rpa_token: Optional[str] = Header(None)) -> Dict[str, Any]:
+    """
+    节点正常退出时注销。
+    """
+    if not _authorized(x_rpa_token):
+        return {"code": 403, "message": "invalid_token", "data": {"name": name}}
+    if name not in _nodes.nodes:
+        return {"code": 404, "message": "node_not_found", "data": {"name": name}}
+    _nodes.remove(name)
+    print(f"INFO: [coordinator] node {name} left")
+    return {"code": 200, "message": "ok", "data": {"name": name}}
+
+
+@app.get("/nodes")
+async def list_nodes() -> Dict[str, Any]:
+    return {"code": 200, "message": "ok", "data": _nodes.stats()}
+
+
+@app.get("/health")
+async def health() -> Dict[str, Any]:
+    healthy = [node for node in _nodes.nodes.values() if node.healthy]
+    return {
+        "status": "ok" if healthy else "unavailable",
+        "total_nodes": len(_nodes.nodes),
+        "healthy_nodes": len(healthy),
+        "max_concurrency": sum(node.capacity for node in healthy),
+        "jobs": {"queued": sum(node.queued for node in healthy)},
+        **_nodes.stats(),
+    }
+
+
+@app.get("/metrics")
+async def metrics_endpoint() -> PlainTextResponse:
+    """
+    合并各节点的 /metrics，样本带 node 标签。
+    """
+    return PlainTextResponse(await _nodes.collect_metrics("node"), media_type="text/plain; version=0.0.4")
+
+
+def node_identity(config: CoordinatorConfig, port: int) -> Tuple[Optional[str], str, str]:
+    """
+    节点一侧：返回 (协调者地址, 节点名称, 节点地址)，环境变量优先于配置；协调者地址为 None 表示不注册。
+    """
+    coordinator_url = os.environ.get("RPA_COORDINATOR") or config.coordinator_url
+    url = os.environ.get("RPA_ADVERTISE_URL") or config.advertise_url or f"http://{socket.gethostname()}:{port}"
+    name = os.environ.get("RPA_NODE_NAME") or config.node_name or url.split("://", 1)[-1]
+    return coordinator_url, name, url
+
+
+async def heartbeat_loop(coordinator_url: str, name: str, url: str,
+                         get_health: Callable[[], Awaitable[Dict[str, Any]]], config: CoordinatorConfig):
+    """
+    节点一侧的后台任务：每隔 heartbeat_interval 秒把本节点的 /health 上报给协调者（首次上报即注册），
+    任务取消（服务关闭）时向协调者注销。
+    """
+    base_url = coordinator_url.rstrip("/")
+    headers = {"X-RPA-Token": config.token} if config.token else {}
+    session = requests.Session()
+    connected = None
+    try:
+        while True:
+            try:
+                payload = {"name": name, "url": url, "health": await get_health()}
+                resp = await asyncio.to_thread(session.post, f"{base_url}/nodes/heartbeat", json=payload,
+                                               headers=headers, timeout=5.0)
+                resp.raise_for_status()
+                body = resp.json()
+                ok = body.get("code") == 200
+                if not ok and connected is not False:
+                    print(f"WARNING: [coordinator] heartbeat rejected by {base_url}: {body.get('message')}")
+            except (requests.RequestException, ValueError) as e:
+                ok = False
+                if connected is not False:
+                    print(f"WARNING: [coordinator] heartbeat to {base_url} failed: {e}")
+            if ok and connected is not True:
+                print(f"INFO: [coordinator] registered as {name} ({url}) with {base_url}")
+            connected = ok
+            await asyncio.sleep(config.heartbeat_interval)
+    finally:
+        try:
+            await asyncio.to_thread(session.delete, f"{base_url}/nodes/{name}", headers=headers, timeout=5.0)
+        except requests.RequestException:
+            pass
+        session.close()
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("coordinator:app", host=_coord_cfg.host, port=_coord_cfg.port, reload=False)
@@ -0,0 +1,227 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+from config import JobConfig
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    platform TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    not_before REAL NOT NULL,
+    lease_until REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority DESC, created_at);
+CREATE TABLE IF NOT EXISTS results (
+    job_id TEXT PRIMARY KEY,
+    code INTEGER,
+    result TEXT NOT NULL,
+    finished_at REAL NOT NULL
+);
+"""
+
+
+class JobQueue:
+    """
+    持久化任务队列（SQLite）：任务按优先级（数值大的先执行）和提交时间出队，
+    执行中的任务带租约，进程崩溃或重启后租约过期的任务重新入队，保证至少执行一次。
+    失败的任务按 retry_delay 退避后重试，超过 max_attempts 次标记为 failed；租约过期时已执行 max_attempts 次的任务
+    不再重新入队，标记为 failed（错误为 lease_expired）。线程安全。
+
+    任务状态：queued -> running -> done / failed（running 失败且可重试时回到 queued）
+    """
+    def __init__(self, config: Optional[JobConfig] = None, clock: Callable[[], float] = time.time):
+        """
+        :param clock: 返回当前 Unix 时间戳的函数（测试时可替换为可控的时钟）
+        """
+        config = config or JobConfig()
+        self.clock = clock
+        self.path = config.path
+        self.max_attempts = config.max_attempts
+        self.retry_delay = config.retry_delay
+        self.lease_timeout = config.lease_timeout
+        self.retention = config.retention
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def submit(self, platform: str, payload: Dict[str, Any], priority: int = 0, max_attempts: Optional[int] = None,
+               job_id: Optional[str] = None) -> str:
+        """
+        提交任务，返回任务 ID。
+
+        :param platform: 平台标识（xhs / douyin / toutiao）
+        :param payload: 对应接口的请求参数
+        :param priority: 优先级，数值大的先执行
+        :param max_attempts: 最多执行次数，None 表示使用 JobConfig.max_attempts
+        :param job_id: 指定任务 ID（调用方需要在提交前登记等待者时使用），None 表示自动生成
+        """
+        job_id = job_id or uuid.uuid4().hex
+        now = self.clock()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, platform, payload, priority, status, max_attempts, created_at, updated_at, not_before) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, platform, json.dumps(payload, ensure_ascii=False), priority,
+                 max_attempts or self.max_attempts, now, now, now),
+            )
+        return job_id
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """
+        取出一个可执行的任务并标记为 running（含租约已过期的 running 任务），没有时返回 None。
+        """
+        now = self.clock()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._fail_lease_expired(now, now)
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE (status = 'queued' AND not_before <= ?) "
+                    "OR (status = 'running' AND lease_until < ? AND attempts < max_attempts) "
+                    "ORDER BY priority DESC, created_at LIMIT 1",
+                    (now, now),
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ?, updated_at = ? WHERE id = ?",
+                    (now + self.lease_timeout, now, row["id"]),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        job = self._row_to_job(row)
+        job["attempts"] += 1
+        job["status"] = "running"
+        return job
+
+    def complete(self, job_id: str, result: Dict[str, Any]):
+        """
+        任务执行成功，保存结果。
+        """
+        self._finish(job_id, "done", result, None)
+
+    def fail(self, job_id: str, error: str, result: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        任务执行失败：未达到最多执行次数时退避后重新入队，否则标记为 failed 并保存最后一次的结果。
+
+        :return: 是否会重试
+        """
+        now = self.clock()
+        with self._lock:
+            row = self._conn.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is not None and row["attempts"] < row["max_attempts"]:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'queued', error = ?, not_before = ?, lease_until = NULL, updated_at = ? WHERE id = ?",
+                    (error, now + self.retry_delay * row["attempts"], now, job_id),
+                )
+                return True
+        self._finish(job_id, "failed", result or {"code": 500, "message": "job_failed", "data": {"error": error}}, error)
+        return False
+
+    def _fail_lease_expired(self, now: float, lease_before: Optional[float] = None) -> int:
+        """
+        把租约失效且已执行 max_attempts 次的 running 任务标记为 failed 并保存结果，返回任务数。调用方持有锁。
+
+        :param lease_before: 租约在该时间之前到期的任务视为失效，None 表示全部 running 任务（服务启动时）
+        """
+        where = "status = 'running' AND attempts >= max_attempts"
+        params: tuple = ()
+        if lease_before is not None:
+            where += " AND lease_until < ?"
+            params = (lease_before,)
+        result = json.dumps({"code": 500, "message": "job_failed", "data": {"error": "lease_expired"}}, ensure_ascii=False)
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO results (job_id, code, result, finished_at) SELECT id, 500, ?, ? FROM jobs WHERE {where}",
+            (result, now, *params),
+        )
+        return self._conn.execute(
+            f"UPDATE jobs SET status = 'failed', error = 'lease_expired', lease_until = NULL, updated_at = ? WHERE {where}",
+            (now, *params),
+        ).rowcount
+
+    def _finish(self, job_id: str, status: str, result: Dict[str, Any], error: Optional[str]):
+        now = self.clock()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, lease_until = NULL, updated_at = ? WHERE id = ?",
+                    (status, error, now, job_id),
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO results (job_id, code, result, finished_at) VALUES (?, ?, ?, ?)",
+                    (job_id, result.get("code"), json.dumps(result, ensure_ascii=False), now),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        返回已结束（done / failed）任务的结果，未结束时返回 None。
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM results WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row["result"]) if row else None
+
+    def recover(self) -> int:
+        """
+        服务启动时调用：上次运行中未完成的 running 任务重新入队（已执行 max_attempts 次的标记为 failed），
+        并清理超过保留期的已结束任务。返回重新入队的任务数。
+        """
+        now = self.clock()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._fail_lease_expired(now)
+                requeued = self._conn.execute(
+                    "UPDATE jobs SET status = 'queued', lease_until = NULL, updated_at = ? WHERE status = 'running'", (now,),
+                ).rowcount
+                expired = "SELECT id FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?"
+                self._conn.execute(f"DELETE FROM results WHERE job_id IN ({expired})", (now - self.retention,))
+                self._conn.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?", (now - self.retention,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return requeued
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        return job
@@ -0,0 +1,137 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import metrics
+from config import LimiterConfig
+
+
+class LimiterSlot:
+    """
+    AdaptiveLimiter.slot() 返回的名额，抓取结束前调用 record 登记结果状态码；未登记时不影响并发上限。
+    """
+    def __init__(self):
+        self.code: Any = None
+
+    def record(self, code: Any):
+        self.code = code
+
+
+class AdaptiveLimiter:
+    """
+    单个平台的自适应并发限制（AIMD）：
+    最近一轮结果都成功且平均耗时不超过目标时并发上限加 1；出现 502（含重定向到登录页）时上限按比例骤降，
+    两次下调之间至少间隔 cut_interval 秒，避免同一批失败连续下调。运行在服务的事件循环中。
+    """
+    def __init__(self, name: str, initial: int, min_limit: int, max_limit: int, latency_target: float,
+                 decrease_factor: float = 0.5, cut_interval: float = 10.0, backoff_codes: Optional[List[int]] = None,
+                 success_codes: Optional[List[int]] = None, clock: Callable[[], float] = time.time):
+        """
+        :param name: 平台标识
+        :param initial: 初始并发上限
+        :param min_limit: 并发上限的下限
+        :param max_limit: 并发上限的上限
+        :param latency_target: 单次抓取的目标耗时（秒），最近一轮平均耗时超过该值时不再增加上限
+        :param decrease_factor: 出现 backoff_codes 时上限乘以该系数
+        :param cut_interval: 两次下调之间的最短间隔（秒）
+        :param backoff_codes: 触发下调的状态码
+        :param success_codes: 计为成功的状态码，其余状态码既不增加也不下调
+        :param clock: 返回当前时间（秒）的函数，用于下调间隔（测试时可替换为可控的时钟）
+        """
+        self.name = name
+        self.limit = initial
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.cut_interval = cut_interval
+        self.backoff_codes = backoff_codes or [502]
+        self.success_codes = success_codes or [200, 404]
+        self.clock = clock
+
+        self.in_flight = 0
+        self.successes = 0
+        self.failures = 0
+        self.increases = 0
+        self.decreases = 0
+        self._last_cut: Optional[float] = None
+        # 本轮（自上次调整以来）成功请求的耗时，满 limit 个后决定是否增加上限
+        self._round: deque = deque()
+        # 正在等待名额的请求的优先级，有名额时优先级最高的先占用
+        self._waiting: List[int] = []
+        self._cond = asyncio.Condition()
+
+    @asynccontextmanager
+    async def slot(self, priority: int = 0) -> AsyncIterator[LimiterSlot]:
+        """
+        占用一个并发名额，超过当前上限时等待；退出时按登记的状态码和耗时调整上限。
+
+        :param priority: 任务优先级（JobConfig.priorities），等待中的请求按优先级占用名额，同优先级先到先得
+        """
+        wait_start = time.perf_counter()
+        async with self._cond:
+            self._waiting.append(priority)
+            try:
+                await self._cond.wait_for(lambda: self.in_flight < self.limit and priority >= max(self._waiting))
+                self.in_flight += 1
+            finally:
+                self._waiting.remove(priority)
+                if self._waiting:
+                    # 优先级更高的请求占用名额（或取消等待）后，剩余名额留给其余等待者
+                    self._cond.notify_all()
+        slot = LimiterSlot()
+        start = time.perf_counter()
+        metrics.observe_phase(self.name, "slot_wait", start - wait_start)
+        try:
+            yield slot
+        finally:
+            async with self._cond:
+                self.in_flight -= 1
+                self._on_result(slot.code, time.perf_counter() - start)
+                self._cond.notify_all()
+
+    def _on_result(self, code: Any, latency: float):
+        if code in self.backoff_codes:
+            self.failures += 1
+            self._round.clear()
+            now = self.clock()
+            if (self._last_cut is None or now - self._last_cut >= self.cut_interval) and self.limit > self.min_limit:
+                old = self.limit
+                self.limit = max(self.min_limit, int(self.limit * self.decrease_factor))
+                self._last_cut = now
+                self.decreases += 1
+                print(f"INFO: [limiter] {self.name} limit {old} -> {self.limit} (code={code})")
+            return
+        if code not in self.success_codes:
+            return
+        self.successes += 1
+        self._round.append(latency)
+        if len(self._round) >= self.limit:
+            average = sum(self._round) / len(self._round)
+            self._round.clear()
+            if average <= self.latency_target and self.limit < self.max_limit:
+                self.limit += 1
+                self.increases += 1
+                print(f"INFO: [limiter] {self.name} limit {self.limit - 1} -> {self.limit} (avg {average:.2f}s)")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"limit": self.limit, "min": self.min_limit, "max": self.max_limit, "in_flight": self.in_flight,
+                "waiting": len(self._waiting),
+                "successes": self.successes, "failures": self.failures,
+                "increases": self.increases, "decreases": self.decreases}
+
+
+def build_limiters(config: Optional[LimiterConfig] = None) -> Dict[str, AdaptiveLimiter]:
+    """
+    按 LimiterConfig 为每个平台创建一个 AdaptiveLimiter。
+    """
+    config = config or LimiterConfig()
+    return {
+        platform: AdaptiveLimiter(
+            platform, limits["initial"], limits["min"], limits["max"], limits["latency_target"],
+            config.decrease_factor, config.cut_interval, config.backoff_codes, config.success_codes,
+        )
+        for platform, limits in config.limits.items()
+    }
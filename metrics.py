@@ -0,0 +1,224 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# 耗时直方图的默认分桶（秒）：覆盖从毫秒级的字段提取到分钟级的排队
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Sequence[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """
+    只增不减的计数（如按平台、worker、状态码统计的请求数）。
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: object):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(list(zip(self.labelnames, key)))} {_format_value(v)}" for key, v in items]
+
+
+class Gauge(_Metric):
+    """
+    可增可减的当前值（如执行中的请求数、排队的任务数），通常在导出前由服务按当前状态设置。
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: object):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(list(zip(self.labelnames, key)))} {_format_value(v)}" for key, v in items]
+
+
+class Histogram(_Metric):
+    """
+    耗时分布（累计分桶 + 总和 + 次数），与 Prometheus 的 histogram 类型一致。
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签 -> [各分桶计数..., 总和, 次数]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: object):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+                    break
+            entry[-2] += value
+            entry[-1] += 1
+
+    @contextmanager
+    def time(self, **labels: object) -> Iterator[None]:
+        """
+        记录 with 代码块的耗时（代码块抛出异常时同样记录）。
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(entry)) for key, entry in self._values.items())
+        lines = []
+        for key, entry in items:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry[:len(self.buckets)]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', _format_value(bound))])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', '+Inf')])} {entry[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {round(entry[-2], 6)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {entry[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """
+        以 Prometheus 文本格式（text/plain; version=0.0.4）导出所有指标。
+        """
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.register(Counter(
+    "rpa_requests_total", "Scrape requests by platform, worker and result code", ["platform", "worker", "code"]))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "rpa_request_seconds", "End-to-end request latency (excluding job queue wait)", ["platform"]))
+# 各阶段耗时：queue_wait（任务队列排队）、slot_wait（平台并发上限）、worker_wait（等待空闲标签页）、
+# context_launch（启动浏览器上下文）、goto、ready_poll（等待元素就绪）、extract（读取字段）、media_download
+PHASE_SECONDS = REGISTRY.register(Histogram(
+    "rpa_phase_seconds", "Latency of each scrape phase", ["platform", "phase"]))
+IN_FLIGHT = REGISTRY.register(Gauge(
+    "rpa_in_flight", "Browser scrapes currently running per platform", ["platform"]))
+PLATFORM_LIMIT = REGISTRY.register(Gauge(
+    "rpa_platform_limit", "Current adaptive concurrency limit per platform", ["platform"]))
+JOBS = REGISTRY.register(Gauge(
+    "rpa_jobs", "Jobs in the persistent queue by status", ["status"]))
+WORKER_TABS = REGISTRY.register(Gauge(
+    "rpa_worker_tabs_in_use", "Open scrape tabs per worker", ["worker"]))
+COALESCED_IN_FLIGHT = REGISTRY.register(Gauge(
+    "rpa_coalesce_in_flight", "Distinct items currently being scraped (duplicates wait on these)"))
+
+
+def observe_phase(platform: Optional[str], phase: str, seconds: float):
+    PHASE_SECONDS.observe(seconds, platform=platform or "unknown", phase=phase)
+
+
+def phase(platform: Optional[str], name: str):
+    """
+    记录一个抓取阶段耗时的上下文管理器：with phase("xhs", "goto"): ...
+    """
+    return PHASE_SECONDS.time(platform=platform or "unknown", phase=name)
+
+
+def merge_exposition(texts: Dict[str, str], label: str) -> str:
+    """
+    合并多个进程/节点导出的指标文本：每个样本加上 label="来源名称" 标签，同名指标的样本放在一起。
+    """
+    families: Dict[str, List[str]] = {}
+    headers: Dict[str, List[str]] = {}
+    for source, text in texts.items():
+        family = None
+        for line in text.splitlines():
+            if not line:
+                continue
+            if line.startswith("#"):
+                parts = line.split(" ", 3)
+                if len(parts) >= 3 and parts[1] in ("HELP", "TYPE"):
+                    family = parts[2]
+                    headers.setdefault(family, [])
+                    if len(headers[family]) < 2 and line not in headers[family]:
+                        headers[family].append(line)
+                    families.setdefault(family, [])
+                continue
+            name, _, rest = line.partition(" ")
+            extra = f'{label}="{_escape(source)}"'
+            if "{" in name:
+                name = name.replace("{", "{" + extra + ",", 1)
+            else:
+                name = f"{name}{{{extra}}}"
+            families.setdefault(family or name.split("{")[0], []).append(f"{name} {rest}")
+    lines = []
+    for family, samples in families.items():
+        lines.extend(headers.get(family, []))
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
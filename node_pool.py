@@ -0,0 +1,288 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import requests
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+from requests.adapters import HTTPAdapter
+
+from metrics import merge_exposition
+
+
+class Node:
+    """
+    一个后端抓取服务（本机的分片进程或远程节点），记录其容量、健康状态和当前负载。
+    """
+    def __init__(self, name: str, base_url: str):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        # 浏览器并发上限（节点 /health 中的 max_concurrency）和任务队列中排队的任务数
+        self.capacity = 0
+        self.queued = 0
+        # 本进程转发给该节点、尚未返回的请求数
+        self.outstanding = 0
+        self.healthy = False
+        # 连续请求/健康检查失败次数
+        self.failures = 0
+        self.last_seen = 0.0
+        # 最近一次被选中的序号，负载相同时轮流选择
+        self.last_picked = 0
+        # 节点最近一次上报的 /health 内容
+        self.health: Optional[Dict[str, Any]] = None
+
+    @property
+    def load(self) -> float:
+        if not self.capacity:
+            return float("inf")
+        return (self.outstanding + self.queued) / self.capacity
+
+
+class NodePool:
+    """
+    后端节点池：按各节点的健康状态和负载（转发中的请求数 + 排队任务数，相对其并发上限）挑选节点转发请求，
+    节点连接失败时标记为不可用并把请求改投其他节点。HTTP 请求在专用线程池中执行，运行在服务的事件循环中。
+    """
+    def __init__(self, timeout: float = 900.0, health_timeout: float = 5.0, max_outstanding: int = 256,
+                 max_failures: int = 2):
+        """
+        :param timeout: 转发请求的读取超时（秒）
+        :param health_timeout: 健康检查的超时（秒）
+        :param max_outstanding: 同时转发的最大请求数（转发线程数），超过时等待
+        :param max_failures: 连续健康检查失败多少次后视为不可用（转发时连接失败立即视为不可用）
+        """
+        self.nodes: Dict[str, Node] = {}
+        self.timeout = timeout
+        self.health_timeout = health_timeout
+        self.max_failures = max_failures
+        self.forwarded = 0
+        self.rerouted = 0
+        self._picks = 0
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=max_outstanding)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_outstanding, thread_name_prefix="node-forward")
+        self._slots = asyncio.Semaphore(max_outstanding)
+
+    def add(self, name: str, base_url: str) -> Node:
+        node = self.nodes.get(name)
+        if node is None or node.base_url != base_url.rstrip("/"):
+            node = self.nodes[name] = Node(name, base_url)
+        return node
+
+    def remove(self, name: str):
+        self.nodes.pop(name, None)
+
+    def update(self, node: Node, health: Dict[str, Any]):
+        """
+        用节点的 /health 内容更新其容量、排队数和健康状态。
+        """
+        node.capacity = health.get("max_concurrency") or 0
+        node.queued = (health.get("jobs") or {}).get("queued", 0)
+        if not node.healthy and health.get("status") == "ok" and node.capacity:
+            print(f"INFO: [nodes] {node.name} is up ({node.base_url}, capacity={node.capacity})")
+        node.healthy = health.get("status") == "ok" and node.capacity > 0
+        node.failures = 0
+        node.last_seen = time.time()
+        node.health = health
+
+    def mark_failed(self, node: Node, reason: str, immediate: bool = False):
+        node.failures += 1
+        if node.healthy and (immediate or node.failures >= self.max_failures):
+            node.healthy = False
+            print(f"WARNING: [nodes] {node.name} marked down ({reason})")
+
+    async def check(self, node: Node) -> bool:
+        """
+        请求节点的 /health 并更新其状态，返回节点是否可用。
+        """
+        try:
+            resp = await asyncio.to_thread(self._session.get, f"{node.base_url}/health", timeout=self.health_timeout)
+            resp.raise_for_status()
+            self.update(node, resp.json())
+        except (requests.RequestException, ValueError) as e:
+            self.mark_failed(node, f"health check failed: {e}")
+        return node.healthy
+
+    def pick(self, exclude: Iterable[str] = ()) -> Optional[Node]:
+        """
+        挑选负载最低的可用节点（负载相同时选最久未被选中的），没有时返回 None。
+        """
+        candidates = [n for n in self.nodes.values() if n.healthy and n.name not in exclude]
+        if not candidates:
+            return None
+        node = min(candidates, key=lambda n: (n.load, n.last_picked))
+        self._picks += 1
+        node.last_picked = self._picks
+        return node
+
+    def _call(self, node: Node, method: str, path: str, body: Any) -> Tuple[int, Any]:
+        resp = self._session.request(method, f"{node.base_url}{path}", json=body, timeout=(self.health_timeout, self.timeout))
+        if resp.headers.get("content-type", "").startswith("application/x-ndjson"):
+            return resp.status_code, [json.loads(line) for line in resp.text.splitlines() if line]
+        try:
+            return resp.status_code, resp.json()
+        except ValueError:
+            return resp.status_code, {"code": 500, "message": "invalid_json_response",
+                                      "data": {"raw": resp.text[:500], "node": node.name}}
+
+    async def request(self, node: Node, method: str, path: str, body: Any = None) -> Tuple[int, Any]:
+        """
+        向指定节点发送请求，返回 (HTTP 状态码, 响应内容)；NDJSON 响应解析为列表。连接失败时抛出 requests 的异常。
+        """
+        node.outstanding += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._call, node, method, path, body)
+        finally:
+            node.outstanding -= 1
+
+    async def fetch_text(self, node: Node, path: str) -> str:
+        """
+        以文本形式读取节点的接口（如 /metrics），失败时抛出 requests 的异常。
+        """
+        resp = await asyncio.to_thread(self._session.get, f"{node.base_url}{path}", timeout=self.health_timeout)
+        resp.raise_for_status()
+        return resp.text
+
+    async def collect_metrics(self, label: str) -> str:
+        """
+        读取所有可用节点的 /metrics 并合并，每个样本加上 label="节点名称" 标签。
+        """
+        healthy = [n for n in self.nodes.values() if n.healthy]
+        texts = await asyncio.gather(*(self.fetch_text(n, "/metrics") for n in healthy), return_exceptions=True)
+        return merge_exposition({n.name: t for n, t in zip(healthy, texts) if isinstance(t, str)}, label)
+
+    async def forward(self, method: str, path: str, body: Any = None) -> Tuple[Optional[Node], int, Any]:
+        """
+        把请求转发给负载最低的可用节点，返回 (节点, HTTP 状态码, 响应内容)。
+        连接失败（节点已退出/网络中断）时把该节点标记为不可用并改投其他节点；
+        读取超时不改投（节点可能仍在抓取），返回 504。
+        """
+        tried: List[str] = []
+        async with self._slots:
+            while True:
+                node = self.pick(tried)
+                if node is None:
+                    return None, 503, {"code": 503, "message": "no_node_available", "data": {"tried": tried}}
+                try:
+                    status, payload = await self.request(node, method, path, body)
+                    self.forwarded += 1
+                    return node, status, payload
+                except (requests.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+                    self.mark_failed(node, f"{method} {path} failed: {e}", immediate=True)
+                    tried.append(node.name)
+                    self.rerouted += 1
+                except requests.Timeout:
+                    return node, 504, {"code": 504, "message": "node_timeout", "data": {"node": node.name, "path": path}}
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "forwarded": self.forwarded,
+            "rerouted": self.rerouted,
+            "nodes": [
+                {"name": n.name, "url": n.base_url, "healthy": n.healthy, "capacity": n.capacity,
+                 "outstanding": n.outstanding, "queued": n.queued,
+                 "load": round(n.load, 2) if n.capacity else None, "failures": n.failures,
+                 "last_seen": round(now - n.last_seen, 1) if n.last_seen else None, "health": n.health}
+                for n in self.nodes.values()
+            ],
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._session.close()
+
+
+def add_proxy_routes(app: FastAPI, nodes: NodePool, max_tracked_jobs: int = 100000):
+    """
+    在前端服务上注册与 server.py 相同的抓取接口（/xhs、/douyin、/toutiao、/jobs、/batch），请求按负载转发给节点，
+    请求体由节点校验。异步任务记住所在节点，查询时直接转发给该节点（记录丢失时依次询问所有可用节点）。
+
+    :param max_tracked_jobs: 最多记住多少个任务所在的节点
+    """
+    job_nodes: "OrderedDict[str, str]" = OrderedDict()
+
+    def remember_job(job_id: str, node: Node):
+        job_nodes[job_id] = node.name
+        job_nodes.move_to_end(job_id)
+        while len(job_nodes) > max_tracked_jobs:
+            job_nodes.popitem(last=False)
+
+    async def proxy(path: str, body: Dict[str, Any]) -> JSONResponse:
+        _, status, payload = await nodes.forward("POST", path, body)
+        return JSONResponse(payload, status_code=status)
+
+    @app.post("/xhs")
+    async def xhs(req: Dict[str, Any]) -> JSONResponse:
+        return await proxy("/xhs", req)
+
+    @app.post("/douyin")
+    async def douyin(req: Dict[str, Any]) -> JSONResponse:
+        return await proxy("/douyin", req)
+
+    @app.post("/toutiao")
+    async def toutiao(req: Dict[str, Any]) -> JSONResponse:
+        return await proxy("/toutiao", req)
+
+    @app.post("/jobs")
+    async def submit_job(req: Dict[str, Any]) -> JSONResponse:
+        node, status, payload = await nodes.forward("POST", "/jobs", req)
+        if node is not None and isinstance(payload, dict) and payload.get("code") == 200:
+            remember_job(payload["data"]["job_id"], node)
+        return JSONResponse(payload, status_code=status)
+
+    async def job_lookup(job_id: str, suffix: str) -> JSONResponse:
+        name = job_nodes.get(job_id)
+        if name in nodes.nodes:
+            try:
+                status, payload = await nodes.request(nodes.nodes[name], "GET", f"/jobs/{job_id}{suffix}")
+                return JSONResponse(payload, status_code=status)
+            except requests.RequestException as e:
+                return JSONResponse({"code": 503, "message": "node_unavailable",
+                                     "data": {"job_id": job_id, "node": name, "error": str(e)}}, status_code=503)
+        for node in [n for n in nodes.nodes.values() if n.healthy]:
+            try:
+                status, payload = await nodes.request(node, "GET", f"/jobs/{job_id}{suffix}")
+            except requests.RequestException:
+                continue
+            if payload.get("code") != 404:
+                remember_job(job_id, node)
+                return JSONResponse(payload, status_code=status)
+        return JSONResponse({"code": 404, "message": "job_not_found", "data": {"job_id": job_id}})
+
+    @app.get("/jobs/{job_id}")
+    async def job_status(job_id: str) -> JSONResponse:
+        return await job_lookup(job_id, "")
+
+    @app.get("/jobs/{job_id}/result")
+    async def job_result(job_id: str) -> JSONResponse:
+        return await job_lookup(job_id, "/result")
+
+    async def run_batch_item(index: int, item: Dict[str, Any], headless: bool) -> Dict[str, Any]:
+        # 每个条目单独转发（以单条目的 /batch 提交，保持 bulk 优先级），按转发时的负载分配节点
+        _, _, payload = await nodes.forward("POST", "/batch", {"items": [item], "headless": headless})
+        if isinstance(payload, list) and payload:
+            return dict(payload[0], index=index)
+        return {"index": index, "platform": item.get("platform"), "url": item.get("url"), "result": payload}
+
+    @app.post("/batch")
+    async def batch(req: Dict[str, Any]) -> StreamingResponse:
+        headless = req.get("headless", True)
+
+        async def stream():
+            tasks = [asyncio.create_task(run_batch_item(i, item, headless)) for i, item in enumerate(req.get("items", []))]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    line = await next_done
+                    yield json.dumps(line, ensure_ascii=False) + "\n"
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -0,0 +1,154 @@
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+# 发布时间与数量的规范化：正则在导入时编译一次；发布时间先按关键字分派到相对时间规则，
+# 其余按一个正则直接取出年月日时分秒构造 datetime，不再逐个格式 strptime。
+# 批量接口（parse_publish_times / convert_counts）只是逐个调用的简单封装，parse_publish_times 让整列共用同一个"当前时间"。
+
+# "3天前"、"5 小时前"、"10分钟前"
+_AGO_RE = re.compile(r"(\d+)\s*(秒|分钟|小时|天|周)前")
+_AGO_UNITS = {"秒": "seconds", "分钟": "minutes", "小时": "hours", "天": "days", "周": "weeks"}
+# "昨天 12:30"、"前天"、"今天 08:05"
+_DAY_WORD_RE = re.compile(r"(今天|昨天|前天)\s*(?:(\d{1,2}):(\d{1,2}))?")
+_DAY_WORD_OFFSETS = {"今天": 0, "昨天": 1, "前天": 2}
+# 绝对时间："2023-12-17 14:30:05"、"2023/12/17"、"2023年12月17日"、"12-17 14:30"、"12-17"，后面可跟地区等文字
+_ABSOLUTE_RE = re.compile(
+    r"^(?:(\d{4})[-/.年])?(\d{1,2})[-/.月](\d{1,2})日?(?:\s*(\d{1,2}):(\d{1,2})(?::(\d{1,2}))?)?")
+# 时间前的说明文字："发布时间：..."、"发布时间:..."、"发布于 ..."、"编辑于 ..."
+_PREFIX_RE = re.compile(r"^(?:[^：:\d]*[：:]|发布于|编辑于)\s*")
+
+# 数量：第一个数字及紧跟的单位，"1.2万"、"10万+"、"1.2w"、"3.4k"、"1.2亿"、"8.6万次播放"
+_COUNT_RE = re.compile(r"(\d+(?:\.\d+)?)\s*(千|[kK]|万|[wW]|亿)?")
+_COUNT_UNITS = {"千": 1000, "k": 1000, "K": 1000, "万": 10000, "w": 10000, "W": 10000, "亿": 100000000}
+
+# 平台页面上的时间都是北京时间：时间戳和相对时间按 UTC+8 计算，与服务器（如 Docker 容器默认的 UTC）时区无关
+PLATFORM_TZ = timezone(timedelta(hours=8))
+
+
+def _platform_now() -> datetime:
+    return datetime.now(PLATFORM_TZ).replace(tzinfo=None)
+
+
+def _format(dt: datetime) -> str:
+    return str(dt.replace(microsecond=0))
+
+
+def _parse_just_now(text: str, now: datetime) -> Optional[str]:
+    return _format(now)
+
+
+def _parse_ago(text: str, now: datetime) -> Optional[str]:
+    match = _AGO_RE.search(text)
+    if match is None:
+        return None
+    return _format(now - timedelta(**{_AGO_UNITS[match.group(2)]: int(match.group(1))}))
+
+
+def _parse_day_word(text: str, now: datetime) -> Optional[str]:
+    match = _DAY_WORD_RE.search(text)
+    if match is None:
+        return None
+    day = now - timedelta(days=_DAY_WORD_OFFSETS[match.group(1)])
+    hour, minute = match.group(2), match.group(3)
+    try:
+        return _format(day.replace(hour=int(hour or 0), minute=int(minute or 0), second=0))
+    except ValueError:
+        return None
+
+
+def _parse_absolute(text: str, now: datetime) -> Optional[str]:
+    match = _PREFIX_RE.match(text)
+    if match:
+        text = text[match.end():]
+    match = _ABSOLUTE_RE.match(text)
+    if match is None:
+        return None
+    year, month, day, hour, minute, second = match.groups()
+    try:
+        # 不带年份的（如 "12-17"）默认为当前年份
+        return str(datetime(int(year) if year else now.year, int(month), int(day),
+                            int(hour or 0), int(minute or 0), int(second or 0)))
+    except ValueError:
+        return None
+
+
+# 相对时间的分派表：(关键字, 解析函数)，文本包含关键字时尝试对应规则，都不匹配时按绝对时间解析
+_TIME_RULES: Tuple[Tuple[str, Callable[[str, datetime], Optional[str]]], ...] = (
+    ("刚刚", _parse_just_now),
+    ("前", _parse_ago),
+    ("天", _parse_day_word),
+)
+
+
+def _parse_text(text: str, now: datetime) -> Optional[str]:
+    text = text.strip()
+    if not text:
+        return None
+    # 快速通道：以数字开头且不含"前"的（绝大多数情况）直接按绝对时间解析
+    if not (text[0].isdigit() and "前" not in text):
+        for keyword, rule in _TIME_RULES:
+            if keyword in text:
+                result = rule(text, now)
+                if result is not None:
+                    return result
+    result = _parse_absolute(text, now)
+    if result is None:
+        print(f"[Warining]:无法解析时间格式: {text}")
+    return result
+
+
+def parse_publish_time(value: Any, now: Optional[datetime] = None) -> Optional[str]:
+    """
+    把各平台的发布时间规范化为 "YYYY-MM-DD HH:MM:SS"，无法解析时返回 None。
+    支持格式：
+    - "刚刚"、"N秒/分钟/小时/天/周前"
+    - "今天/昨天/前天 HH:MM"
+    - "发布时间：2023-01-01 12:00:00"、"发布于 ..." 等带前缀的时间
+    - "2023-12-17 广东"、"12-17 14:30 上海" 等带地区的日期（不带年份时为当前年份）
+    - 接口返回的 Unix 时间戳（秒或毫秒），转换为北京时间
+
+    :param now: 相对时间的基准（北京时间，不带时区），默认为当前时间
+    """
+    if not value:
+        return None
+    if isinstance(value, (int, float)):
+        ts = value / 1000 if value > 10 ** 11 else value
+        return _format(datetime.fromtimestamp(ts, PLATFORM_TZ).replace(tzinfo=None))
+    return _parse_text(str(value), now or _platform_now())
+
+
+def parse_publish_times(values: Iterable[Any], now: Optional[datetime] = None) -> List[Optional[str]]:
+    """
+    批量规范化发布时间，所有相对时间共用同一个基准时间。
+    """
+    now = now or _platform_now()
+    return [parse_publish_time(value, now) for value in values]
+
+
+def convert_count(value: Any) -> Optional[int]:
+    """
+    把字符串形式的数量（如 "1.2万"、"10万+"、"1.2w"、"3千"、"1.2亿"、"1,234"）转换为整数。
+    空值返回 None，不含数字的文字（如 "赞"）返回 0。
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value).strip()
+    if not text:
+        return None
+    match = _COUNT_RE.search(text.replace(",", ""))
+    if match is None:
+        return 0
+    number, unit = match.groups()
+    if unit:
+        return int(round(float(number) * _COUNT_UNITS[unit]))
+    return int(number) if "." not in number else int(float(number))
+
+
+def convert_counts(values: Iterable[Any]) -> List[Optional[int]]:
+    """
+    批量转换数量。
+    """
+    return [convert_count(value) for value in values]
@@ -0,0 +1,169 @@
+import asyncio
+import os
+import shutil
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from async_base_rpa import AsyncBaseRPA
+from config import TemplateConfig
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Linux FICLONE ioctl：在支持的文件系统（btrfs / xfs / overlayfs 等）上创建写时复制的文件副本
+FICLONE = 0x40049409
+
+# Chrome 运行时的锁文件，不能复制到新的 Profile 中
+LOCK_FILES = {"SingletonLock", "SingletonCookie", "SingletonSocket", "lockfile"}
+
+
+def _reflink(src: str, dst: str) -> bool:
+    if fcntl is None:
+        return False
+    try:
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        return True
+    except OSError:
+        return False
+
+
+def clone_tree(src: str, dst: str, hardlink_dirs: Optional[List[str]] = None) -> Dict[str, int]:
+    """
+    把模板目录复制到 dst：优先使用 reflink（写时复制，与模板互不影响），不支持时回退为普通复制；
+    hardlink_dirs 中的顶层目录使用硬链接（与模板共用文件，只适合 Chrome 不会原地改写的目录）。
+
+    :return: 各方式处理的文件数 {"reflink", "hardlink", "copy"}
+    """
+    hardlink_dirs = set(hardlink_dirs or [])
+    counts = {"reflink": 0, "hardlink": 0, "copy": 0}
+    reflink_supported = True
+    for root, _, files in os.walk(src):
+        rel = os.path.relpath(root, src)
+        target_dir = dst if rel == "." else os.path.join(dst, rel)
+        os.makedirs(target_dir, exist_ok=True)
+        top = rel.split(os.sep)[0]
+        for name in files:
+            if name in LOCK_FILES:
+                continue
+            source = os.path.join(root, name)
+            target = os.path.join(target_dir, name)
+            if top in hardlink_dirs:
+                try:
+                    os.link(source, target)
+                    counts["hardlink"] += 1
+                    continue
+                except OSError:
+                    pass
+            if reflink_supported and _reflink(source, target):
+                counts["reflink"] += 1
+                continue
+            # 第一次 reflink 失败后认为该文件系统不支持，后续文件直接复制
+            reflink_supported = False
+            shutil.copy2(source, target)
+            counts["copy"] += 1
+    return counts
+
+
+class ProfileTemplates:
+    """
+    预热好的 Profile 模板：每个设备指纹一份，启动一个上下文执行各平台的 warm_up（如小红书首次访问主页）后关闭保存。
+    新建或重建 worker 的 Profile 时直接从模板复制，不必再为预热打开页面等待；模板按 refresh_interval 定期重建。
+    """
+    def __init__(self, base_dir: str, device_profiles: List[Dict[str, Any]], config: Optional[TemplateConfig] = None,
+                 warmers: Optional[Callable[[], List[AsyncBaseRPA]]] = None):
+        """
+        :param base_dir: 模板根目录，每个设备指纹一个子目录 device_<序号>
+        :param device_profiles: 设备指纹配置（与 BrowserPool 相同）
+        :param config: 模板参数（见 TemplateConfig）
+        :param warmers: 返回构建模板时用于预热的 RPA 实例列表；为空时不构建模板
+        """
+        config = config or TemplateConfig()
+        self.base_dir = base_dir
+        self.device_profiles = device_profiles
+        self.refresh_interval = config.refresh_interval
+        self.hardlink_dirs = config.hardlink_dirs
+        self.warmers = warmers
+        self.built_at: Dict[int, float] = {}
+        self.clones = 0
+        self._locks = [asyncio.Lock() for _ in device_profiles]
+
+    def path(self, device_index: int) -> str:
+        return os.path.join(self.base_dir, f"device_{device_index}")
+
+    def available(self, device_index: int) -> bool:
+        return os.path.isdir(self.path(device_index))
+
+    async def build(self, device_index: int, playwright: Any):
+        """
+        构建（或刷新）一个设备指纹的模板：在临时目录中启动上下文并预热，完成后替换旧模板。
+        """
+        warmers = self.warmers() if self.warmers else []
+        if not warmers:
+            return
+        device = self.device_profiles[device_index]
+        target = self.path(device_index)
+        building = f"{target}.building"
+        if os.path.exists(building):
+            await asyncio.to_thread(shutil.rmtree, building)
+        os.makedirs(building)
+
+        context = await warmers[0]._get_browser_context(
+            playwright, building, True, device.get("user_agent"), device.get("viewport"), device.get("timezone_id"),
+        )
+        try:
+            for rpa in warmers:
+                await rpa.warm_up(context, building)
+        finally:
+            await context.close()
+
+        async with self._locks[device_index]:
+            old = f"{target}.old"
+            if os.path.exists(target):
+                os.replace(target, old)
+            os.replace(building, target)
+            if os.path.exists(old):
+                await asyncio.to_thread(shutil.rmtree, old)
+        self.built_at[device_index] = time.time()
+        print(f"INFO: [templates] device_{device_index} profile template built")
+
+    async def clone(self, device_index: int, user_data_dir: str) -> bool:
+        """
+        把模板复制到（已清空的）user_data_dir，模板不存在时返回 False。
+        """
+        async with self._locks[device_index]:
+            if not self.available(device_index):
+                return False
+            counts = await asyncio.to_thread(clone_tree, self.path(device_index), user_data_dir, self.hardlink_dirs)
+        self.clones += 1
+        print(f"INFO: [templates] cloned device_{device_index} template into {user_data_dir} {counts}")
+        return True
+
+    async def refresh_loop(self, get_playwright: Callable[[], Any], on_built: Optional[Callable[[], Any]] = None):
+        """
+        后台任务：构建缺失的模板，之后每隔 refresh_interval 秒刷新一次。每轮结束后调用 on_built。
+        """
+        while True:
+            playwright = await get_playwright()
+            for device_index in range(len(self.device_profiles)):
+                built_at = self.built_at.get(device_index)
+                if built_at is None and self.available(device_index):
+                    built_at = self.built_at[device_index] = os.path.getmtime(self.path(device_index))
+                if built_at is not None and time.time() - built_at < self.refresh_interval:
+                    continue
+                try:
+                    await self.build(device_index, playwright)
+                except Exception as e:
+                    print(f"WARNING: [templates] device_{device_index} template build failed: {e}")
+            if on_built is not None:
+                await on_built()
+            await asyncio.sleep(min(self.refresh_interval, 3600))
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "clones": self.clones,
+            "templates": {i: round(now - t) for i, t in self.built_at.items()},
+        }
@@ -0,0 +1,120 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import CacheConfig
+
+
+class ResultCache:
+    """
+    抓取结果缓存，按作品键（"平台:作品ID"，见 content_index）缓存各接口返回的响应。
+    内存层为有上限的 LRU，可选的磁盘层每个作品一个 JSON 文件，服务重启后仍可命中。
+    过期时间按平台和结果状态码分别配置（计数变化快的 200 较短，已下架的 404 较长），
+    只缓存配置中列出的状态码，403/502 等失败结果不缓存。线程安全。
+    """
+    def __init__(self, config: Optional[CacheConfig] = None, clock: Callable[[], float] = time.time):
+        """
+        :param clock: 返回当前 Unix 时间戳的函数（测试时可替换为可控的时钟）
+        """
+        config = config or CacheConfig()
+        self.clock = clock
+        self.ttls = config.ttls
+        self.max_entries = config.max_entries
+        self.disk_dir = config.disk_dir
+        # 作品键 -> (写入时间, 响应)，按最近使用排序
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def ttl(self, key: str, code: Any) -> Optional[float]:
+        """
+        返回该作品该状态码结果的缓存时间（秒），不缓存时返回 None。
+        """
+        platform = key.partition(":")[0]
+        return self.ttls.get(platform, {}).get(code)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key.replace(":", "_") + ".json")
+
+    def _read_disk(self, key: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data["stored_at"], data["result"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"warning: 读取结果缓存失败 {path}: {e}")
+            return None
+
+    def _write_disk(self, key: str, stored_at: float, result: Dict[str, Any]):
+        path = self._disk_path(key)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"key": key, "stored_at": stored_at, "result": result}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"warning: 写入结果缓存失败 {path}: {e}")
+
+    def _remember(self, key: str, stored_at: float, result: Dict[str, Any]):
+        self._entries[key] = (stored_at, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        查询缓存，命中时返回带 cache_age（结果的存活秒数）字段的响应副本。
+
+        :param key: 作品键
+        :param max_age: 调用方能接受的最大结果存活秒数，与状态码的 TTL 取较小值；0 表示不使用缓存
+        :return: 响应字典；未命中或已过期时返回 None
+        """
+        if max_age is not None and max_age <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None and self.disk_dir:
+            entry = self._read_disk(key)
+            if entry is not None:
+                with self._lock:
+                    self._remember(key, *entry)
+
+        if entry is not None:
+            stored_at, result = entry
+            age = self.clock() - stored_at
+            ttl = self.ttl(key, result.get("code"))
+            if ttl is not None and age < ttl and (max_age is None or age <= max_age):
+                with self._lock:
+                    self.hits += 1
+                return dict(result, cache_age=round(age, 1))
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """
+        写入一次抓取的响应；状态码不在该平台的 TTL 配置中时忽略。
+        """
+        if self.ttl(key, result.get("code")) is None:
+            return
+        stored_at = self.clock()
+        with self._lock:
+            self._remember(key, stored_at, result)
+        if self.disk_dir:
+            self._write_disk(key, stored_at, result)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries,
+                    "hits": self.hits, "misses": self.misses, "disk": bool(self.disk_dir)}
@@ -0,0 +1,44 @@
+import json
+from typing import Any, Dict, Optional
+
+try:
+    import orjson
+except ImportError:  # orjson 是项目依赖（pyproject.toml），未安装时（如直接运行脚本的环境）回退到标准库
+    orjson = None
+
+
+class RPAResult:
+    """
+    一次抓取的结果（code / message / data），由 run / extract_info 直接返回，不再先序列化为 JSON 字符串。
+    服务端取 to_dict() 使用，HTTP 响应时用 dumps 序列化（任务队列另外把结果以 JSON 存入 SQLite）；
+    单独运行的脚本用 to_json() 得到与以前相同的字符串。
+    error 记录浏览器/传输异常的类型名或页面等待超时（"TIMEOUT"），内容层面的结果（下架、登录页等）为 None；
+    只供上下文池判断浏览器是否可能已崩溃，不输出到响应。
+    """
+    __slots__ = ("code", "message", "data", "error")
+
+    def __init__(self, code: int, message: str, data: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        self.code = code
+        self.message = message
+        self.data = data
+        self.error = error
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"code": self.code, "message": self.message, "data": self.data}
+
+    def to_json(self, indent: Optional[int] = None) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=indent)
+
+    def __repr__(self) -> str:
+        return f"RPAResult(code={self.code!r}, message={self.message!r})"
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    把响应内容序列化为 UTF-8 JSON（中文不转义）：已安装 orjson 时使用 orjson，否则使用标准库 json。
+    """
+    if isinstance(obj, RPAResult):
+        obj = obj.to_dict()
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
@@ -1,22 +1,48 @@
 import asyncio
-import json
 import os
-import shutil
 import time
-from collections import deque
+import uuid
+from contextvars import ContextVar
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
 
-from config import Config_Douyin, Config_Toutiao, Config_Xhs, ServerConfig
-from RPA_douyin import get_douyin_short_video_info
-from RPA_toutiao import get_toutiao_info
-from RPA_xhs_sharelk import get_xhs_info
+import metrics
+import rpa_result
+import tracing
+from browser_pool import BrowserPool
+from config import (CacheConfig, Config_Douyin, Config_Toutiao, Config_Xhs, CoordinatorConfig, HealthConfig, JobConfig,
+                    LimiterConfig, PoolConfig, RouterConfig, ServerConfig, ShardConfig, TemplateConfig,
+                    TraceConfig)
+from coordinator import heartbeat_loop, node_identity
+from content_index import format_key
+from job_queue import JobQueue
+from limiter import build_limiters
+from profile_templates import ProfileTemplates
+from result_cache import ResultCache
+from rpa_result import RPAResult
+from RPA_douyin import AsyncDouyinRPA
+from RPA_toutiao import AsyncToutiaoRPA
+from RPA_xhs_sharelk import AsyncXhsRPA
+from sharding import shard_count, shard_from_env
+from toutiao_http import ToutiaoHttpExtractor
+from url_router import UrlRouter
+from worker_health import WorkerHealth
 
-app = FastAPI()
+class FastJSONResponse(Response):
+    """
+    用 rpa_result.dumps（优先 orjson）序列化的 JSON 响应。抓取接口直接返回该响应，不经过 FastAPI 的 jsonable_encoder。
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return rpa_result.dumps(content)
+
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # 定义 8 个固定的 Profile 目录
 BASE_DIR = Path(__file__).parent
@@ -83,127 +109,326 @@ DEVICE_PROFILES = [
     },
 ]
 
+# 多进程分片（见 sharding.py）：分片进程只使用序号 % 分片数 == 分片序号 的 worker，
+# 设备指纹仍按 worker 的全局序号分配；单进程运行时使用全部 worker
+SHARD_INDEX, SHARD_COUNT = shard_from_env()
+SHARD_WORKERS = list(range(SHARD_INDEX, len(PROFILE_PATHS), SHARD_COUNT))
+SHARD_PROFILE_PATHS = [PROFILE_PATHS[i] for i in SHARD_WORKERS]
+SHARD_DEVICE_PROFILES = [DEVICE_PROFILES[i % len(DEVICE_PROFILES)] for i in SHARD_WORKERS]
 
-# 并发控制
+
+# 并发控制：总并发上限等于上下文池的标签页总数，在 startup 中根据 PoolConfig 计算；
+# 各平台另有自适应并发上限（LimiterConfig），按成功率和耗时自动调整
 MAX_CONCURRENCY = 3
-_concurrency_sem = None  # 在 startup 中初始化
-_worker_index = 0
-_worker_lock = None      # 在 startup 中初始化
-_worker_queues = []      # 每个 worker 的状态队列 (长度 3)
+_limiters = {}           # 平台 -> AdaptiveLimiter，在 startup 中初始化
+_worker_health = None    # 所有平台共用的 worker 健康分、隔离与后台重建，在 startup 中初始化
+_templates_task = None   # 预热 Profile 模板的构建/定期刷新任务
+_heartbeat_task = None   # 向协调者注册/心跳的任务（见 coordinator.py），未配置协调者时为 None
+_browser_pool = None     # 长驻浏览器上下文池（异步引擎），在 startup 中初始化
+_toutiao_http = None     # 头条文章/微头条 HTTP 快速通道（共用连接池），在 startup 中初始化
+_url_router = None       # 打开浏览器前的 URL 分类/短链解析，在 startup 中初始化
+# 各平台用于重建后预热的 RPA（见 AsyncBaseRPA.warm_up）
+WARMERS = {
+    "xhs": lambda: AsyncXhsRPA(Config_Xhs()),
+    "douyin": lambda: AsyncDouyinRPA(Config_Douyin()),
+    "toutiao": lambda: AsyncToutiaoRPA(Config_Toutiao()),
+}
+_result_cache = None     # 按作品键缓存抓取结果，在 startup 中初始化（CacheConfig.enabled 为 False 时为 None）
+_in_flight: Dict[Tuple[str, str, bool], asyncio.Future] = {}  # 正在抓取的作品 -> 结果 Future，并发的重复请求共用
+_coalesce_stats = {"scrapes": 0, "coalesced": 0}
+_job_cfg = JobConfig()
+if SHARD_COUNT > 1:
+    # 每个分片使用自己的任务队列：同步接口在本进程内等待任务结果
+    root, ext = os.path.splitext(_job_cfg.path)
+    _job_cfg.path = f"{root}.shard{SHARD_INDEX}{ext}"
+_job_queue = None        # 持久化任务队列，在 startup 中初始化
+_job_waiters: Dict[str, asyncio.Future] = {}  # 任务 ID -> 同步接口等待的 Future
+_job_wakeup = None       # 提交任务时唤醒空闲的执行协程
+_job_dispatchers: List[asyncio.Task] = []
+# 当前执行任务的优先级：执行协程先取出任务、再等待平台并发名额和标签页，等待时按该优先级排队，
+# 否则较早取出的 bulk 任务会一直排在之后取出的交互式任务前面
+_job_priority: ContextVar[int] = ContextVar("job_priority", default=0)
+_trace_exporter = None   # 追踪 span 的 JSONL 导出，TraceConfig.export_path 为 None 时不导出
 
 @app.on_event("startup")
 async def startup_event():
-    global _concurrency_sem, _worker_lock, _worker_queues
-    _concurrency_sem = asyncio.Semaphore(MAX_CONCURRENCY)
-    _worker_lock = asyncio.Lock()
-    _worker_queues = [deque(maxlen=3) for _ in range(len(PROFILE_PATHS))]
-    
+    global MAX_CONCURRENCY, _limiters, _worker_health, _browser_pool, _toutiao_http, _url_router, _result_cache
+    global _job_queue, _job_wakeup, _templates_task, _heartbeat_task, _trace_exporter
     # 确保目录存在
-    for path in PROFILE_PATHS:
+    for path in SHARD_PROFILE_PATHS:
         os.makedirs(path, exist_ok=True)
-    print(f"INFO: Profile pool initialized with {len(PROFILE_PATHS)} workers. Max concurrency: {MAX_CONCURRENCY}")
 
-async def get_next_worker_info():
-    global _worker_index
-    async with _worker_lock:
-        idx = _worker_index
-        path = PROFILE_PATHS[idx]
-        profile = DEVICE_PROFILES[idx]
-        _worker_index = (_worker_index + 1) % len(PROFILE_PATHS)
-        return idx, path, profile
+    pool_cfg = PoolConfig()
+    _browser_pool = BrowserPool(SHARD_PROFILE_PATHS, SHARD_DEVICE_PROFILES, pool_cfg)
+    health_cfg = HealthConfig()
+    warmers = lambda: [WARMERS[platform]() for platform in health_cfg.warm_platforms if platform in WARMERS]
+    _worker_health = WorkerHealth(_browser_pool, health_cfg, warmers)
+    template_cfg = TemplateConfig()
+    if template_cfg.enabled:
+        # 模板按分片内的设备序号命名，各分片使用各自的子目录
+        template_dir = BASE_DIR / template_cfg.dir / (f"shard_{SHARD_INDEX}" if SHARD_COUNT > 1 else "")
+        _browser_pool.templates = ProfileTemplates(str(template_dir), SHARD_DEVICE_PROFILES, template_cfg, warmers)
+        _templates_task = asyncio.create_task(
+            _browser_pool.templates.refresh_loop(_browser_pool._get_playwright, _browser_pool.seed_fresh_profiles))
+    _url_router = UrlRouter(RouterConfig())
+    cache_cfg = CacheConfig()
+    if cache_cfg.enabled:
+        _result_cache = ResultCache(cache_cfg)
+    toutiao_cfg = Config_Toutiao()
+    if toutiao_cfg.http_fast_path:
+        _toutiao_http = ToutiaoHttpExtractor(toutiao_cfg)
+    trace_cfg = TraceConfig()
+    if trace_cfg.export_path:
+        _trace_exporter = tracing.JsonlExporter(str(BASE_DIR / trace_cfg.export_path))
+    MAX_CONCURRENCY = _browser_pool.capacity
+    _limiters = build_limiters(LimiterConfig())
+    shard = f" (shard {SHARD_INDEX}/{SHARD_COUNT})" if SHARD_COUNT > 1 else ""
+    print(f"INFO: Profile pool initialized with {len(SHARD_PROFILE_PATHS)} workers{shard}. Max concurrency: {MAX_CONCURRENCY}")
+
+    _job_queue = JobQueue(_job_cfg)
+    requeued = _job_queue.recover()
+    _job_wakeup = asyncio.Event()
+    dispatchers = _job_cfg.dispatchers or MAX_CONCURRENCY * 2
+    _job_dispatchers.extend(asyncio.create_task(_job_dispatcher()) for _ in range(dispatchers))
+    print(f"INFO: Job queue started with {dispatchers} dispatchers ({requeued} unfinished jobs requeued)")
+
+    # 分片进程只由本机前端访问，由前端向协调者注册
+    coord_cfg = CoordinatorConfig()
+    coordinator_url, node_name, node_url = node_identity(coord_cfg, ServerConfig().port)
+    if coordinator_url and SHARD_COUNT == 1:
+        _heartbeat_task = asyncio.create_task(heartbeat_loop(coordinator_url, node_name, node_url, health, coord_cfg))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if _heartbeat_task:
+        _heartbeat_task.cancel()
+        await asyncio.gather(_heartbeat_task, return_exceptions=True)
+    if _templates_task:
+        _templates_task.cancel()
+    for task in _job_dispatchers:
+        task.cancel()
+    await asyncio.gather(*_job_dispatchers, return_exceptions=True)
+    if _worker_health:
+        await _worker_health.shutdown()
+    if _job_queue:
+        _job_queue.close()
+    if _browser_pool:
+        await _browser_pool.shutdown()
+    if _toutiao_http:
+        _toutiao_http.close()
+    if _url_router:
+        _url_router.close()
+
+async def _run_on_worker(rpa: Any, url: str, download_media: bool, headless: bool) -> Tuple[int, str, RPAResult]:
+    """
+    从上下文池占用一个标签页（优先使用已打开的上下文，按该平台的成功率、耗时和占用率挑选）执行抓取，
+    返回 (worker 序号, Profile 目录, 抓取结果)。
+    """
+    with tracing.span("acquire_worker"):
+        worker = await _browser_pool.acquire(headless, rpa.platform, _job_priority.get())
+    try:
+        with tracing.span("worker_run", worker=worker.index + 1, profile=os.path.basename(worker.user_data_dir)):
+            result = await worker.run(rpa, url, download_media)
+        return worker.index, worker.user_data_dir, result
+    finally:
+        await _browser_pool.release(worker)
+
+async def _route_url(rpa: Any, url: str) -> Tuple[str, Optional[str], Dict[str, Any]]:
+    """
+    打开浏览器前解析短链并校验链接，返回 (规范化后的 URL, 作品键, 拒绝响应)；
+    作品键用于结果缓存，短链解析失败时为 None；链接可以处理时拒绝响应为 None。
+    """
+    with tracing.span("route", url=url) as span:
+        route = await asyncio.to_thread(_url_router.resolve, url)
+        span.set(page_type=route.get("page_type"), content_id=route.get("content_id"))
+    rejected = rpa._reject_route(route, url)
+    key = format_key((route["platform"], route["content_id"])) if route.get("content_id") else None
+    return route["url"], key, rejected.to_dict() if rejected else None
+
+async def _cache_lookup(key: Optional[str], max_age: Optional[float], download_media: bool) -> Optional[Dict[str, Any]]:
+    """
+    查询结果缓存；需要下载媒体的请求必须实际打开页面，不读缓存。
+    """
+    if _result_cache is None or key is None or download_media:
+        return None
+    with tracing.span("cache_lookup", key=key) as span:
+        cached = await asyncio.to_thread(_result_cache.get, key, max_age)
+        span.set(hit=cached is not None)
+    return cached
+
+async def _cache_store(key: Optional[str], resp: Dict[str, Any]):
+    if _result_cache is not None and key is not None:
+        await asyncio.to_thread(_result_cache.put, key, resp)
+
+async def _coalesce(source: str, flight_key: str, download_media: bool, start: float, original_url: str,
+                    scrape: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    同一作品的并发请求只抓取一次：已有相同作品在抓取时直接等待其结果，否则由当前请求执行 scrape 并把结果分发给等待者。
+    不下载媒体的请求也可以等待下载媒体的抓取；下载媒体的请求只等待同样下载媒体的抓取。
+
+    :param flight_key: 作品键，短链解析失败时为规范化后的 URL
+    """
+    keys = [(source, flight_key, True)] if download_media else [(source, flight_key, False), (source, flight_key, True)]
+    while True:
+        future = next((_in_flight[k] for k in keys if k in _in_flight), None)
+        if future is None:
+            break
+        try:
+            with tracing.span("coalesce_wait", key=flight_key):
+                resp = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # 执行抓取的请求被取消（如客户端断开）时重新竞争执行权，自身被取消时照常退出
+            if future.cancelled():
+                continue
+            raise
+        _coalesce_stats["coalesced"] += 1
+        _log_request(source, resp.get("code"), start, original_url, "coalesced")
+        return resp
+
+    own_key = (source, flight_key, download_media)
+    future = asyncio.get_running_loop().create_future()
+    _in_flight[own_key] = future
+    _coalesce_stats["scrapes"] += 1
+    try:
+        resp = await scrape()
+        future.set_result(resp)
+        return resp
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except BaseException as e:
+        future.set_exception(e)
+        future.exception()  # 没有等待者时避免 "exception was never retrieved" 警告
+        raise
+    finally:
+        del _in_flight[own_key]
+
+def _log_request(source: str, code: Any, start: float, url: str, worker: Any):
+    cost = time.perf_counter() - start
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{now}] [{source}] code={code} cost={cost:.2f}s url={url} worker={worker}")
+    # worker 为 Profile 目录时按目录名（worker_N）统计，其余为 cache / http / coalesced 等来源标记
+    worker_label = os.path.basename(worker) if worker and os.sep in str(worker) else str(worker or "none")
+    metrics.REQUESTS.inc(platform=source, worker=worker_label, code=code)
+    metrics.REQUEST_SECONDS.observe(cost, platform=source)
 
 class XhsRequest(BaseModel):
     url: str
     download_img: bool = True
     headless: bool = True
+    api_capture: Optional[bool] = None  # None 表示使用 Config_Xhs.api_capture
+    max_age: Optional[float] = None     # 可接受的缓存结果最大存活秒数，None 表示按 CacheConfig.ttls，0 表示不读缓存
+    trace: bool = False                 # 为 True 时响应中附带本次请求各步骤的 span（见 tracing.py）
 
 class DouyinRequest(BaseModel):
     url: str
     download_video: bool = True
     headless: bool = True
+    api_capture: Optional[bool] = None  # None 表示使用 Config_Douyin.api_capture
+    max_age: Optional[float] = None     # 可接受的缓存结果最大存活秒数，None 表示按 CacheConfig.ttls，0 表示不读缓存
+    trace: bool = False                 # 为 True 时响应中附带本次请求各步骤的 span（见 tracing.py）
 
 class ToutiaoRequest(BaseModel):
     url: str
     download_video: bool = True
     headless: bool = True
+    max_age: Optional[float] = None     # 可接受的缓存结果最大存活秒数，None 表示按 CacheConfig.ttls，0 表示不读缓存
+    trace: bool = False                 # 为 True 时响应中附带本次请求各步骤的 span（见 tracing.py）
 
-def _safe_parse_json(text: Any) -> Dict[str, Any]:
-    if isinstance(text, dict):
-        return text
-    if isinstance(text, str):
-        try:
-            return json.loads(text)
-        except Exception:
-            return {
-                "code": 500,
-                "message": "invalid_json_response",
-                "data": {"raw": text},
-            }
-    return {"code": 500, "message": "invalid_response_type", "data": {"type": str(type(text))}}
+class JobRequest(BaseModel):
+    platform: str                       # xhs / douyin / toutiao
+    url: str
+    download_media: bool = False
+    headless: bool = True
+    max_age: Optional[float] = None
+    priority: str = "normal"            # JobConfig.priorities 中的名称
+    max_attempts: Optional[int] = None  # None 表示使用 JobConfig.max_attempts
+    trace: bool = False
+
+class BatchItem(BaseModel):
+    platform: str                       # xhs / douyin / toutiao
+    url: str
+    download_media: bool = False
+    max_age: Optional[float] = None
+    trace: bool = False
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
+    headless: bool = True
+
+def _result_dict(result: Any) -> Dict[str, Any]:
+    """
+    把 RPA 返回的 RPAResult 转换为响应字典（不经过 JSON 字符串），其他类型视为异常结果。
+    """
+    if isinstance(result, RPAResult):
+        return result.to_dict()
+    if isinstance(result, dict):
+        return result
+    return {"code": 500, "message": "invalid_response_type", "data": {"type": str(type(result))}}
 
 @app.get("/health")
 async def health() -> Dict[str, Any]:
-    available_slots = _concurrency_sem._value if _concurrency_sem else 0
+    available_slots = sum(w.free_tabs for w in _browser_pool.workers) if _browser_pool else 0
     return {
         "status": "ok", 
-        "total_workers": len(PROFILE_PATHS),
+        "total_workers": len(SHARD_PROFILE_PATHS),
+        "shard": {"index": SHARD_INDEX, "count": SHARD_COUNT, "profiles": SHARD_PROFILE_PATHS} if SHARD_COUNT > 1 else None,
         "max_concurrency": MAX_CONCURRENCY,
-        "available_concurrency_slots": available_slots
+        "available_concurrency_slots": available_slots,
+        "platform_limits": {platform: limiter.stats() for platform, limiter in _limiters.items()},
+        "workers": _browser_pool.stats() if _browser_pool else [],
+        "health": _worker_health.stats() if _worker_health else None,
+        "templates": _browser_pool.templates.stats() if _browser_pool and _browser_pool.templates else None,
+        "cache": _result_cache.stats() if _result_cache else None,
+        "in_flight": len(_in_flight),
+        "coalesce": dict(_coalesce_stats),
+        "jobs": _job_queue.stats() if _job_queue else {},
     }
 
-@app.post("/xhs")
-async def xhs(req: XhsRequest) -> Dict[str, Any]:
+@app.get("/metrics")
+async def metrics_endpoint() -> PlainTextResponse:
+    """
+    Prometheus 文本格式的指标：按平台/worker/状态码的请求数、各阶段耗时直方图，以及执行中/排队的数量。
+    """
+    for platform, limiter in _limiters.items():
+        metrics.IN_FLIGHT.set(limiter.in_flight, platform=platform)
+        metrics.PLATFORM_LIMIT.set(limiter.limit, platform=platform)
+    if _job_queue:
+        job_stats = await asyncio.to_thread(_job_queue.stats)
+        metrics.JOBS.clear()
+        for status in ("queued", "running", "done", "failed"):
+            metrics.JOBS.set(job_stats.get(status, 0), status=status)
+    if _browser_pool:
+        for worker in _browser_pool.workers:
+            metrics.WORKER_TABS.set(worker.in_flight, worker=os.path.basename(worker.user_data_dir))
+    metrics.COALESCED_IN_FLIGHT.set(len(_in_flight))
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+async def _handle_xhs(req: XhsRequest) -> Dict[str, Any]:
     start = time.perf_counter()
-    
-    # 使用信号量限制并发
-    async with _concurrency_sem:
-        # 获取下一个 worker (Round-Robin)
-        idx, profile_dir, profile = await get_next_worker_info()
-        
+    rpa = AsyncXhsRPA(Config_Xhs(), req.api_capture)
+    url, key, rejected = await _route_url(rpa, req.url)
+    if rejected:
+        _log_request("xhs", rejected["code"], start, req.url, None)
+        return rejected
+    cached = await _cache_lookup(key, req.max_age, req.download_img)
+    if cached:
+        _log_request("xhs", cached["code"], start, req.url, "cache")
+        return cached
+    return await _coalesce("xhs", key or url, req.download_img, start, req.url,
+                           lambda: _scrape_xhs(rpa, req, url, key, start))
+
+async def _scrape_xhs(rpa: AsyncXhsRPA, req: XhsRequest, url: str, key: Optional[str], start: float) -> Dict[str, Any]:
+    # 按平台的自适应并发上限限制并发
+    async with _limiters["xhs"].slot(_job_priority.get()) as slot:
+        profile_dir = None
         status_code = 200
         try:
-            cfg = Config_Xhs()
-            result_text = await asyncio.to_thread(
-                get_xhs_info,
-                req.url,
-                cfg.xpaths,
-                cfg.wait_list,
-                cfg.save_dir,
-                req.download_img,
-                profile_dir,
-                req.headless,
-                profile["user_agent"],
-                profile["viewport"],
-                profile["timezone_id"]
-            )
-            resp = _safe_parse_json(result_text)
+            idx, profile_dir, result = await _run_on_worker(rpa, url, req.download_img, req.headless)
+            resp = _result_dict(result)
             status_code = resp.get("code", 200)
-            message = resp.get("message", "")
-
-            # --- 小红书健康检查机制 ---
-            if "可能被重定向到登录页" in message:
-                _worker_queues[idx].append("warning")
-                print(f"小红书 Worker_{idx+1} 警告: {message}")
-            elif message == "SUCCESS: 小红书数据提取成功":
-                print(f"小红书 Worker_{idx+1} 正常: {message}")
-                _worker_queues[idx].append("normal")
-            
-            # 检查是否连续 3 次警告
-            if len(_worker_queues[idx]) == 3 and all(s == "warning" for s in _worker_queues[idx]):
-                now_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                print(f"[{now_str}] [xhs] Worker_{idx+1} is dead (3 consecutive warnings). Destroying and re-initializing...")
-                
-                # 销毁 (删除目录)
-                if os.path.exists(profile_dir):
-                    shutil.rmtree(profile_dir)
-                
-                # 重新初始化 (创建目录)
-                os.makedirs(profile_dir, exist_ok=True)
-                
-                # 重置队列
-                _worker_queues[idx].clear()
-            # ------------------------
-
+            await _cache_store(key, resp)
+            _worker_health.record(idx, "xhs", resp)
             return resp
         except Exception as e:
             status_code = 500
@@ -213,35 +438,33 @@ async def xhs(req: XhsRequest) -> Dict[str, Any]:
                 "data": {"source": "小红书", "error": str(e), "url": req.url},
             }
         finally:
-            cost = time.perf_counter() - start
-            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            print(f"[{now}] [xhs] code={status_code} cost={cost:.2f}s url={req.url} worker={profile_dir}")
+            slot.record(status_code)
+            _log_request("xhs", status_code, start, req.url, profile_dir)
 
-@app.post("/douyin")
-async def douyin(req: DouyinRequest) -> Dict[str, Any]:
+async def _handle_douyin(req: DouyinRequest) -> Dict[str, Any]:
     start = time.perf_counter()
-    
-    async with _concurrency_sem:
-        idx, profile_dir, profile = await get_next_worker_info()
-        
+    rpa = AsyncDouyinRPA(Config_Douyin(), req.api_capture)
+    url, key, rejected = await _route_url(rpa, req.url)
+    if rejected:
+        _log_request("douyin", rejected["code"], start, req.url, None)
+        return rejected
+    cached = await _cache_lookup(key, req.max_age, req.download_video)
+    if cached:
+        _log_request("douyin", cached["code"], start, req.url, "cache")
+        return cached
+    return await _coalesce("douyin", key or url, req.download_video, start, req.url,
+                           lambda: _scrape_douyin(rpa, req, url, key, start))
+
+async def _scrape_douyin(rpa: AsyncDouyinRPA, req: DouyinRequest, url: str, key: Optional[str], start: float) -> Dict[str, Any]:
+    async with _limiters["douyin"].slot(_job_priority.get()) as slot:
+        profile_dir = None
         status_code = 200
         try:
-            cfg = Config_Douyin()
-            result_text = await asyncio.to_thread(
-                get_douyin_short_video_info,
-                req.url,
-                cfg.xpaths,
-                cfg.wait_list,
-                cfg.save_dir,
-                req.download_video,
-                profile_dir,
-                req.headless,
-                profile["user_agent"],
-                profile["viewport"],
-                profile["timezone_id"]
-            )
-            resp = _safe_parse_json(result_text)
+            idx, profile_dir, result = await _run_on_worker(rpa, url, req.download_video, req.headless)
+            resp = _result_dict(result)
             status_code = resp.get("code", 200)
+            await _cache_store(key, resp)
+            _worker_health.record(idx, "douyin", resp)
             return resp
         except Exception as e:
             status_code = 500
@@ -251,35 +474,44 @@ async def douyin(req: DouyinRequest) -> Dict[str, Any]:
                 "data": {"source": "抖音", "error": str(e), "url": req.url},
             }
         finally:
-            cost = time.perf_counter() - start
-            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            print(f"[{now}] [douyin] code={status_code} cost={cost:.2f}s url={req.url} worker={profile_dir}")
+            slot.record(status_code)
+            _log_request("douyin", status_code, start, req.url, profile_dir)
 
-@app.post("/toutiao")
-async def toutiao(req: ToutiaoRequest) -> Dict[str, Any]:
+async def _handle_toutiao(req: ToutiaoRequest) -> Dict[str, Any]:
     start = time.perf_counter()
-    
-    async with _concurrency_sem:
-        idx, profile_dir, profile = await get_next_worker_info()
-        
+    rpa = AsyncToutiaoRPA(Config_Toutiao())
+    url, key, rejected = await _route_url(rpa, req.url)
+    if rejected:
+        _log_request("toutiao", rejected["code"], start, req.url, None)
+        return rejected
+    cached = await _cache_lookup(key, req.max_age, req.download_video)
+    if cached:
+        _log_request("toutiao", cached["code"], start, req.url, "cache")
+        return cached
+    return await _coalesce("toutiao", key or url, req.download_video, start, req.url,
+                           lambda: _scrape_toutiao(rpa, req, url, key, start))
+
+async def _scrape_toutiao(rpa: AsyncToutiaoRPA, req: ToutiaoRequest, url: str, key: Optional[str], start: float) -> Dict[str, Any]:
+    # 文章/微头条先走 HTTP 快速通道，不占用浏览器并发名额；解析失败再交给浏览器
+    if _toutiao_http:
+        with tracing.span("http_fast_path") as span:
+            fast_result = await asyncio.to_thread(_toutiao_http.extract, url)
+            span.set(hit=fast_result is not None)
+        if fast_result is not None:
+            resp = fast_result.to_dict()
+            await _cache_store(key, resp)
+            _log_request("toutiao", resp.get("code", 200), start, req.url, "http")
+            return resp
+
+    async with _limiters["toutiao"].slot(_job_priority.get()) as slot:
+        profile_dir = None
         status_code = 200
         try:
-            cfg = Config_Toutiao()
-            result_text = await asyncio.to_thread(
-                get_toutiao_info,
-                req.url,
-                cfg.xpaths,
-                cfg.wait_list,
-                cfg.save_dir,
-                req.download_video,
-                profile_dir,
-                req.headless,
-                profile["user_agent"],
-                profile["viewport"],
-                profile["timezone_id"]
-            )
-            resp = _safe_parse_json(result_text)
+            idx, profile_dir, result = await _run_on_worker(rpa, url, req.download_video, req.headless)
+            resp = _result_dict(result)
             status_code = resp.get("code", 200)
+            await _cache_store(key, resp)
+            _worker_health.record(idx, "toutiao", resp)
             return resp
         except Exception as e:
             status_code = 500
@@ -289,11 +521,201 @@ async def toutiao(req: ToutiaoRequest) -> Dict[str, Any]:
                 "data": {"source": "头条", "error": str(e), "url": req.url},
             }
         finally:
-            cost = time.perf_counter() - start
-            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            print(f"[{now}] [toutiao] code={status_code} cost={cost:.2f}s url={req.url} worker={profile_dir}")
+            slot.record(status_code)
+            _log_request("toutiao", status_code, start, req.url, profile_dir)
+
+# 各平台对应的 (处理函数, 请求模型, 下载媒体参数名)，任务执行时按 platform 查找
+JOB_HANDLERS: Dict[str, Tuple[Callable[[Any], Awaitable[Dict[str, Any]]], Any, str]] = {
+    "xhs": (_handle_xhs, XhsRequest, "download_img"),
+    "douyin": (_handle_douyin, DouyinRequest, "download_video"),
+    "toutiao": (_handle_toutiao, ToutiaoRequest, "download_video"),
+}
+
+def _build_request(platform: str, url: str, download_media: bool, headless: bool, max_age: Optional[float],
+                   trace: bool = False) -> Any:
+    """
+    把通用的抓取参数转换为对应平台接口的请求模型，平台不支持时返回 None。
+    """
+    entry = JOB_HANDLERS.get(platform)
+    if entry is None:
+        return None
+    _, model, download_field = entry
+    return model(url=url, headless=headless, max_age=max_age, trace=trace, **{download_field: download_media})
+
+async def _job_dispatcher():
+    """
+    任务执行协程：循环从队列取出优先级最高的任务执行，队列为空时等待新任务（或重试任务到期）。
+    """
+    while True:
+        _job_wakeup.clear()
+        job = await asyncio.to_thread(_job_queue.claim)
+        if job is None:
+            try:
+                await asyncio.wait_for(_job_wakeup.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        try:
+            await _execute_job(job)
+        except Exception as e:
+            print(f"WARNING: [jobs] job {job['id']} dispatch failed: {e}")
+
+def _should_retry(job: Dict[str, Any], resp: Dict[str, Any]) -> bool:
+    """
+    按结果判断任务是否需要重试：登录页/风控结果不重试，502 只对后台（bulk）任务重试。
+    """
+    message = str(resp.get("message") or "")
+    if any(marker in message for marker in _job_cfg.no_retry_markers):
+        return False
+    code = resp.get("code")
+    if code in _job_cfg.retry_codes:
+        return True
+    return code in _job_cfg.bulk_retry_codes and job["priority"] <= _job_cfg.priorities["bulk"]
+
+async def _execute_job(job: Dict[str, Any]):
+    metrics.observe_phase(job["platform"], "queue_wait", time.time() - job["not_before"])
+    resp = None
+    payload = job["payload"]
+    _job_priority.set(job["priority"])
+    # 请求要求返回追踪或配置了导出时记录本次执行的 span
+    with tracing.trace(payload.get("trace") or _trace_exporter is not None, job_id=job["id"],
+                       platform=job["platform"], url=payload.get("url"), attempt=job["attempts"]) as trace:
+        try:
+            handler, model, _ = JOB_HANDLERS[job["platform"]]
+            resp = await handler(model(**payload))
+            code = resp.get("code")
+            error = f"code={code}" if _should_retry(job, resp) else None
+        except Exception as e:
+            error = str(e)
+    if trace is not None:
+        if _trace_exporter is not None:
+            await asyncio.to_thread(_trace_exporter.export, trace)
+        if payload.get("trace") and resp is not None:
+            # 复制一份再附带追踪：合并的重复请求共用同一个结果对象
+            resp = dict(resp, trace=trace.to_list())
+
+    if error is None:
+        await asyncio.to_thread(_job_queue.complete, job["id"], resp)
+    else:
+        retry = await asyncio.to_thread(_job_queue.fail, job["id"], error, resp)
+        print(f"INFO: [jobs] job {job['id']} attempt {job['attempts']}/{job['max_attempts']} failed ({error})"
+              f"{', will retry' if retry else ''}")
+        if retry:
+            return
+        resp = await asyncio.to_thread(_job_queue.result, job["id"])
+
+    future = _job_waiters.pop(job["id"], None)
+    if future is not None and not future.done():
+        future.set_result(resp)
+
+async def _submit_job(platform: str, req: Any, priority: int, max_attempts: Optional[int] = None,
+                      wait: bool = False) -> Tuple[str, Optional[asyncio.Future]]:
+    """
+    提交任务，返回 (任务 ID, 结果 Future)；wait 为 False 时不登记等待者，Future 为 None。
+    """
+    job_id = uuid.uuid4().hex
+    future = None
+    if wait:
+        future = _job_waiters[job_id] = asyncio.get_running_loop().create_future()
+    try:
+        await asyncio.to_thread(_job_queue.submit, platform, req.model_dump(), priority, max_attempts, job_id)
+    except BaseException:
+        _job_waiters.pop(job_id, None)
+        raise
+    _job_wakeup.set()
+    return job_id, future
+
+async def _submit_and_wait(platform: str, req: Any, priority: int) -> Dict[str, Any]:
+    """
+    提交任务并等待最终结果（含重试）。等待方断开时任务仍会执行完，结果保存在队列中。
+    """
+    job_id, future = await _submit_job(platform, req, priority, wait=True)
+    try:
+        return await asyncio.shield(future)
+    finally:
+        _job_waiters.pop(job_id, None)
+
+@app.post("/xhs")
+async def xhs(req: XhsRequest) -> FastJSONResponse:
+    return FastJSONResponse(await _submit_and_wait("xhs", req, _job_cfg.priorities["interactive"]))
+
+@app.post("/douyin")
+async def douyin(req: DouyinRequest) -> FastJSONResponse:
+    return FastJSONResponse(await _submit_and_wait("douyin", req, _job_cfg.priorities["interactive"]))
+
+@app.post("/toutiao")
+async def toutiao(req: ToutiaoRequest) -> FastJSONResponse:
+    return FastJSONResponse(await _submit_and_wait("toutiao", req, _job_cfg.priorities["interactive"]))
+
+@app.post("/jobs")
+async def submit_job(req: JobRequest) -> Dict[str, Any]:
+    """
+    异步提交抓取任务，立即返回任务 ID；用 GET /jobs/{job_id} 查询状态，GET /jobs/{job_id}/result 获取结果。
+    """
+    priority = _job_cfg.priorities.get(req.priority)
+    if priority is None:
+        return {"code": 400, "message": "ERROR: 不支持的优先级", "data": {"priority": req.priority,
+                                                                    "priorities": list(_job_cfg.priorities)}}
+    job_req = _build_request(req.platform, req.url, req.download_media, req.headless, req.max_age, req.trace)
+    if job_req is None:
+        return {"code": 400, "message": "ERROR: 不支持的平台", "data": {"platform": req.platform, "url": req.url}}
+    job_id, _ = await _submit_job(req.platform, job_req, priority, req.max_attempts)
+    return {"code": 200, "message": "queued", "data": {"job_id": job_id}}
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str) -> Dict[str, Any]:
+    job = await asyncio.to_thread(_job_queue.get, job_id)
+    if job is None:
+        return {"code": 404, "message": "job_not_found", "data": {"job_id": job_id}}
+    return {"code": 200, "message": job["status"], "data": {
+        "job_id": job_id, "platform": job["platform"], "url": job["payload"].get("url"), "status": job["status"],
+        "priority": job["priority"], "attempts": job["attempts"], "max_attempts": job["max_attempts"],
+        "error": job["error"], "created_at": job["created_at"], "updated_at": job["updated_at"],
+    }}
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str) -> FastJSONResponse:
+    """
+    返回已结束任务（done / failed）的抓取结果（与同步接口的响应相同）；未结束时返回任务状态。
+    """
+    result = await asyncio.to_thread(_job_queue.result, job_id)
+    if result is None:
+        return FastJSONResponse(await job_status(job_id))
+    return FastJSONResponse(result)
+
+async def _run_batch_item(index: int, item: BatchItem, headless: bool) -> Dict[str, Any]:
+    req = _build_request(item.platform, item.url, item.download_media, headless, item.max_age, item.trace)
+    if req is None:
+        resp = {"code": 400, "message": "ERROR: 不支持的平台", "data": {"platform": item.platform, "url": item.url}}
+    else:
+        resp = await _submit_and_wait(item.platform, req, _job_cfg.priorities["bulk"])
+    return {"index": index, "platform": item.platform, "url": item.url, "result": resp}
+
+@app.post("/batch")
+async def batch(req: BatchRequest) -> StreamingResponse:
+    """
+    批量抓取（可混合多个平台）：所有条目以 bulk 优先级提交到任务队列，交互式请求可以插队，
+    每完成一条立即以一行 JSON（NDJSON）返回 {"index", "platform", "url", "result"}，返回顺序为完成顺序。
+    """
+    async def stream():
+        tasks = [asyncio.create_task(_run_batch_item(i, item, req.headless)) for i, item in enumerate(req.items)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                line = await next_done
+                yield rpa_result.dumps(line) + b"\n"
+        finally:
+            # 客户端断开时停止等待；已提交的任务仍会执行完，结果进入缓存和任务结果表
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
 
 if __name__ == "__main__":
     import uvicorn
     cfg = ServerConfig()
-    uvicorn.run("server:app", host=cfg.host, port=cfg.port, reload=False)
+    shards = shard_count(ShardConfig().shards, len(PROFILE_PATHS))
+    if shards > 1:
+        import sharding
+        sharding.serve(shards, cfg.host, cfg.port)
+    else:
+        uvicorn.run("server:app", host=cfg.host, port=cfg.port, reload=False)
@@ -0,0 +1,164 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+
+from config import CoordinatorConfig, ServerConfig, ShardConfig
+from coordinator import heartbeat_loop, node_identity
+from node_pool import NodePool, add_proxy_routes
+
+BASE_DIR = Path(__file__).parent
+# 前端进程通过该环境变量告诉分片进程自己的序号和分片总数，格式为 "序号/分片数"
+SHARD_ENV = "RPA_SHARD"
+
+
+def shard_from_env() -> Tuple[int, int]:
+    """
+    返回当前进程的 (分片序号, 分片总数)；不是分片进程时返回 (0, 1)。
+    """
+    value = os.environ.get(SHARD_ENV)
+    if not value:
+        return 0, 1
+    index, _, count = value.partition("/")
+    return int(index), int(count)
+
+
+def shard_count(configured: int, workers: int) -> int:
+    """
+    按 ShardConfig.shards 计算实际的分片数：0 表示按 CPU 核数，不超过 worker 数。
+    """
+    count = configured or os.cpu_count() or 1
+    return max(1, min(count, workers))
+
+
+app = FastAPI()
+
+_shard_cfg = ShardConfig()
+_shard_total = 0         # 分片数，由 serve 设置
+_processes: List[subprocess.Popen] = []
+_restarts: List[int] = []
+_monitor_task = None
+_heartbeat_task = None   # 前端向协调者注册/心跳的任务（见 coordinator.py）
+_nodes = NodePool(_shard_cfg.request_timeout, max_outstanding=_shard_cfg.max_outstanding,
+                  max_failures=_shard_cfg.max_failures)
+add_proxy_routes(app, _nodes)
+
+
+def _shard_name(index: int) -> str:
+    return f"shard_{index}"
+
+
+def _spawn(index: int) -> subprocess.Popen:
+    port = _shard_cfg.base_port + index
+    env = dict(os.environ, **{SHARD_ENV: f"{index}/{_shard_total}"})
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", _shard_cfg.host, "--port", str(port)],
+        cwd=str(BASE_DIR), env=env,
+    )
+    print(f"INFO: [shards] {_shard_name(index)} started (pid={process.pid}, port={port})")
+    return process
+
+
+async def _monitor():
+    """
+    定期检查各分片：进程已退出的重新启动，其余请求 /health 更新健康状态和负载。
+    """
+    while True:
+        await asyncio.sleep(_shard_cfg.health_interval)
+        for index, process in enumerate(_processes):
+            node = _nodes.nodes[_shard_name(index)]
+            if process.poll() is not None:
+                _nodes.mark_failed(node, f"process exited with code {process.returncode}", immediate=True)
+                _restarts[index] += 1
+                _processes[index] = _spawn(index)
+                continue
+            await _nodes.check(node)
+
+
+@app.on_event("startup")
+async def startup_event():
+    global _monitor_task, _heartbeat_task
+    count = _shard_total or max(1, _shard_cfg.shards)
+    for index in range(count):
+        _processes.append(_spawn(index))
+        _restarts.append(0)
+        _nodes.add(_shard_name(index), f"http://{_shard_cfg.host}:{_shard_cfg.base_port + index}")
+
+    # 等分片就绪后再接受请求
+    deadline = time.time() + _shard_cfg.startup_timeout
+    while time.time() < deadline:
+        ready = await asyncio.gather(*(_nodes.check(node) for node in _nodes.nodes.values()))
+        if all(ready):
+            break
+        await asyncio.sleep(1.0)
+    ready = [node.name for node in _nodes.nodes.values() if node.healthy]
+    print(f"INFO: [shards] {len(ready)}/{count} shards ready")
+    _monitor_task = asyncio.create_task(_monitor())
+
+    # 配置了协调者时，整个分片组作为一个节点注册
+    coord_cfg = CoordinatorConfig()
+    coordinator_url, node_name, node_url = node_identity(coord_cfg, ServerConfig().port)
+    if coordinator_url:
+        _heartbeat_task = asyncio.create_task(heartbeat_loop(coordinator_url, node_name, node_url, health, coord_cfg))
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if _heartbeat_task:
+        _heartbeat_task.cancel()
+        await asyncio.gather(_heartbeat_task, return_exceptions=True)
+    if _monitor_task:
+        _monitor_task.cancel()
+    for process in _processes:
+        if process.poll() is None:
+            process.terminate()
+    for process in _processes:
+        try:
+            await asyncio.to_thread(process.wait, 30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    _nodes.close()
+
+
+@app.get("/health")
+async def health() -> Dict[str, Any]:
+    """
+    汇总各分片的状态：进程信息、负载，以及各分片自己的 /health（见 server.py）。
+    """
+    healthy = [node for node in _nodes.nodes.values() if node.healthy]
+    return {
+        "status": "ok" if healthy else "unavailable",
+        "shards": len(_processes),
+        "healthy_shards": len(healthy),
+        "max_concurrency": sum(node.capacity for node in healthy),
+        "jobs": {"queued": sum(node.queued for node in healthy)},
+        "processes": [
+            {"shard": index, "pid": process.pid, "alive": process.poll() is None, "restarts": _restarts[index]}
+            for index, process in enumerate(_processes)
+        ],
+        **_nodes.stats(),
+    }
+
+
+@app.get("/metrics")
+async def metrics_endpoint() -> PlainTextResponse:
+    """
+    合并各分片的 /metrics，样本带 shard 标签。
+    """
+    return PlainTextResponse(await _nodes.collect_metrics("shard"), media_type="text/plain; version=0.0.4")
+
+
+def serve(shards: int, host: str, port: int):
+    """
+    以分片模式运行：启动 shards 个分片进程（各自运行 server.py），当前进程作为前端在 host:port 上接收请求。
+    """
+    global _shard_total
+    import uvicorn
+    _shard_total = shards
+    uvicorn.run(app, host=host, port=port, reload=False)
@@ -0,0 +1,248 @@
+import json
+import re
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from base_rpa import RPACommon
+from rpa_result import RPAResult
+from config import Config_Toutiao
+
+# 不会出现结束标签的元素，不入栈
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+# 提取正文时在这些元素结束后换行，近似浏览器 inner_text 的效果
+BLOCK_TAGS = {"p", "div", "br", "li", "h1", "h2", "h3", "h4", "section", "blockquote"}
+
+
+def _parse_selector(selector: str) -> List[Tuple[str, Optional[str]]]:
+    """
+    解析简化的选择器："tag"、"tag.class" 或 "parent.class > tag"，返回 [(tag, class), ...]。
+    """
+    steps = []
+    for part in selector.split(">"):
+        tag, _, cls = part.strip().partition(".")
+        steps.append((tag, cls or None))
+    return steps
+
+
+class SSRFieldParser(HTMLParser):
+    """
+    单次扫描 HTML，按简化选择器提取每个字段第一个匹配元素的文本，
+    同时收集 <script id="RENDER_DATA"> 中内嵌的页面数据。
+    """
+    def __init__(self, selectors: Dict[str, str]):
+        super().__init__(convert_charrefs=True)
+        self.selectors = {k: _parse_selector(v) for k, v in selectors.items()}
+        self.fields: Dict[str, List[str]] = {}
+        self.render_data: Optional[str] = None
+        self._stack: List[Tuple[str, List[str]]] = []
+        # 正在采集文本的字段：key -> 匹配元素在栈中的深度
+        self._capturing: Dict[str, int] = {}
+        self._in_render_data = False
+
+    def _matches(self, steps: List[Tuple[str, Optional[str]]]) -> bool:
+        if len(steps) > len(self._stack):
+            return False
+        for (tag, cls), (cur_tag, cur_classes) in zip(reversed(steps), reversed(self._stack)):
+            if tag != cur_tag or (cls and cls not in cur_classes):
+                return False
+        return True
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]):
+        attrs = dict(attrs)
+        if tag == "script" and attrs.get("id") == "RENDER_DATA":
+            self._in_render_data = True
+            self.render_data = ""
+        if tag in VOID_TAGS:
+            if tag == "br":
+                self._append("\n")
+            return
+        self._stack.append((tag, (attrs.get("class") or "").split()))
+        for key, steps in self.selectors.items():
+            if key not in self.fields and self._matches(steps):
+                self.fields[key] = []
+                self._capturing[key] = len(self._stack)
+
+    def handle_endtag(self, tag: str):
+        if tag == "script":
+            self._in_render_data = False
+        if tag in VOID_TAGS:
+            return
+        # 容错：跳过未闭合的元素，弹出到与结束标签匹配的那一层
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i][0] == tag:
+                del self._stack[i:]
+                break
+        else:
+            return
+        for key, depth in list(self._capturing.items()):
+            if depth > len(self._stack):
+                del self._capturing[key]
+        if tag in BLOCK_TAGS:
+            self._append("\n")
+
+    def handle_data(self, data: str):
+        if self._in_render_data:
+            self.render_data += data
+            return
+        self._append(data)
+
+    def _append(self, text: str):
+        for key in self._capturing:
+            self.fields[key].append(text)
+
+    def texts(self) -> Dict[str, Optional[str]]:
+        result = {}
+        for key in self.selectors:
+            # 与浏览器 inner_text 一致：合并行内空白，去掉空行
+            lines = (re.sub(r"\s+", " ", line).strip() for line in "".join(self.fields.get(key, [])).split("\n"))
+            result[key] = "\n".join(line for line in lines if line) or None
+        return result
+
+
+def _get_path(obj: Any, paths: List[str]) -> Any:
+    """
+    按点分隔的路径（如 "data.itemCell.itemCounter.digg_count"，列表下标写数字）依次取值，返回第一个非空的值。
+    只按固定路径取值，不在整个 JSON 中搜索同名键，避免取到推荐内容、频道等其他位置的同名字段。
+    """
+    for path in paths:
+        cur = obj
+        for part in path.split("."):
+            if isinstance(cur, dict):
+                cur = cur.get(part)
+            elif isinstance(cur, list) and part.isdigit() and int(part) < len(cur):
+                cur = cur[int(part)]
+            else:
+                cur = None
+            if cur is None:
+                break
+        if cur not in (None, ""):
+            return cur
+    return None
+
+
+def _html_to_text(html: str) -> Optional[str]:
+    parser = SSRFieldParser({"text": "body"})
+    parser.feed(f"<body>{html}</body>")
+    return parser.texts()["text"]
+
+
+class ToutiaoHttpExtractor(RPACommon):
+    """
+    今日头条文章/微头条的 HTTP 快速通道：不打开浏览器，直接用连接池复用的 HTTP 客户端请求页面，
+    从服务端渲染的 HTML（及内嵌的 RENDER_DATA）中解析字段。解析不出必需字段时返回 None，由调用方回退到浏览器。
+    """
+    def __init__(self, config: Config_Toutiao):
+        super().__init__(config, "头条")
+        self.base_url = getattr(config, "http_base_url", None)
+        self.timeout = getattr(config, "http_timeout", 5.0)
+        self.selectors = getattr(config, "http_selectors", {})
+        self.render_data_keys = getattr(config, "http_render_data_keys", {})
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=getattr(config, "http_pool_size", 16))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(getattr(config, "http_headers", {}))
+
+    def _request_url(self, url: str) -> str:
+        """
+        指定了 http_base_url（如本地 fixture 服务）时，把请求发往该地址，保留原路径和参数。
+        """
+        if not self.base_url:
+            return url
+        parsed = urlparse(url)
+        return self.base_url.rstrip("/") + parsed.path + (f"?{parsed.query}" if parsed.query else "")
+
+    def _page_kind(self, url: str) -> Optional[str]:
+        path = urlparse(url).path
+        if path.startswith("/article/"):
+            return "a"
+        if path.startswith("/w/"):
+            return "w"
+        return None
+
+    def supports(self, url: str) -> bool:
+        """
+        视频页依赖播放器加载视频地址，只走浏览器；其余头条链接（含短链）都先尝试 HTTP。
+        """
+        return "toutiao.com" in url and "toutiao.com/video" not in url
+
+    def _parse(self, html: str, kind: str) -> Dict[str, Optional[str]]:
+        parser = SSRFieldParser(self.selectors[kind])
+        parser.feed(html)
+        parser.close()
+        fields = parser.texts()
+        if parser.render_data:
+            # 服务端渲染的 HTML 中缺失的字段（如计数）从内嵌 JSON 中补齐
+            try:
+                state = json.loads(unquote(parser.render_data))
+            except ValueError:
+                state = None
+            for key, paths in self.render_data_keys.get(kind, {}).items():
+                if fields.get(key) is None and state is not None:
+                    value = _get_path(state, paths)
+                    if isinstance(value, str) and "<" in value:
+                        value = _html_to_text(value)
+                    fields[key] = value
+        return fields
+
+    def extract(self, url: str) -> Optional[RPAResult]:
+        """
+        :param url: 头条文章/微头条链接（可以是短链）
+        :return: 与浏览器提取一致的 RPAResult；非文章/微头条页面、请求失败或解析不出必需字段时返回 None
+        """
+        if not self.supports(url):
+            return None
+        try:
+            response = self.session.get(self._request_url(url), timeout=self.timeout)
+        except requests.RequestException as e:
+            print(f"warning: [{self.web_name}] HTTP 快速通道请求失败，回退到浏览器: {e}")
+            return None
+
+        final_url = url if self.base_url else response.url
+        kind = self._page_kind(response.url)
+        if kind is None or response.status_code != 200:
+            return None
+        fields = self._parse(response.text, kind)
+
+        wait_list = self.config.wait_list[f"{kind}_wait_list"]
+        if any(fields.get(k) in (None, "") for k in wait_list):
+            # 反爬验证页、下架页等没有正文，交给浏览器处理（浏览器能识别错误状态并执行验证脚本）
+            return None
+
+        if kind == "w":
+            data = {
+                "title": None,
+                "author": fields["w_author"],
+                "content": fields["w_content"],
+                "likes": fields["w_likes"],
+                "publish_time": fields["w_publish_time"],
+                "web_name": "微头条",
+                "url": final_url,
+                "media_url": None,
+                "comments": None,
+                "shares": None,
+                "fans": None
+            }
+        else:
+            data = {
+                "title": fields["a_title"],
+                "author": fields["a_author"],
+                "content": fields["a_article"],
+                "likes": fields["a_likes"],
+                "comments": fields["a_comments"],
+                "publish_time": fields["a_publish_time"],
+                "web_name": "头条文章",
+                "url": final_url,
+                "media_url": None,
+                "shares": None,
+                "fans": None
+            }
+        # 与浏览器提取的消息一致（RPA_toutiao.py 中 ToutiaoRPACommon.W_MESSAGE）
+        return self._build_result(200, data, message="SUCCESS: 微头条数据提取成功")
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,162 @@
+import asyncio
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+class Span:
+    """
+    一个被追踪的步骤：名称、起止时间（Unix 时间戳，秒）和属性（选择器键名、是否超时、worker 序号等）。
+    """
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start", "end", "attributes")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.attributes = attributes
+
+    def set(self, **attributes: Any):
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+            "name": self.name, "start": round(self.start, 6), "end": round(self.end, 6) if self.end else None,
+            "duration": round(self.end - self.start, 6) if self.end else None, "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """
+    没有进行中的追踪时 span() 返回的占位对象，调用方不必判断。
+    """
+    def set(self, **attributes: Any):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """
+    一次请求的全部 span。
+    """
+    def __init__(self, **attributes: Any):
+        self.trace_id = uuid.uuid4().hex
+        self.attributes = attributes
+        self.spans: List[Span] = []
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return [span.to_dict() for span in self.spans]
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("rpa_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("rpa_span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def trace(enabled: bool = True, **attributes: Any) -> Iterator[Optional[Trace]]:
+    """
+    开始一次追踪，with 代码块（及其中创建的协程/线程）内的 span 都记录到该追踪中。enabled 为 False 时返回 None。
+    """
+    if not enabled:
+        yield None
+        return
+    current = Trace(**attributes)
+    trace_token = _current_trace.set(current)
+    span_token = _current_span.set(None)
+    try:
+        yield current
+    finally:
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """
+    记录一个步骤，嵌套的 span 以外层为父节点；没有进行中的追踪时不做任何记录（返回 NOOP_SPAN）。
+    代码块抛出异常时记录 error 属性。
+    """
+    current = _current_trace.get()
+    if current is None:
+        yield NOOP_SPAN
+        return
+    parent = _current_span.get()
+    new_span = Span(current, name, parent.span_id if parent else None, attributes)
+    current.spans.append(new_span)
+    token = _current_span.set(new_span)
+    try:
+        yield new_span
+    except BaseException as e:
+        new_span.attributes.setdefault("error", f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        new_span.end = time.time()
+        _current_span.reset(token)
+
+
+def add_span(name: str, start: float, end: float, **attributes: Any):
+    """
+    补记一个已经结束的步骤（起止时间由调用方给出），挂在当前 span 下。
+    """
+    current = _current_trace.get()
+    if current is None:
+        return
+    parent = _current_span.get()
+    new_span = Span(current, name, parent.span_id if parent else None, attributes)
+    new_span.start, new_span.end = start, end
+    current.spans.append(new_span)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """
+    把整个函数（同步或异步）记录为一个 span 的装饰器，span 名称默认为 "类名.函数名"。
+    """
+    def decorate(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class JsonlExporter:
+    """
+    把追踪的 span 逐行追加写入 JSONL 文件（每行一个 span，带 trace_id 和追踪属性）。线程安全。
+    """
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+
+    def export(self, finished: Trace):
+        lines = [json.dumps(dict(s, trace=finished.attributes), ensure_ascii=False) for s in finished.to_list()]
+        if not lines:
+            return
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
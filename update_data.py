@@ -1,8 +1,11 @@
 import http.client
 import json
 import requests
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from content_index import ContentIndex
+from url_router import UrlRouter
 '''
 这个脚本用于从数据库服务器获取需要更新的数据，并调用内网RPA服务获取需要更新的数据，然后将数据发送回数据库服务器。
 '''
@@ -18,6 +21,23 @@ PLATFORM_ENDPOINT_MAP = {
     "小红书": "/xhs"
 }
 
+# 平台名称映射到 /batch 接口中的平台标识
+PLATFORM_ID_MAP = {
+    "今日头条": "toutiao",
+    "抖音": "douyin",
+    "小红书": "xhs"
+}
+
+# 是否通过 /batch 接口一次提交所有平台的记录（结果按完成顺序流式返回），False 时按平台逐条调用
+USE_BATCH = True
+# /batch 两条结果之间的最长等待时间（秒）
+BATCH_READ_TIMEOUT = 300
+
+# 作品索引：同一作品的重复记录只抓取一次，跨运行保存在该文件中
+CONTENT_INDEX_PATH = "data/content_index.json"
+# 同一作品在该秒数内抓取过（成功或已下架）时直接复用上次结果，不再调用 RPA
+REFETCH_INTERVAL = 6 * 3600
+
 def get_token():
 
     url = "http://192.168.30.165/api/admin/login/token"
@@ -189,70 +209,127 @@ def send_update_to_server(record_id: str, table_type: str, rpa_data: Dict[str, A
         print(f"发送更新数据时发生错误, ID: {record_id}, 错误: {e}")
         return False
 
-def process_single_item(platform: str, item: Dict[str, Any], idx: int, total: int, headless: bool = False, token: str = None) -> Tuple[bool, str]:
+def group_by_content(platform: str, data_list: List[Dict[str, Any]], index: ContentIndex) -> Tuple[List[Tuple[Optional[str], List[Dict[str, Any]]]], List[Dict[str, Any]]]:
     """
-    处理单条记录
-    
+    按作品归并记录：同一作品的不同链接（分享参数不同、短链等）归为一组，只抓取一次
+
     Args:
         platform: 平台名称
+        data_list: 平台的记录列表
+        index: 作品索引
+
+    Returns:
+        ([(作品键, 记录列表)], 数据不完整的记录列表)；无法识别作品的链接单独成组，作品键为 None
+    """
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    ungrouped = []
+    invalid = []
+    for item in data_list:
+        if not all([item.get("id"), item.get("table_type"), item.get("url")]):
+            invalid.append(item)
+            continue
+        key = index.key_for(item["url"])
+        if key is None:
+            ungrouped.append((None, [item]))
+            continue
+        index.add(key, item["url"], item["id"])
+        groups.setdefault(key, []).append(item)
+
+    duplicates = sum(len(items) - 1 for items in groups.values())
+    if duplicates:
+        print(f"{platform}: {duplicates} 条记录与其他记录指向同一作品，将复用同一次抓取结果")
+    return list(groups.items()) + ungrouped, invalid
+
+
+def send_item_update(item: Dict[str, Any], rpa_result: Dict[str, Any], token: str = None) -> bool:
+    """
+    根据 RPA 结果更新单条记录
+
+    Args:
         item: 单条记录数据
-        idx: 记录索引
-        total: 总记录数
+        rpa_result: RPA返回的数据
+        token: 访问令牌
+
+    Returns:
+        是否成功
+    """
+    # 判断是否下架（根据RPA返回的code判断）
+    is_offline = 0
+    code = rpa_result.get("code")
+    if code == 404:
+        is_offline = 1
+    success = True
+    if code == 403 or code == 502 or code == 400:   # 如果code为403、502、400，则认为RPA调用失败
+        success = False
+
+    # 发送更新数据到服务器
+    success_send = send_update_to_server(item.get("id"), item.get("table_type"), rpa_result, is_offline, token)
+
+    # 如果发送更新数据失败
+    if not success_send:
+        success = False
+    return success
+
+
+def get_recent_result(key: Optional[str], index: ContentIndex) -> Optional[Dict[str, Any]]:
+    """
+    返回作品在 REFETCH_INTERVAL 内的上次抓取结果，没有时返回 None
+    """
+    if not key or not index.fetched_within(key, REFETCH_INTERVAL):
+        return None
+    rpa_result = (index.get(key) or {}).get("last_result")
+    if rpa_result:
+        print(f"作品 {key} 最近已抓取过，复用上次结果")
+    return rpa_result
+
+
+def process_content_group(platform: str, key: Optional[str], items: List[Dict[str, Any]], idx: int, total: int, index: ContentIndex, headless: bool = False, token: str = None) -> List[Tuple[bool, str]]:
+    """
+    处理指向同一作品的一组记录：只抓取一次（最近已抓取过则直接复用结果），再逐条更新
+
+    Args:
+        platform: 平台名称
+        key: 作品键（"平台:作品ID"），无法识别时为 None
+        items: 该作品对应的记录列表
+        idx: 作品索引
+        total: 作品总数
+        index: 作品索引
         headless: 是否使用无头模式
-    
+
     Returns:
-        (是否成功, 记录ID)
+        [(是否成功, 记录ID)]
     """
-    record_id = item.get("id")
-    table_type = item.get("table_type")
-    url = item.get("url")
-    
-    print(f"\n[{idx}/{total}] 处理记录 ID: {record_id}")
+    url = items[0].get("url")
+    record_ids = [item.get("id") for item in items]
+
+    print(f"\n[{idx}/{total}] 处理记录 ID: {', '.join(map(str, record_ids))}")
     print(f"URL: {url}")
-    
-    if not all([record_id, table_type, url]):
-        print("数据不完整，跳过此记录")
-        return (False, record_id)
-    
+
+    rpa_result = get_recent_result(key, index)
+
     # 调用RPA API获取数据
-    rpa_result = call_rpa_api(platform, url, download_media=False, headless=headless)
-    
-    success = True
-    if rpa_result:
-        # 判断是否下架（根据RPA返回的code判断）
-        is_offline = 0 
-        code = rpa_result.get("code")
-        if code == 404:
-            is_offline = 1
-        if code == 403 or code == 502 or code == 400:   # 如果code为403、502、400，则认为RPA调用失败
-            success = False
-        
-        # 发送更新数据到服务器
-        success_send = send_update_to_server(record_id, table_type, rpa_result, is_offline, token)
-        
-        # 如果发送更新数据失败
-        if not success_send:
-            success = False
-        
-        # 更新统计信息
-        if success:
-            return (True, record_id)
-        else:
-            return (False, record_id)
-    else:
+    if not rpa_result:
+        rpa_result = call_rpa_api(platform, url, download_media=False, headless=headless)
+        if rpa_result and key:
+            index.mark_fetched(key, rpa_result.get("code"), rpa_result)
+
+    if not rpa_result:
         # RPA调用失败
         print("RPA调用失败")
-        return (False, record_id)
+        return [(False, record_id) for record_id in record_ids]
 
+    return [(send_item_update(item, rpa_result, token), item.get("id")) for item in items]
 
 
-def process_platform_data(platform: str, platform_data: Dict[str, Any], headless: bool = False, max_workers: int = 3, token: str = None) -> Dict[str, int]:
+
+def process_platform_data(platform: str, platform_data: Dict[str, Any], index: ContentIndex, headless: bool = False, max_workers: int = 3, token: str = None) -> Dict[str, int]:
     """
     处理单个平台的数据（使用并发）
     
     Args:
         platform: 平台名称
         platform_data: 平台数据
+        index: 作品索引（用于归并同一作品的重复记录）
         headless: 是否使用无头模式
         max_workers: 最大并发数
     
@@ -267,30 +344,134 @@ def process_platform_data(platform: str, platform_data: Dict[str, Any], headless
     print(f"{'='*50}")
     
     stats = {"success": 0, "failed": 0, "total": len(data_list)}
+
+    groups, invalid = group_by_content(platform, data_list, index)
+    for item in invalid:
+        print(f"数据不完整，跳过此记录: {item.get('id')}")
+    stats["failed"] += len(invalid)
     
     # 使用线程池并发处理
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # 提交所有任务
-        future_to_item = {
-            executor.submit(process_single_item, platform, item, idx, len(data_list), headless, token): item
-            for idx, item in enumerate(data_list, 1)
+        # 提交所有任务（每个作品一个任务）
+        future_to_group = {
+            executor.submit(process_content_group, platform, key, items, idx, len(groups), index, headless, token): items
+            for idx, (key, items) in enumerate(groups, 1)
         }
         
         # 处理完成的任务
-        for future in as_completed(future_to_item):
+        for future in as_completed(future_to_group):
             try:
-                success, record_id = future.result()
-                if success:
-                    stats["success"] += 1
-                else:
-                    stats["failed"] += 1
+                for success, record_id in future.result():
+                    if success:
+                        stats["success"] += 1
+                    else:
+                        stats["failed"] += 1
             except Exception as e:
                 print(f"处理任务时发生异常: {e}")
-                stats["failed"] += 1
+                stats["failed"] += len(future_to_group[future])
     
     return stats
 
 
+def call_rpa_batch(items: List[Dict[str, Any]], headless: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    调用RPA服务的 /batch 接口，按完成顺序逐条返回结果
+
+    Args:
+        items: [{"platform": 平台标识, "url": 链接, "download_media": 是否下载媒体}]
+        headless: 是否使用无头模式
+
+    Returns:
+        {"index": 条目序号, "platform", "url", "result": RPA返回的数据} 的迭代器
+    """
+    print(f"正在通过 /batch 提交 {len(items)} 个作品")
+    with requests.post(f"{RPA_SERVER}/batch", json={"items": items, "headless": headless},
+                       stream=True, timeout=(10, BATCH_READ_TIMEOUT)) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line:
+                yield json.loads(line)
+
+
+def process_all_platforms_batch(platform_data: Dict[str, Any], index: ContentIndex, headless: bool = False, max_workers: int = 3, token: str = None) -> Dict[str, Dict[str, int]]:
+    """
+    通过一次 /batch 请求处理所有平台的数据：RPA 服务按自身并发上限调度，每返回一个结果就回写对应的记录
+
+    Args:
+        platform_data: 各平台的数据
+        index: 作品索引（用于归并同一作品的重复记录）
+        headless: 是否使用无头模式
+        max_workers: 回写服务器的最大并发数
+
+    Returns:
+        各平台的处理统计信息 {平台名称: {success: 成功数, failed: 失败数, total: 总数}}
+    """
+    all_stats = {}
+    pending = []   # 需要抓取的作品：(平台名称, 作品键, 记录列表)，下标即 /batch 条目序号
+    ready = []     # 已有结果的作品：(平台名称, 作品键, 记录列表, RPA结果)
+    for platform, data in platform_data.items():
+        data_list = data.get("data", [])
+        stats = all_stats[platform] = {"success": 0, "failed": 0, "total": len(data_list)}
+        if platform not in PLATFORM_ID_MAP:
+            print(f"不支持的平台: {platform}")
+            stats["failed"] += len(data_list)
+            continue
+        groups, invalid = group_by_content(platform, data_list, index)
+        for item in invalid:
+            print(f"数据不完整，跳过此记录: {item.get('id')}")
+        stats["failed"] += len(invalid)
+        for key, items in groups:
+            rpa_result = get_recent_result(key, index)
+            if rpa_result:
+                ready.append((platform, key, items, rpa_result))
+            else:
+                pending.append((platform, key, items))
+
+    def finish(platform: str, key: Optional[str], items: List[Dict[str, Any]], rpa_result: Optional[Dict[str, Any]]) -> Tuple[str, List[bool]]:
+        if rpa_result is None:
+            return platform, [False] * len(items)
+        return platform, [send_item_update(item, rpa_result, token) for item in items]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(finish, *entry) for entry in ready]
+        done = set()
+        if pending:
+            batch_items = [
+                {"platform": PLATFORM_ID_MAP[platform], "url": items[0]["url"], "download_media": False}
+                for platform, _, items in pending
+            ]
+            try:
+                for line in call_rpa_batch(batch_items, headless):
+                    platform, key, items = pending[line["index"]]
+                    done.add(line["index"])
+                    rpa_result = line["result"]
+                    code = rpa_result.get("code")
+                    if code == 200 or code == 404:
+                        print(f"RPA API 调用成功: {platform} - {line['url']}")
+                        if key:
+                            index.mark_fetched(key, code, rpa_result)
+                    else:
+                        print(f"RPA 执行获取失败: {platform} - {line['url']}, 错误代码: {code}")
+                        rpa_result = None
+                    futures.append(executor.submit(finish, platform, key, items, rpa_result))
+            except Exception as e:
+                print(f"RPA /batch 调用时发生错误: {e}")
+        # 连接中断等原因未返回结果的作品记为失败
+        for i, (platform, key, items) in enumerate(pending):
+            if i not in done:
+                futures.append(executor.submit(finish, platform, key, items, None))
+        for future in futures:
+            try:
+                platform, results = future.result()
+            except Exception as e:
+                print(f"处理任务时发生异常: {e}")
+                continue
+            all_stats[platform]["success"] += sum(results)
+            all_stats[platform]["failed"] += len(results) - sum(results)
+
+    return all_stats
+
+
 def main(headless: bool = False):
     """
     主函数
@@ -333,11 +514,25 @@ def main(headless: bool = False):
     
     # 3. 统计信息
     total_stats = {"success": 0, "failed": 0, "total": 0}
+
+    router = UrlRouter()
+    index = ContentIndex(CONTENT_INDEX_PATH, router)
     
     # 4. 处理每个平台的数据
-    for platform, data in platform_data.items():
-        stats = process_platform_data(platform, data, headless=headless, token=token)
-        
+    if USE_BATCH:
+        try:
+            all_stats = process_all_platforms_batch(platform_data, index, headless=headless, token=token)
+        finally:
+            index.save()
+    else:
+        all_stats = {}
+        for platform, data in platform_data.items():
+            try:
+                all_stats[platform] = process_platform_data(platform, data, index, headless=headless, token=token)
+            finally:
+                index.save()
+
+    for platform, stats in all_stats.items():
         # 汇总统计
         total_stats["success"] += stats["success"]
         total_stats["failed"] += stats["failed"]
@@ -348,6 +543,8 @@ def main(headless: bool = False):
         print(f"  失败: {stats['failed']}")
         print(f"  总计: {stats['total']}")
     
+    router.close()
+
     # 5. 输出总体统计
     print("\n" + "=" * 60)
     print("所有平台处理完成")
@@ -0,0 +1,120 @@
+import re
+from typing import Any, Dict, Optional
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import RouterConfig
+
+# 短链：(平台, 正则)，需要跟随跳转才能知道真实页面
+SHORT_LINK_RULES = [
+    ("douyin", re.compile(r"^https?://v\.douyin\.com/")),
+    ("xhs", re.compile(r"^https?://(www\.)?xhslink\.com/")),
+    ("toutiao", re.compile(r"^https?://m\.toutiao\.com/is/")),
+]
+
+# 页面：(平台, 页面类型, 正则, 规范化 URL 模板)；模板为 None 时保留原链接（如小红书的 xsec_token 参数不能丢）
+PAGE_RULES = [
+    ("douyin", "video", re.compile(r"^https?://(www\.)?douyin\.com/video/(?P<id>\d+)"), "https://www.douyin.com/video/{id}"),
+    ("douyin", "note", re.compile(r"^https?://(www\.)?douyin\.com/note/(?P<id>\d+)"), "https://www.douyin.com/note/{id}"),
+    ("douyin", "video", re.compile(r"^https?://(www\.)?iesdouyin\.com/share/video/(?P<id>\d+)"), "https://www.douyin.com/video/{id}"),
+    ("douyin", "note", re.compile(r"^https?://(www\.)?iesdouyin\.com/share/(note|slides)/(?P<id>\d+)"), "https://www.douyin.com/note/{id}"),
+    ("douyin", "video", re.compile(r"^https?://(www\.)?douyin\.com/.*[?&]modal_id=(?P<id>\d+)"), "https://www.douyin.com/video/{id}"),
+    ("xhs", "note", re.compile(r"^https?://(www\.)?xiaohongshu\.com/(explore|discovery/item)/(?P<id>[0-9a-zA-Z]+)"), None),
+    ("toutiao", "article", re.compile(r"^https?://(www\.|m\.)?toutiao\.com/(article|group)/(?P<id>\d+)"), "https://www.toutiao.com/article/{id}/"),
+    ("toutiao", "article", re.compile(r"^https?://(www\.)?toutiao\.com/a(?P<id>\d+)"), "https://www.toutiao.com/article/{id}/"),
+    ("toutiao", "w", re.compile(r"^https?://(www\.|m\.)?toutiao\.com/w/(?P<id>\d+)"), "https://www.toutiao.com/w/{id}/"),
+    ("toutiao", "video", re.compile(r"^https?://(www\.|m\.)?toutiao\.com/video/(?P<id>\d+)"), "https://www.toutiao.com/video/{id}/"),
+]
+
+# 只根据域名判断平台，用于识别"是该平台但页面类型不支持"的链接
+PLATFORM_HOSTS = [
+    ("douyin", re.compile(r"^https?://([a-z0-9-]+\.)*(douyin|iesdouyin)\.com")),
+    ("xhs", re.compile(r"^https?://([a-z0-9-]+\.)*(xiaohongshu|xhslink)\.com")),
+    ("toutiao", re.compile(r"^https?://([a-z0-9-]+\.)*toutiao\.com")),
+]
+
+
+def classify_url(url: str) -> Dict[str, Any]:
+    """
+    不发起网络请求，仅根据 URL 判断平台和页面类型。
+
+    :return: {"platform", "page_type", "content_id", "url", "short"}；
+             page_type 为 video/note/article/w，短链为 "short"，无法识别时为 None；
+             content_id 为平台内的作品 ID（短链和无法识别的页面为 None）；
+             url 为规范化后的链接（去掉分享参数等），无法规范化时为原链接
+    """
+    url = (url or "").strip()
+    for platform, pattern in SHORT_LINK_RULES:
+        if pattern.match(url):
+            return {"platform": platform, "page_type": "short", "content_id": None, "url": url, "short": True}
+    for platform, page_type, pattern, template in PAGE_RULES:
+        match = pattern.match(url)
+        if match:
+            content_id = match.group("id")
+            return {"platform": platform, "page_type": page_type, "content_id": content_id,
+                    "url": template.format(id=content_id) if template else url, "short": False}
+    for platform, pattern in PLATFORM_HOSTS:
+        if pattern.match(url):
+            return {"platform": platform, "page_type": None, "content_id": None, "url": url, "short": False}
+    return {"platform": None, "page_type": None, "content_id": None, "url": url, "short": False}
+
+
+class UrlRouter:
+    """
+    打开浏览器之前的 URL 分类层：短链只跟随 HTTP 跳转（不下载页面、不执行脚本）得到真实地址，
+    再映射为平台 + 页面类型。不支持的链接在占用浏览器并发名额之前就被拒绝。
+    """
+    def __init__(self, config: Optional[RouterConfig] = None):
+        config = config or RouterConfig()
+        self.timeout = config.timeout
+        self.max_redirects = config.max_redirects
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=config.pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(config.headers)
+
+    def resolve(self, url: str) -> Dict[str, Any]:
+        """
+        分类 URL，短链先跟随跳转。
+
+        :return: classify_url 的结果，short 表示输入是否为短链，另加 "resolved"：短链是否已解析成功（非短链恒为 True）。
+                 短链解析失败（网络错误/跳转过多）时 page_type 仍为 "short"，由调用方决定是否交给浏览器处理
+        """
+        route = classify_url(url)
+        if not route["short"]:
+            return dict(route, resolved=True)
+
+        current = route["url"]
+        for _ in range(self.max_redirects):
+            try:
+                response = self.session.get(current, allow_redirects=False, timeout=self.timeout, stream=True)
+                response.close()
+            except requests.RequestException as e:
+                print(f"warning: [router] 短链解析失败: {url} ({e})")
+                break
+            location = response.headers.get("Location")
+            if not location or not response.is_redirect:
+                break
+            current = urljoin(current, location)
+            target = classify_url(current)
+            if not target["short"]:
+                return dict(target, short=True, resolved=True)
+        return dict(route, resolved=False)
+
+    def close(self):
+        self.session.close()
+
+
+def route_error(route: Dict[str, Any], platform: str) -> Optional[str]:
+    """
+    判断路由结果能否交给 platform 对应的抓取器处理，返回拒绝原因；可以处理时返回 None。
+    短链解析失败、或短链跳到了该平台无法识别的页面（可能是下架/登录页）时不拒绝，交给浏览器判断错误状态。
+    """
+    if route["platform"] != platform:
+        return "链接不属于该平台"
+    if route["page_type"] is None and not route["short"]:
+        return "不支持的页面类型"
+    return None
@@ -0,0 +1,101 @@
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from async_base_rpa import AsyncBaseRPA
+from browser_pool import BrowserPool
+from config import HealthConfig
+
+
+class WorkerHealth:
+    """
+    所有平台共用的 worker 健康管理：按 worker、按平台记录健康分（成功为 1、警告为 0 的指数移动平均）和连续警告次数，
+    分数过低或连续警告过多时隔离该 worker（调度不再分配），在后台任务中等其标签页结束后清空 Profile、
+    重新启动上下文并预热（如小红书首次访问主页），完成后恢复调度，请求路径中不再执行任何重建操作。
+    运行在服务的事件循环中。
+    """
+    def __init__(self, pool: BrowserPool, config: Optional[HealthConfig] = None,
+                 warmers: Optional[Callable[[], List[AsyncBaseRPA]]] = None):
+        """
+        :param pool: 浏览器上下文池
+        :param config: 健康分与隔离参数（见 HealthConfig）
+        :param warmers: 返回重建后用于预热的 RPA 实例列表（依次调用其 warm_up），None 表示不预热
+        """
+        config = config or HealthConfig()
+        self.pool = pool
+        self.alpha = config.alpha
+        self.healthy_codes = config.healthy_codes
+        self.warning_codes = config.warning_codes
+        self.max_consecutive_warnings = config.max_consecutive_warnings
+        self.min_score = config.min_score
+        self.min_samples = config.min_samples
+        self.warm_headless = config.warm_headless
+        self.warmers = warmers
+        # (worker 序号, 平台) -> {"score", "samples", "warnings"}
+        self.scores: Dict[Tuple[int, str], Dict[str, Any]] = {}
+        self.rebuilds = 0
+        self._tasks: Set[asyncio.Task] = set()
+
+    def record(self, index: int, platform: str, resp: Dict[str, Any]):
+        """
+        登记一次抓取结果；触发隔离条件时启动后台重建。
+        """
+        code = resp.get("code")
+        if code in self.healthy_codes:
+            outcome = 1.0
+        elif code in self.warning_codes:
+            outcome = 0.0
+        else:
+            return
+        entry = self.scores.setdefault((index, platform), {"score": 1.0, "samples": 0, "warnings": 0})
+        entry["score"] += self.alpha * (outcome - entry["score"])
+        entry["samples"] += 1
+        entry["warnings"] = entry["warnings"] + 1 if outcome == 0.0 else 0
+
+        reason = None
+        if entry["warnings"] >= self.max_consecutive_warnings:
+            reason = f"{entry['warnings']} consecutive warnings on {platform}"
+        elif entry["samples"] >= self.min_samples and entry["score"] < self.min_score:
+            reason = f"{platform} score {entry['score']:.2f} < {self.min_score}"
+        if reason:
+            self.quarantine(index, reason)
+
+    def quarantine(self, index: int, reason: str):
+        """
+        隔离第 index 个 worker 并在后台重建，已在隔离中时忽略。
+        """
+        worker = self.pool.workers[index]
+        if worker.quarantined:
+            return
+        worker.quarantined = True
+        print(f"WARNING: [health] Worker_{index + 1} quarantined ({reason}), rebuilding in background")
+        task = asyncio.create_task(self._rebuild(index))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _rebuild(self, index: int):
+        try:
+            warmers = self.warmers() if self.warmers else []
+            await self.pool.reset_profile(index, warmers, self.warm_headless)
+            self.rebuilds += 1
+            for key in [k for k in self.scores if k[0] == index]:
+                del self.scores[key]
+            print(f"INFO: [health] Worker_{index + 1} rebuilt and back in rotation")
+        except Exception as e:
+            print(f"WARNING: [health] Worker_{index + 1} rebuild failed: {e}")
+        finally:
+            self.pool.workers[index].quarantined = False
+
+    def stats(self) -> Dict[str, Any]:
+        workers = {}
+        for (index, platform), entry in self.scores.items():
+            workers.setdefault(index + 1, {})[platform] = {"score": round(entry["score"], 2), "warnings": entry["warnings"]}
+        return {
+            "rebuilds": self.rebuilds,
+            "quarantined": [w.index + 1 for w in self.pool.workers if w.quarantined],
+            "scores": workers,
+        }
+
+    async def shutdown(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)